@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: plain hook script vs. precompiled bundle.
+
+Runs the PreToolUse hook as a fresh process per call, the way Claude Code
+does, and compares `python3 protect_directories.py` with
+`python3 -E -s -S block-hooks.pyz protect`. The bundle is built into a
+temporary directory, so the working tree is left untouched.
+
+Usage:
+  python3 benchmarks/bench_cold_start.py [--runs N]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOOK_SCRIPT = os.path.join(ROOT, "hooks", "protect_directories.py")
+
+
+def _load_bundle_builder():
+    spec = importlib.util.spec_from_file_location(
+        "build_hook_bundle", os.path.join(ROOT, "scripts", "build_hook_bundle.py")
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_invocations(command: list, hook_input: str, runs: int) -> list:
+    """Run command once per iteration with hook_input on stdin; return ms timings."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=hook_input, capture_output=True, text=True, check=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=50, help="invocations per variant (default: 50)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = _load_bundle_builder().build_bundle(os.path.join(tmp, "block-hooks.pyz"))
+        protected = os.path.join(tmp, "protected")
+        os.makedirs(protected)
+        with open(os.path.join(protected, ".block"), "w", encoding="utf-8") as f:
+            f.write('{"blocked": ["*.lock"]}')
+
+        scenarios = {
+            "no marker": os.path.join(tmp, "free", "file.txt"),
+            "protected tree": os.path.join(protected, "file.txt"),
+        }
+        variants = {
+            "plain script": [sys.executable, HOOK_SCRIPT],
+            "bundle -E -s -S": [sys.executable, "-E", "-s", "-S", bundle, "protect"],
+        }
+
+        print(f"Python {sys.version.split()[0]}, {args.runs} runs per variant (median ms)")
+        for scenario, target in scenarios.items():
+            hook_input = json.dumps({"tool_name": "Edit", "tool_input": {"file_path": target}})
+            medians = {}
+            for variant, command in variants.items():
+                medians[variant] = statistics.median(time_invocations(command, hook_input, args.runs))
+            plain, bundled = medians["plain script"], medians["bundle -E -s -S"]
+            print(
+                f"  {scenario:<15} plain {plain:6.1f}  bundle {bundled:6.1f}"
+                f"  ({(plain - bundled) / plain * 100:.0f}% faster)"
+            )
+
+
+if __name__ == "__main__":
+    main()
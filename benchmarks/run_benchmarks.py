@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmarks for the PreToolUse hook.
+
+Every sample starts a fresh process with one hook input on stdin and records
+wall time. The process imports protect_directories the way run-hook.cmd does
+without a bundle, so the cached bytecode is used as it is in real hook calls.
+Each scenario builds its own fixture tree in a temporary directory.
+
+Scenarios:
+  cold-start          Edit in a tree with no markers (interpreter start + quick exit)
+  quick-exit-deep     Edit 40 directories deep with no markers anywhere above
+  deep-hierarchy      Edit under 25 nested .block files, each adding a pattern
+  large-blocked-list  Edit against a .block listing 5000 non-matching blocked patterns
+  large-allowed-list  Edit against a .block listing 5000 allowed patterns (last one matches)
+  long-bash-command   Bash command touching 300 files in a protected tree
+  agent-resolution    Agent-scoped .block with 20 subagents and 2 MB transcripts each
+
+Usage:
+  python3 benchmarks/run_benchmarks.py [--runs N] [--only NAME ...]
+  python3 benchmarks/run_benchmarks.py --save benchmarks/baseline.json
+  python3 benchmarks/run_benchmarks.py --compare benchmarks/baseline.json [--threshold 15]
+
+--compare exits with status 1 if any scenario's p50 regressed by more than
+--threshold percent against the saved baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOOKS_DIR = os.path.join(ROOT, "hooks")
+
+# Same invocation as the non-bundle branch of hooks/run-hook.cmd
+HOOK_COMMAND = [
+    sys.executable,
+    "-c",
+    "import sys; sys.path[0] = sys.argv.pop(1); import protect_directories; protect_directories.main()",
+    HOOKS_DIR,
+]
+
+
+def _write(path: str, content: str = "") -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _edit(file_path: str) -> dict:
+    return {"tool_name": "Edit", "tool_input": {"file_path": file_path, "old_string": "a", "new_string": "b"}}
+
+
+# Each scenario takes a scratch directory and returns the hook input to time.
+
+def scenario_cold_start(tmp: str) -> dict:
+    return _edit(os.path.join(tmp, "free", "file.txt"))
+
+
+def scenario_quick_exit_deep(tmp: str) -> dict:
+    deep = os.path.join(tmp, *(f"d{i}" for i in range(40)))
+    return _edit(os.path.join(deep, "file.txt"))
+
+
+def scenario_deep_hierarchy(tmp: str) -> dict:
+    current = tmp
+    for i in range(25):
+        current = os.path.join(current, f"level{i}")
+        _write(os.path.join(current, ".block"), json.dumps({"blocked": [f"level{i}-*.tmp"]}))
+    return _edit(os.path.join(current, "file.txt"))
+
+
+def _pattern(i: int) -> str:
+    kinds = (f"generated/file{i}.json", f"*.ext{i}", f"out{i}/**", f"src/**/mod{i}_*.py")
+    return kinds[i % len(kinds)]
+
+
+def scenario_large_blocked_list(tmp: str) -> dict:
+    patterns = [_pattern(i) for i in range(5000)]
+    _write(os.path.join(tmp, "project", ".block"), json.dumps({"blocked": patterns}))
+    return _edit(os.path.join(tmp, "project", "src", "app", "main.py"))
+
+
+def scenario_large_allowed_list(tmp: str) -> dict:
+    patterns = [_pattern(i) for i in range(4999)] + ["src/app/main.py"]
+    _write(os.path.join(tmp, "project", ".block"), json.dumps({"allowed": patterns}))
+    return _edit(os.path.join(tmp, "project", "src", "app", "main.py"))
+
+
+def scenario_long_bash_command(tmp: str) -> dict:
+    project = os.path.join(tmp, "project")
+    _write(os.path.join(project, ".block"), json.dumps({"blocked": ["*.lock", "dist/**"]}))
+    files = " ".join(os.path.join(project, "src", f"file{i}.txt") for i in range(300))
+    return {"tool_name": "Bash", "tool_input": {"command": f"touch {files}"}}
+
+
+def scenario_agent_resolution(tmp: str) -> dict:
+    project = os.path.join(tmp, "project")
+    _write(os.path.join(project, ".block"), json.dumps({"agents": ["Explore"]}))
+
+    session = os.path.join(tmp, "session")
+    agents = {f"agent{i}": "Explore" if i % 2 else "Plan" for i in range(20)}
+    _write(os.path.join(session, "subagents", ".agent_types.json"), json.dumps(agents))
+    filler = json.dumps({"type": "assistant", "tool_use_id": "toolu_filler", "text": "x" * 200}) + "\n"
+    for i, agent_id in enumerate(agents):
+        lines = filler * (2 * 1024 * 1024 // len(filler))
+        if i == len(agents) - 1:
+            lines += json.dumps({"type": "tool_use", "tool_use_id": "toolu_target"}) + "\n"
+        _write(os.path.join(session, "subagents", f"{agent_id}.jsonl"), lines)
+
+    hook_input = _edit(os.path.join(project, "file.txt"))
+    hook_input["tool_use_id"] = "toolu_target"
+    hook_input["transcript_path"] = os.path.join(session, "main.jsonl")
+    return hook_input
+
+
+SCENARIOS = {
+    "cold-start": scenario_cold_start,
+    "quick-exit-deep": scenario_quick_exit_deep,
+    "deep-hierarchy": scenario_deep_hierarchy,
+    "large-blocked-list": scenario_large_blocked_list,
+    "large-allowed-list": scenario_large_allowed_list,
+    "long-bash-command": scenario_long_bash_command,
+    "agent-resolution": scenario_agent_resolution,
+}
+
+
+def time_hook(hook_input: dict, runs: int, command: "list | None" = None) -> list:
+    """Run the hook once per sample and return wall times in milliseconds."""
+    command = command or HOOK_COMMAND
+    payload = json.dumps(hook_input)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=payload, capture_output=True, text=True, check=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: list) -> dict:
+    """Return p50/p95/p99 (ms) for a list of samples."""
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "runs": len(timings),
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+    }
+
+
+def run(names: list, runs: int) -> dict:
+    """Run the selected scenarios and return {name: summary}."""
+    results = {}
+    for name in names:
+        with tempfile.TemporaryDirectory() as tmp:
+            hook_input = SCENARIOS[name](tmp)
+            time_hook(hook_input, 2)  # warm the page cache
+            results[name] = summarize(time_hook(hook_input, runs))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print p50 deltas against a baseline; return the regressed scenario names."""
+    regressions = []
+    for name, summary in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"  {name:<20} (no baseline)")
+            continue
+        delta = (summary["p50"] - base["p50"]) / base["p50"] * 100
+        flag = ""
+        if delta > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<20} p50 {base['p50']:8.2f} -> {summary['p50']:8.2f} ms ({delta:+.1f}%){flag}")
+    return regressions
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmarks for the .block hook.")
+    parser.add_argument("--runs", type=int, default=30, help="samples per scenario (default: 30)")
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare p50 against a JSON baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=15.0, help="p50 regression threshold in percent (default: 15)"
+    )
+    args = parser.parse_args()
+    if args.runs < 2:
+        parser.error("--runs must be at least 2")
+
+    results = run(args.only or list(SCENARIOS), args.runs)
+
+    print(f"Python {platform.python_version()} on {platform.system()}, {args.runs} runs per scenario")
+    print(f"  {'scenario':<20} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for name, summary in results.items():
+        print(f"  {name:<20} {summary['p50']:8.2f} {summary['p95']:8.2f} {summary['p99']:8.2f}")
+
+    if args.save:
+        document = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "runs": args.runs,
+            },
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare}:")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Thin PreToolUse client for protect_daemon.py.
+
+run-hook.cmd calls this instead of protect_directories.py when
+BLOCK_DAEMON_SOCKET is set. It forwards the raw hook input to the daemon and
+prints the decision. If the daemon is missing, stale, slow or failing, the
+input is evaluated in-process with protect_directories.py so protection
+never depends on the daemon being up. The time spent waiting for the daemon
+is taken off the fallback's BLOCK_SCAN_TIMEOUT_MS, so both together stay
+within the hook timeout.
+
+Only os, sys, socket and time are imported on the daemon path; the full hook
+is imported lazily for the fallback.
+"""
+
+import os
+import socket
+import sys
+import time
+
+HOOK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(HOOK_DIR, "protect_directories.py")
+
+# Seconds to wait for the daemon before evaluating in-process instead.
+_DAEMON_TIMEOUT = 2.0
+
+
+def query_daemon(socket_path: str, hook_input: bytes) -> "bytes | None":
+    """Ask the daemon for a decision.
+
+    Returns the hook's stdout bytes, or None if the caller must fall back.
+    """
+    try:
+        st = os.stat(SCRIPT_PATH)
+        version = f"{st.st_mtime_ns}:{st.st_size}".encode("ascii")
+        # Decisions depend on BLOCK_* settings, so the daemon applies ours
+        settings = [key + b"=" + value for key, value in os.environb.items() if key.startswith(b"BLOCK_")]
+        request = b"\0".join(
+            (b"v2", version, os.fsencode(os.getcwd()), str(len(settings)).encode("ascii"), *settings, hook_input)
+        )
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(_DAEMON_TIMEOUT)
+            sock.connect(socket_path)
+            sock.sendall(request)
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except (OSError, AttributeError):
+        # No daemon, timeout, or no AF_UNIX (or os.environb) on this platform
+        return None
+
+    status, _, output = b"".join(chunks).partition(b"\0")
+    if status != b"ok":
+        return None
+    return output
+
+
+def evaluate_in_process(hook_input: bytes, waited: float = 0.0) -> bytes:
+    """Evaluate the hook input with protect_directories.py in this process.
+
+    waited is the seconds already spent on the daemon; a descendant scan
+    gets only what is left of its wall-clock limit.
+    """
+    import json
+
+    sys.path.insert(0, HOOK_DIR)
+    import protect_directories
+
+    timeout_ms = protect_directories._env_int("BLOCK_SCAN_TIMEOUT_MS", protect_directories.DEFAULT_SCAN_TIMEOUT_MS)
+    if waited and timeout_ms:
+        os.environ["BLOCK_SCAN_TIMEOUT_MS"] = str(max(1, timeout_ms - round(waited * 1000)))
+    decision = protect_directories.evaluate_hook_input(hook_input.decode("utf-8", "surrogateescape"))
+    return (json.dumps(decision) + "\n").encode("utf-8") if decision else b""
+
+
+def main():
+    """Main entry point."""
+    hook_input = sys.stdin.buffer.read()
+
+    output = None
+    waited = 0.0
+    socket_path = os.environ.get("BLOCK_DAEMON_SOCKET", "")
+    if socket_path:
+        started = time.monotonic()
+        output = query_daemon(socket_path, hook_input)
+        waited = time.monotonic() - started
+    if output is None:
+        output = evaluate_in_process(hook_input, waited)
+
+    if output:
+        sys.stdout.buffer.write(output)
+        sys.stdout.buffer.flush()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Persistent protection daemon for the .block PreToolUse hook (opt-in).
+
+Keeps protect_directories.py loaded in one long-lived process so parsed
+marker configs and the interpreter itself survive between tool calls.
+protect_client.py forwards each hook input over a Unix domain socket and
+prints the decision; when the daemon is missing, stale or failing, the
+client evaluates in-process exactly as run-hook.cmd did before.
+
+Usage:
+  python3 protect_daemon.py --socket /path/to/block.sock [--idle-timeout SECONDS] [--watch]
+  export BLOCK_DAEMON_SOCKET=/path/to/block.sock   # picked up by run-hook.cmd
+
+Wire protocol (one request per connection, NUL-separated header):
+  request:  b"v2" NUL <script version> NUL <client cwd> NUL <count>
+            (NUL <KEY=VALUE>)*count NUL <raw hook input>
+  response: b"ok" NUL <hook stdout>  |  b"stale" NUL  |  b"error" NUL
+
+The KEY=VALUE entries are the client's BLOCK_* environment variables. They
+replace the daemon's own for the request, so ceilings, caches and scan
+limits follow the caller exactly as an in-process hook would.
+
+The script version is "<mtime_ns>:<size>" of protect_directories.py. A
+mismatch means the plugin was updated after the daemon started; the daemon
+answers "stale" and shuts down so the next start picks up the new code.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import sys
+
+import protect_directories
+
+PROTOCOL_VERSION = b"v2"
+SCRIPT_PATH = os.path.abspath(protect_directories.__file__)
+
+
+def script_version(script_path: str) -> str:
+    """Return the version token for a protect_directories.py file."""
+    st = os.stat(script_path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def apply_settings(settings: list) -> None:
+    """Replace this process's BLOCK_* environment with KEY=VALUE entries."""
+    for key in [key for key in os.environ if key.startswith("BLOCK_")]:
+        del os.environ[key]
+    for entry in settings:
+        key, _, value = os.fsdecode(entry).partition("=")
+        if key.startswith("BLOCK_"):
+            os.environ[key] = value
+
+
+def _recv_all(sock: socket.socket) -> bytes:
+    """Read from a socket until the peer shuts down its write side."""
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class _HookRequestHandler(socketserver.BaseRequestHandler):
+    """Evaluate one forwarded hook input per connection."""
+
+    server: "ProtectionDaemon"
+
+    def handle(self) -> None:
+        parts = _recv_all(self.request).split(b"\0", 4)
+        if len(parts) != 5 or parts[0] != PROTOCOL_VERSION or not parts[3].isdigit():
+            self.request.sendall(b"error\0")
+            return
+
+        _, version, cwd, count, rest = parts
+        fields = rest.split(b"\0", int(count))
+        if len(fields) != int(count) + 1:
+            self.request.sendall(b"error\0")
+            return
+        settings, hook_input = fields[:-1], fields[-1]
+        if version.decode("ascii", "replace") != self.server.version:
+            self.request.sendall(b"stale\0")
+            self.server.request_shutdown()
+            return
+
+        try:
+            # Requests are served one at a time, so chdir and the environment
+            # are safe to change and keep the decision exactly as in the
+            # client's process.
+            os.chdir(os.fsdecode(cwd))
+            apply_settings(settings)
+            decision = protect_directories.evaluate_hook_input(
+                hook_input.decode("utf-8", "surrogateescape")
+            )
+        except Exception:
+            # Any failure makes the client evaluate in-process instead
+            self.request.sendall(b"error\0")
+            return
+
+        output = json.dumps(decision) + "\n" if decision else ""
+        self.request.sendall(b"ok\0" + output.encode("utf-8"))
+
+
+class ProtectionDaemon(socketserver.UnixStreamServer):
+    """Single-threaded Unix socket server answering hook inputs."""
+
+    def __init__(self, socket_path: str, idle_timeout: float = 0) -> None:
+        self.version = script_version(SCRIPT_PATH)
+        if idle_timeout > 0:
+            self.timeout = idle_timeout
+        # Absolute, since requests chdir into the client's working directory
+        self.socket_path = os.path.abspath(socket_path)
+        self._shutdown_requested = False
+        _remove_stale_socket(self.socket_path)
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(self.socket_path, _HookRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def request_shutdown(self) -> None:
+        """Stop serving after the current request."""
+        self._shutdown_requested = True
+
+    def handle_timeout(self) -> None:
+        """Exit once the daemon has been idle for idle_timeout seconds."""
+        self._shutdown_requested = True
+
+    def serve(self) -> None:
+        """Serve requests until shutdown is requested."""
+        try:
+            while not self._shutdown_requested:
+                self.handle_request()
+        finally:
+            self.server_close()
+            with contextlib.suppress(OSError):
+                os.unlink(self.socket_path)
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Remove a leftover socket file, refusing to replace a live daemon."""
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise SystemExit(f"protect_daemon: another daemon is already listening on {socket_path}")
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Serve .block decisions over a Unix socket.")
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("BLOCK_DAEMON_SOCKET", ""),
+        help="socket path (default: $BLOCK_DAEMON_SOCKET)",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=0,
+        help="exit after this many idle seconds (default: never)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="track .block files with inotify instead of re-checking them on every call (Linux)",
+    )
+    args = parser.parse_args()
+
+    if not args.socket:
+        parser.error("--socket or BLOCK_DAEMON_SOCKET is required")
+    if not hasattr(socket, "AF_UNIX"):
+        parser.error("Unix domain sockets are not available on this platform")
+
+    if args.watch and not protect_directories.enable_marker_watch():
+        print("protect_daemon: inotify is not available; checking markers by stat", file=sys.stderr)
+    daemon = ProtectionDaemon(args.socket, args.idle_timeout)
+    print(f"protect_daemon: listening on {args.socket}", file=sys.stderr)
+    daemon.serve()
+
+
+if __name__ == "__main__":
+    main()
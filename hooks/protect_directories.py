@@ -35,27 +35,234 @@ Patterns support wildcards:
   * = any characters except path separator
   ** = any characters including path separator (recursive)
   ? = single character
+
+Usage:
+  protect_directories.py           evaluate one hook input from stdin (PreToolUse hook)
+  protect_directories.py --serve   answer newline-delimited JSON requests (OpenCode worker)
+  protect_directories.py --batch   read JSONL hook inputs, write one JSONL decision per line
 """
 
-import json
+from __future__ import annotations
+
+# Only os/sys/stat (already loaded by interpreter startup) are imported here.
+# The common "no marker anywhere" case returns before anything else is
+# imported; json, re, shlex and warnings are imported where they are needed.
 import os
-import re
-import shlex
+import stat
 import sys
-import warnings
-from pathlib import Path
-from typing import Optional, cast
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import re
+    from typing import Any, Callable, Iterable, TextIO, TypeVar
+
+    _CacheFileT = TypeVar("_CacheFileT", bound="_CacheFile")
 
 # Regex special characters that need escaping
 REGEX_SPECIAL_CHARS = ".^$[](){}+|\\"
 
 MARKER_FILE_NAME = ".block"
 LOCAL_MARKER_FILE_NAME = ".block.local"
+# Written by --compile at the project root; never writable by tool calls
+COMPILED_MANIFEST_NAME = ".block.compiled"
+MANIFEST_VERSION = 1
+
+# Directory names the descendant scan for directory targets does not enter
+# (override with BLOCK_SCAN_PRUNE), and its default budget: no directory cap,
+# and a wall-clock limit just under the 5000 ms hook timeout
+DEFAULT_SCAN_PRUNE = (
+    ".git", ".hg", ".svn", "node_modules", ".venv", "venv", "__pycache__",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache",
+)
+DEFAULT_SCAN_MAX_DIRS = 0
+DEFAULT_SCAN_TIMEOUT_MS = 4000
+
+# Parsed marker configs keyed by path, validated by stat signature. A one-shot
+# hook parses each marker once anyway; long-lived evaluators (protect_daemon.py)
+# reuse entries until the marker file changes.
+_CONFIG_CACHE: dict[str, tuple[tuple[int, int, int], BlockConfig]] = {}
+
+# Merged .block/.block.local config per directory, validated by both markers'
+# stat signatures, and merged hierarchy configs per chain of marker
+# directories (child first), validated by the identity of each link's config.
+# Shared configs are never mutated, so sibling paths and consecutive decisions
+# reuse one merge.
+_DIR_CONFIGS: dict[str, tuple[tuple, BlockConfig]] = {}
+_CHAIN_CONFIGS: dict[tuple[str, ...], tuple[tuple[BlockConfig, ...], BlockConfig]] = {}
+
+# Loaded compiled manifests by path, validated by stat signature
+_MANIFESTS: dict[str, tuple[tuple[int, int, int], _Manifest]] = {}
+
+# Parsed git indexes by worktree root, validated by the index file's signature
+_GIT_INDEXES: dict[str, tuple[tuple[int, int, int], _GitIndex]] = {}
+
+
+class _MarkerSnapshot:
+    """Marker lookups memoized while the filesystem is treated as unchanging.
+
+    Active for one decision (see _with_marker_snapshot), so the quick check,
+    the hierarchy walk and the directory checks stat each ancestor once, or
+    for a whole batch (see evaluate_batch).
+    """
+
+    __slots__ = ("caches", "descendants", "manifests", "markers", "repo_roots")
+
+    def __init__(self) -> None:
+        # On-disk caches (BLOCK_CACHE_DIR) by class, looked up on first use
+        self.caches: dict[type, _CacheFile | None] = {}
+        # Compiled manifest path -> loaded manifest (or None)
+        self.manifests: dict[str, _Manifest | None] = {}
+        # directory -> (has .block, has .block.local)
+        self.markers: dict[str, tuple[bool, bool]] = {}
+        # directory -> is a git worktree root (see _is_repo_root)
+        self.repo_roots: dict[str, bool] = {}
+        # directory -> first descendant marker path (or None)
+        self.descendants: dict[str, str | None] = {}
+
+
+_snapshot: _MarkerSnapshot | None = None
+
+# Live marker state kept current by inotify (see enable_marker_watch)
+_watcher: _MarkerWatcher | None = None
+
+# Parsed BLOCK_CEILING_DIRECTORIES, keyed by the raw environment value
+_ceilings: tuple[str, frozenset[str]] = ("", frozenset())
+
+
+class _Record:
+    """Slotted record with read-only mapping access to its fields.
+
+    Configs and results were plain dicts; ``record["key"]`` and
+    ``record.get("key")`` keep callers written against that form working.
+    """
+
+    __slots__: tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a field's value, or default for an unknown key."""
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def keys(self) -> tuple[str, ...]:
+        """Return the field names."""
+        return self.__slots__
+
+    def astuple(self) -> tuple:
+        """Return the field values in __slots__ order."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, dict):
+            return dict(zip(self.__slots__, self.astuple())) == other
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class BlockConfig(_Record):
+    """Parsed or merged .block configuration.
+
+    Configs are shared by the parse and merge caches, so they are never
+    modified once built.
+    """
+
+    __slots__ = (
+        "allowed", "blocked", "guide", "is_empty", "has_error", "error_message", "has_allowed_key",
+        "has_blocked_key", "allow_all", "agents", "disable_main_agent", "has_agents_key",
+        "has_disable_main_agent_key",
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        allowed: list | None = None,
+        blocked: list | None = None,
+        guide: str = "",
+        is_empty: bool = True,
+        has_error: bool = False,
+        error_message: str = "",
+        has_allowed_key: bool = False,
+        has_blocked_key: bool = False,
+        allow_all: bool = False,
+        agents: list | None = None,
+        disable_main_agent: bool = False,
+        has_agents_key: bool = False,
+        has_disable_main_agent_key: bool = False,
+    ) -> None:
+        self.allowed = allowed if allowed is not None else []
+        self.blocked = blocked if blocked is not None else []
+        self.guide = guide
+        self.is_empty = is_empty
+        self.has_error = has_error
+        self.error_message = error_message
+        self.has_allowed_key = has_allowed_key
+        self.has_blocked_key = has_blocked_key
+        self.allow_all = allow_all
+        self.agents = agents
+        self.disable_main_agent = disable_main_agent
+        self.has_agents_key = has_agents_key
+        self.has_disable_main_agent_key = has_disable_main_agent_key
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> BlockConfig:
+        """Rebuild a config from astuple() output."""
+        if len(values) != len(cls.__slots__):
+            raise ValueError("config tuple has the wrong number of fields")
+        config = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(config, name, value)
+        return config
+
+
+def _as_config(config: BlockConfig | dict) -> BlockConfig:
+    """Accept a config given in the former dict form."""
+    return config if isinstance(config, BlockConfig) else BlockConfig(**config)
+
+
+class ProtectionInfo(_Record):
+    """Where a path's effective config comes from, and the config itself."""
+
+    __slots__ = ("target_file", "marker_path", "marker_directory", "config")
+
+    def __init__(self, target_file: str, marker_path: str, marker_directory: str, config: BlockConfig) -> None:
+        self.target_file = target_file
+        self.marker_path = marker_path
+        self.marker_directory = marker_directory
+        self.config = config
+
+
+class BlockResult(_Record):
+    """Outcome of checking one path against its effective config."""
+
+    __slots__ = ("should_block", "reason", "is_config_error", "guide")
+
+    def __init__(self, should_block: bool, reason: str, is_config_error: bool, guide: str) -> None:
+        self.should_block = should_block
+        self.reason = reason
+        self.is_config_error = is_config_error
+        self.guide = guide
+
+
+# Shared result for every allowed path
+_ALLOW_RESULT = BlockResult(False, "", False, "")
 
 
 def _create_empty_config(  # noqa: PLR0913
-    allowed: Optional[list] = None,
-    blocked: Optional[list] = None,
+    allowed: list | None = None,
+    blocked: list | None = None,
     guide: str = "",
     is_empty: bool = True,
     has_error: bool = False,
@@ -63,50 +270,879 @@ def _create_empty_config(  # noqa: PLR0913
     has_allowed_key: bool = False,
     has_blocked_key: bool = False,
     allow_all: bool = False,
-    agents: Optional[list] = None,
+    agents: list | None = None,
     disable_main_agent: bool = False,
     has_agents_key: bool = False,
     has_disable_main_agent_key: bool = False,
-) -> dict:
-    """Create an empty config dict with optional overrides."""
-    return {
-        "allowed": allowed if allowed is not None else [],
-        "blocked": blocked if blocked is not None else [],
-        "guide": guide,
-        "is_empty": is_empty,
-        "has_error": has_error,
-        "error_message": error_message,
-        "has_allowed_key": has_allowed_key,
-        "has_blocked_key": has_blocked_key,
-        "allow_all": allow_all,
-        "agents": agents,
-        "disable_main_agent": disable_main_agent,
-        "has_agents_key": has_agents_key,
-        "has_disable_main_agent_key": has_disable_main_agent_key,
-    }
+) -> BlockConfig:
+    """Create an empty config with optional overrides."""
+    return BlockConfig(
+        allowed=allowed,
+        blocked=blocked,
+        guide=guide,
+        is_empty=is_empty,
+        has_error=has_error,
+        error_message=error_message,
+        has_allowed_key=has_allowed_key,
+        has_blocked_key=has_blocked_key,
+        allow_all=allow_all,
+        agents=agents,
+        disable_main_agent=disable_main_agent,
+        has_agents_key=has_agents_key,
+        has_disable_main_agent_key=has_disable_main_agent_key,
+    )
+
+
+# Files and directories modified this recently are not cached: a change
+# within the same mtime tick would leave the cached entry looking valid.
+_CACHE_RACY_NS = 2_000_000_000
+
+# Loaded on-disk caches by file path (kept for the process lifetime)
+_cache_files: dict[str, _CacheFile] = {}
+
+
+def _path_hash(path: str) -> str:
+    """Stable 64-bit FNV-1a hash of a path, for cache file names."""
+    value = 0xCBF29CE484222325
+    for byte in path.encode("utf-8", "surrogateescape"):
+        value = ((value ^ byte) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return f"{value:016x}"
+
+
+def _cache_file(kind: str) -> str | None:
+    """Path of a per-project cache file under BLOCK_CACHE_DIR, or None if unset.
+
+    The project is the hook's working directory (the project directory
+    Claude Code runs hooks from).
+    """
+    cache_dir = os.environ.get("BLOCK_CACHE_DIR", "")
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, f"{kind}-{_path_hash(os.getcwd())}.marshal")
+
+
+def _write_cache_file(path: str, data: bytes) -> None:
+    """Atomically replace a cache file, creating a protected cache dir."""
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    marker = os.path.join(cache_dir, MARKER_FILE_NAME)
+    if not os.path.exists(marker):
+        # Keep tool calls from forging cache entries
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write('{"guide": "Cache for the .block hook. It is managed automatically."}\n')
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        import contextlib
+
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+class _CacheFile:
+    """A marshal-backed dict persisted under BLOCK_CACHE_DIR (opt-in).
+
+    Several hook processes may load and save the same file: saves replace
+    it atomically, so readers see either version and a lost update only
+    costs a cache miss. Every entry is validated against the filesystem
+    before use, so a stale or corrupt file never changes a decision.
+    """
+
+    __slots__ = ("dirty", "entries", "path")
+
+    KIND = ""
+    VERSION = 1
+    MAX_ENTRIES = 0
+
+    def __init__(self, path: str, entries: dict[str, tuple]) -> None:
+        self.path = path
+        self.entries = entries
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> _CacheFile:
+        """Load a cache file; a missing or unreadable one starts empty."""
+        import marshal
+
+        entries: dict[str, tuple] = {}
+        try:
+            with open(path, "rb") as f:
+                data = marshal.load(f)
+            if (
+                isinstance(data, tuple) and len(data) == 2
+                and data[0] == cls.VERSION and isinstance(data[1], dict)
+            ):
+                entries = data[1]
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        return cls(path, entries)
+
+    def save(self) -> None:
+        """Write the cache back if it changed; failures are ignored."""
+        import marshal
+
+        if not self.dirty:
+            return
+        if len(self.entries) > self.MAX_ENTRIES:
+            self.entries = {}
+        try:
+            _write_cache_file(self.path, marshal.dumps((self.VERSION, self.entries)))
+            self.dirty = False
+        except (OSError, ValueError):
+            pass
+
+    def _store(self, key: str, mtime_ns: int, entry: tuple) -> None:
+        """Cache entry unless mtime_ns is too recent to be trusted."""
+        import time
+
+        if mtime_ns >= time.time_ns() - _CACHE_RACY_NS:
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = entry
+        self.dirty = True
+
+
+def _reachable(prefix: str, candidate: str, prune: frozenset[str]) -> bool:
+    """Return True if os.walk from prefix would descend to candidate."""
+    path = os.path.dirname(prefix)
+    for name in candidate[len(prefix):].split(os.sep):
+        if name in prune:
+            return False
+        path = os.path.join(path, name)
+        try:
+            if not stat.S_ISDIR(os.lstat(path).st_mode):
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class _MarkerIndex(_CacheFile):
+    """Persistent per-project record of where markers are.
+
+    Entries: directory -> (mtime_ns, inode, .block code, .block.local code,
+    subdirectory names or None if not listed yet), with codes 0 = absent,
+    1 = regular file, 2 = other non-directory entry.
+
+    Each directory entry is trusted only while the directory's mtime and
+    inode are unchanged; adding, removing or renaming a marker or a
+    subdirectory changes both the answer and the mtime. Stale or unknown
+    directories are re-read from the filesystem and the entry refreshed, so
+    the index never needs a full rebuild.
+    """
+
+    __slots__ = ("marker_dirs",)
+
+    KIND = "markers"
+    MAX_ENTRIES = 200_000
+
+    def __init__(self, path: str, entries: dict[str, tuple]) -> None:
+        super().__init__(path, entries)
+        # Sorted directories recorded with a regular .block or .block.local,
+        # built on the first range query and kept in step with the entries
+        self.marker_dirs: list[str] | None = None
+
+    def _store(self, key: str, mtime_ns: int, entry: tuple) -> None:
+        super()._store(key, mtime_ns, entry)
+        self._update_marker_dirs(key)
+
+    def _update_marker_dirs(self, key: str) -> None:
+        """Add or remove key in marker_dirs to match its entry."""
+        if self.marker_dirs is None:
+            return
+        import bisect
+
+        entry = self.entries.get(key)
+        has_marker = entry is not None and (entry[2] == 1 or entry[3] == 1)
+        position = bisect.bisect_left(self.marker_dirs, key)
+        present = position < len(self.marker_dirs) and self.marker_dirs[position] == key
+        if has_marker and not present:
+            self.marker_dirs.insert(position, key)
+        elif present and not has_marker:
+            del self.marker_dirs[position]
+
+    def known_descendant(self, dir_path: str, budget: _ScanBudget | None = None) -> str | None:
+        """Find a recorded marker below dir_path that is still there, or None.
+
+        A range query over the sorted marker directories: every path below
+        dir_path sorts between dir_path + os.sep and the first path that no
+        longer has that prefix. A candidate is confirmed by checking its
+        markers and that each directory between dir_path and it is a real,
+        unpruned directory, as os.walk would reach it. None only means no
+        recorded marker was confirmed; unrecorded or changed directories
+        may still hold one (see first_descendant).
+        """
+        import bisect
+
+        if self.marker_dirs is None:
+            self.marker_dirs = sorted(
+                key for key, entry in self.entries.items() if entry[2] == 1 or entry[3] == 1
+            )
+        prefix = os.path.join(os.path.normpath(dir_path), "")
+        prune = frozenset() if budget is None else budget.prune
+        position = bisect.bisect_left(self.marker_dirs, prefix)
+        while position < len(self.marker_dirs) and self.marker_dirs[position].startswith(prefix):
+            candidate = self.marker_dirs[position]
+            position += 1
+            if not _reachable(prefix, candidate, prune):
+                continue
+            has_main, has_local = self.markers(candidate)
+            if has_main:
+                return os.path.join(candidate, MARKER_FILE_NAME)
+            if has_local:
+                return os.path.join(candidate, LOCAL_MARKER_FILE_NAME)
+            # markers() may have dropped the stale candidate from marker_dirs
+            position = bisect.bisect_right(self.marker_dirs, candidate)
+        return None
+
+    def markers(self, directory: str) -> tuple[bool, bool]:
+        """Return (has .block, has .block.local), like _dir_markers."""
+        key = os.path.normpath(directory)
+        try:
+            st = os.stat(key)
+        except OSError:
+            return False, False
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_ino:
+            return entry[2] == 1, entry[3] == 1
+
+        main_path = os.path.join(key, MARKER_FILE_NAME)
+        local_path = os.path.join(key, LOCAL_MARKER_FILE_NAME)
+        result = (os.path.isfile(main_path), os.path.isfile(local_path))
+        if stat.S_ISDIR(st.st_mode) and not (
+            (result[0] and os.path.islink(main_path)) or (result[1] and os.path.islink(local_path))
+        ):
+            self._store(key, st.st_mtime_ns, (st.st_mtime_ns, st.st_ino, int(result[0]), int(result[1]), None))
+        return result
+
+    def _listing(self, key: str) -> tuple:
+        """Return the entry for key with its subdirectories listed.
+
+        Raises OSError when the directory cannot be read.
+        """
+        st = os.stat(key)
+        entry = self.entries.get(key)
+        if (
+            entry is not None
+            and entry[4] is not None
+            and entry[0] == st.st_mtime_ns
+            and entry[1] == st.st_ino
+        ):
+            return entry
+
+        codes = {MARKER_FILE_NAME: 0, LOCAL_MARKER_FILE_NAME: 0}
+        subdirs = []
+        trusted = True
+        with os.scandir(key) as it:
+            for dir_entry in it:
+                # Same classification as os.walk: is_dir() follows symlinks,
+                # symlinked directories are not descended into.
+                try:
+                    is_dir = dir_entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if dir_entry.name in codes:
+                    if not is_dir:
+                        codes[dir_entry.name] = 1 if dir_entry.is_file() else 2
+                    if dir_entry.is_symlink():
+                        trusted = False
+                if is_dir and not dir_entry.is_symlink():
+                    subdirs.append(dir_entry.name)
+
+        entry = (
+            st.st_mtime_ns, st.st_ino,
+            codes[MARKER_FILE_NAME], codes[LOCAL_MARKER_FILE_NAME], tuple(subdirs),
+        )
+        if trusted:
+            self._store(key, st.st_mtime_ns, entry)
+        else:
+            self.entries.pop(key, None)
+            self._update_marker_dirs(key)
+        return entry
+
+    def first_descendant(self, dir_path: str, budget: _ScanBudget | None = None) -> str | None:
+        """Find the first marker below dir_path in os.walk order.
+
+        Raises OSError when any directory cannot be read, so the caller can
+        fall back to _find_descendant_marker (which reports the error), and
+        _ScanIncomplete when the budget runs out.
+        """
+        if budget is None:
+            budget = _ScanBudget.from_env()
+        top = os.path.normpath(dir_path)
+        stack = [(top, True)]
+        while stack:
+            key, is_top = stack.pop()
+            budget.visit()
+            entry = self._listing(key)
+            if not is_top:
+                if entry[2]:
+                    return os.path.join(key, MARKER_FILE_NAME)
+                if entry[3]:
+                    return os.path.join(key, LOCAL_MARKER_FILE_NAME)
+            stack.extend((os.path.join(key, name), False) for name in reversed(budget.subdirectories(entry[4])))
+        return None
+
+
+class _ConfigCache(_CacheFile):
+    """Parsed and merged per-directory configs.
+
+    Entries: directory -> (.block signature, .block.local signature, merged
+    config as BlockConfig.astuple()), where a signature is (mtime_ns, size,
+    inode) or None for a missing file. An entry is used only while both
+    signatures match.
+    """
+
+    __slots__ = ()
+
+    KIND = "configs"
+    VERSION = 2
+    MAX_ENTRIES = 10_000
+
+
+class _VerdictCache(_CacheFile):
+    """Effective configs that do not depend on the file name.
+
+    Entries: marker directories of a chain (nearest first, NUL-joined) ->
+    (per-directory marker signatures as in _ConfigCache, verdict, guide),
+    where the verdict is "all" (block everything) or "none" (an empty
+    blocked list). Chains with patterns, agent rules or errors are not
+    recorded. A hit answers test_directory_protected() without loading the
+    config cache or parsing any marker.
+    """
+
+    __slots__ = ()
+
+    KIND = "verdicts"
+    MAX_ENTRIES = 10_000
+
+
+class _GitIndexCache(_CacheFile):
+    """Tracked marker directories read from git index files (BLOCK_GIT_INDEX=1).
+
+    Entries: worktree root -> (index file signature, marker directories as
+    returned by _parse_git_index), where the signature is the index
+    file's (mtime_ns, size, inode). Git replaces the index by renaming a
+    new file over it, so any update changes the signature.
+    """
+
+    __slots__ = ()
+
+    KIND = "gitindex"
+    MAX_ENTRIES = 64
+
+
+def _active_cache(cls: type[_CacheFileT]) -> _CacheFileT | None:
+    """The cls cache for this decision, or None if BLOCK_CACHE_DIR is unset."""
+    if _snapshot is not None and cls in _snapshot.caches:
+        return _snapshot.caches[cls]  # type: ignore[return-value]
+
+    cache = None
+    path = _cache_file(cls.KIND)
+    if path is not None:
+        cache = _cache_files.get(path)
+        if cache is None:
+            cache = cls.load(path)
+            _cache_files[path] = cache
+
+    if _snapshot is not None:
+        _snapshot.caches[cls] = cache
+    return cache  # type: ignore[return-value]
+
+
+def _save_caches(snapshot: _MarkerSnapshot) -> None:
+    """Write back the on-disk caches a snapshot used."""
+    for cache in snapshot.caches.values():
+        if cache is not None:
+            cache.save()
+
+
+class _MarkerWatcher:
+    """Marker state of watched directories, kept current by Linux inotify.
+
+    For long-lived evaluators (protect_daemon.py --watch). The first lookup
+    of a directory adds an inotify watch and then stats its markers; later
+    lookups are answered from memory until an event for the directory
+    arrives. Events are drained before each decision: a change to a marker
+    forgets that directory's state and drops its parsed configs and every
+    hierarchy merge that includes it, and an entry that is created, removed
+    or renamed forgets the whole subtree below its name, which may be a
+    directory or a symlink that watched paths go through. When no watch can be added (the
+    kernel's max_user_watches is used up) or the event queue overflows,
+    lookups fall back to stat validation.
+    """
+
+    # inotify(7) event bits
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_UNMOUNT = 0x2000
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_ISDIR = 0x40000000
+    # Events that bind a name to a different entry
+    ENTRY_EVENTS = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    )
+    ENOSPC = 28
+
+    __slots__ = ("add_watch", "directories", "fd", "full", "remove_watch", "states")
+
+    def __init__(self, fd: int, add_watch: Callable[[int, bytes, int], int], remove_watch: Callable[[int, int], int]):
+        self.fd = fd
+        self.add_watch = add_watch
+        self.remove_watch = remove_watch
+        # watch descriptor <-> directory
+        self.directories: dict[int, str] = {}
+        # directory -> [watch descriptor, (has .block, has .block.local) or
+        # None, (main signature, local signature) or None]
+        self.states: dict[str, list] = {}
+        # Set when the kernel refused a watch for lack of space
+        self.full = False
+
+    @classmethod
+    def start(cls) -> _MarkerWatcher | None:
+        """Open an inotify instance; None where inotify is unavailable."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            import ctypes
+
+            libc = ctypes.CDLL(None, use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        def add_watch(fd: int, path: bytes, mask: int) -> int:
+            wd = libc.inotify_add_watch(fd, path, mask)
+            return wd if wd >= 0 else -ctypes.get_errno()
+
+        return cls(fd, add_watch, libc.inotify_rm_watch)
+
+    def close(self) -> None:
+        os.close(self.fd)
+        self.directories.clear()
+        self.states.clear()
+
+    def _watch(self, directory: str) -> list | None:
+        """Return the state of directory, adding a watch if needed; None if unwatched."""
+        state = self.states.get(directory)
+        if state is not None or self.full:
+            return state
+        wd = self.add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            if wd == -self.ENOSPC:
+                self.full = True
+            return None
+        # inotify returns the existing descriptor for a directory watched
+        # under another spelling; keep one name per descriptor
+        old = self.directories.get(wd)
+        if old is not None and old != directory:
+            self.states.pop(old, None)
+        self.directories[wd] = directory
+        state = self.states[directory] = [wd, None, None]
+        return state
+
+    def markers(self, directory: str) -> tuple[bool, bool]:
+        """Return (has .block, has .block.local), from memory once watched."""
+        state = self._watch(directory)
+        if state is not None and state[1] is not None:
+            remembered: tuple[bool, bool] = state[1]
+            return remembered
+        main_path = os.path.join(directory, MARKER_FILE_NAME)
+        local_path = os.path.join(directory, LOCAL_MARKER_FILE_NAME)
+        result = (os.path.isfile(main_path), os.path.isfile(local_path))
+        if state is not None and not (self._linked(main_path) or self._linked(local_path)):
+            state[1] = result
+        return result
+
+    @staticmethod
+    def _linked(marker_path: str) -> bool:
+        """Return True if a marker can change without an event in its directory.
+
+        A symlinked or hard-linked marker can be changed through another
+        path, which only a watch on that path's directory would report.
+        """
+        try:
+            st = os.lstat(marker_path)
+        except OSError:
+            return False
+        return stat.S_ISLNK(st.st_mode) or st.st_nlink > 1
+
+    def signature(self, directory: str, has_main: bool, has_local: bool) -> tuple | None:
+        """Return the remembered marker signatures of a watched directory, or None."""
+        state = self.states.get(directory)
+        if state is None or state[1] != (has_main, has_local):
+            return None
+        if state[2] is None:
+            main_sig = _marker_signature(os.path.join(directory, MARKER_FILE_NAME)) if has_main else None
+            local_sig = _marker_signature(os.path.join(directory, LOCAL_MARKER_FILE_NAME)) if has_local else None
+            state[2] = (main_sig, local_sig)
+        return state[2]  # type: ignore[no-any-return]
+
+    def drain(self) -> None:
+        """Apply every queued event."""
+        import struct
+
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if not data:
+                return
+            offset = 0
+            while offset + 16 <= len(data):
+                wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+                name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+                offset += 16 + length
+                self._apply(wd, mask, name)
+
+    def _apply(self, wd: int, mask: int, name: str) -> None:
+        if mask & self.IN_Q_OVERFLOW:
+            # Events were lost: revalidate everything by stat
+            for state in self.states.values():
+                state[1] = state[2] = None
+            return
+        directory = self.directories.get(wd)
+        if directory is None:
+            return
+        if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED | self.IN_UNMOUNT):
+            self._forget(directory)
+            return
+        if name and mask & (self.ENTRY_EVENTS | self.IN_ISDIR):
+            # A retargeted symlink changes what is below its path without an
+            # event in the directories watched through it
+            self._forget(os.path.join(directory, name))
+        if not name or name in (MARKER_FILE_NAME, LOCAL_MARKER_FILE_NAME):
+            # A marker changed, or the directory's own permissions did
+            changed = self.states.get(directory)
+            if changed is not None:
+                changed[1] = changed[2] = None
+            _invalidate_directory(directory)
+
+    def _forget(self, top: str) -> None:
+        """Drop the state and watches of top and every directory below it."""
+        prefix = os.path.join(top, "")
+        for directory in [d for d in self.states if d == top or d.startswith(prefix)]:
+            wd = self.states.pop(directory)[0]
+            if self.directories.get(wd) == directory:
+                del self.directories[wd]
+                self.remove_watch(self.fd, wd)
+                self.full = False
+            _invalidate_directory(directory)
+
+
+def _invalidate_directory(directory: str) -> None:
+    """Drop the in-process configs of one directory and the merges that include it."""
+    _DIR_CONFIGS.pop(directory, None)
+    _CONFIG_CACHE.pop(os.path.join(directory, MARKER_FILE_NAME), None)
+    _CONFIG_CACHE.pop(os.path.join(directory, LOCAL_MARKER_FILE_NAME), None)
+    for chain in [chain for chain in _CHAIN_CONFIGS if directory in chain]:
+        del _CHAIN_CONFIGS[chain]
+
+
+def enable_marker_watch() -> bool:
+    """Track markers with inotify for the rest of the process (Linux only).
+
+    Meant for long-lived evaluators such as protect_daemon.py; returns
+    False (and keeps stat validation) where inotify is unavailable.
+    """
+    global _watcher  # noqa: PLW0603 - process-wide, set once at startup
+    if _watcher is None:
+        _watcher = _MarkerWatcher.start()
+    return _watcher is not None
+
+
+def _dir_markers(directory: str) -> tuple[bool, bool]:
+    """Return (has .block, has .block.local) for a single directory."""
+    if _snapshot is not None:
+        cached = _snapshot.markers.get(directory)
+        if cached is not None:
+            return cached
+
+    index = None if _watcher is not None else _active_cache(_MarkerIndex)
+    if _watcher is not None:
+        result = _watcher.markers(directory)
+    elif index is not None:
+        result = index.markers(directory)
+    else:
+        result = (
+            os.path.isfile(os.path.join(directory, MARKER_FILE_NAME)),
+            os.path.isfile(os.path.join(directory, LOCAL_MARKER_FILE_NAME)),
+        )
+    if _snapshot is not None:
+        _snapshot.markers[directory] = result
+    return result
+
+
+def _ceiling_directories() -> frozenset[str]:
+    """Absolute directories listed in BLOCK_CEILING_DIRECTORIES."""
+    global _ceilings  # noqa: PLW0603 - parsed once per environment value
+    raw = os.environ.get("BLOCK_CEILING_DIRECTORIES", "")
+    if raw != _ceilings[0]:
+        entries = set()
+        for entry in raw.split(os.pathsep):
+            if entry and os.path.isabs(entry):
+                entries.add(os.path.normpath(entry).replace("\\", "/"))
+        _ceilings = (raw, frozenset(entries))
+    return _ceilings[1]
+
+
+def _is_repo_root(directory: str) -> bool:
+    """Return True if directory is a git worktree root.
+
+    Its .git directory, or the directory a .git file points to, must hold a
+    HEAD file, so an empty .git file or directory does not count.
+    """
+    if _snapshot is not None:
+        cached = _snapshot.repo_roots.get(directory)
+        if cached is not None:
+            return cached
+
+    git_dir = _git_dir(directory)
+    result = git_dir is not None and os.path.isfile(os.path.join(git_dir, "HEAD"))
+    if _snapshot is not None:
+        _snapshot.repo_roots[directory] = result
+    return result
+
+
+def is_walk_ceiling(directory: str) -> bool:
+    """Check if the ancestor walk should stop after this directory.
+
+    Opt-in, like GIT_CEILING_DIRECTORIES: directories listed in
+    BLOCK_CEILING_DIRECTORIES (os.pathsep-separated) and, with
+    BLOCK_CEILING_REPO_ROOT=1, the nearest git worktree root.
+    Markers in the ceiling directory itself still apply; markers above it
+    are ignored. Without either setting the walk continues to the root.
+    """
+    ceilings = _ceiling_directories()
+    if ceilings and directory in ceilings:
+        return True
+    if os.environ.get("BLOCK_CEILING_REPO_ROOT") == "1":
+        return _is_repo_root(directory)
+    return False
 
 
 def has_block_file_in_hierarchy(directory: str) -> bool:
     """Check if .block file exists in directory hierarchy (quick check)."""
     directory = directory.replace("\\", "/")
-    path = Path(directory)
 
-    while path:
-        if (path / MARKER_FILE_NAME).exists() or (path / LOCAL_MARKER_FILE_NAME).exists():
+    while directory:
+        if any(_dir_markers(directory)):
             return True
-        parent = path.parent
-        if parent == path:
+        if is_walk_ceiling(directory):
             break
-        path = parent
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
     return False
 
 
-def extract_path_without_json(input_str: str) -> Optional[str]:
-    """Extract file path from JSON without full parsing (fallback)."""
-    match = re.search(r'"(file_path|notebook_path)"\s*:\s*"([^"]*)"', input_str)
-    if match:
-        return match.group(2)
-    return None
+def _json_string_at(input_str: str, pos: int) -> str | None:
+    """Match \\s*:\\s*"([^"]*)" at pos and return the captured value."""
+    length = len(input_str)
+    while pos < length and input_str[pos].isspace():
+        pos += 1
+    if pos >= length or input_str[pos] != ":":
+        return None
+    pos += 1
+    while pos < length and input_str[pos].isspace():
+        pos += 1
+    if pos >= length or input_str[pos] != '"':
+        return None
+    end = input_str.find('"', pos + 1)
+    if end == -1:
+        return None
+    return input_str[pos + 1:end]
+
+
+def extract_path_without_json(input_str: str) -> str | None:
+    """Extract file path from JSON without full parsing (fallback).
+
+    Uses plain string scanning rather than re so the quick-exit path runs
+    before any module import.
+    """
+    matches = []
+    for key in ('"file_path"', '"notebook_path"'):
+        start = input_str.find(key)
+        while start != -1:
+            value = _json_string_at(input_str, start + len(key))
+            if value is not None:
+                matches.append((start, value))
+                break
+            start = input_str.find(key, start + 1)
+    if not matches:
+        return None
+    return min(matches)[1]
+
+
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def _decode_json_string_at(input_str: str, pos: int) -> str | None:
+    """Decode the JSON string value after the key ending at pos.
+
+    Returns None when there is no string value there or it uses anything the
+    caller should leave to json.loads (surrogate escapes, malformed escapes).
+    """
+    length = len(input_str)
+    while pos < length and input_str[pos].isspace():
+        pos += 1
+    if pos >= length or input_str[pos] != ":":
+        return None
+    pos += 1
+    while pos < length and input_str[pos].isspace():
+        pos += 1
+    if pos >= length or input_str[pos] != '"':
+        return None
+
+    chunks = []
+    pos += 1
+    while True:
+        end = input_str.find('"', pos)
+        if end == -1:
+            return None
+        escape = input_str.find("\\", pos, end)
+        if escape == -1:
+            chunks.append(input_str[pos:end])
+            return "".join(chunks)
+        chunks.append(input_str[pos:escape])
+        char = input_str[escape + 1:escape + 2]
+        if char == "u":
+            digits = input_str[escape + 2:escape + 6]
+            if len(digits) != 4 or not all(c in "0123456789abcdefABCDEF" for c in digits):
+                return None
+            code = int(digits, 16)
+            if 0xD800 <= code <= 0xDFFF:
+                return None
+            chunks.append(chr(code))
+            pos = escape + 6
+        elif char in _JSON_ESCAPES:
+            chunks.append(_JSON_ESCAPES[char])
+            pos = escape + 2
+        else:
+            return None
+
+
+def _single_key_string(input_str: str, key: str) -> str | None:
+    """Return the string value of a key that occurs exactly once, else None."""
+    found = None
+    start = input_str.find(key)
+    while start != -1:
+        if input_str[start - 1:start] == "\\":
+            return None
+        value = _decode_json_string_at(input_str, start + len(key))
+        if value is not None:
+            if found is not None:
+                return None
+            found = value
+        start = input_str.find(key, start + 1)
+    return found
+
+
+def extract_bash_command_without_json(input_str: str) -> str | None:
+    """Extract the command of a Bash hook input without full parsing.
+
+    Returns None unless the input names the Bash tool and has exactly one
+    "command" key, so anything ambiguous goes through json.loads.
+    """
+    if _single_key_string(input_str, '"tool_name"') != "Bash":
+        return None
+    return _single_key_string(input_str, '"command"')
+
+
+def _split_on(text: str, separators: str) -> list:
+    """Split text on any of the separator characters."""
+    for sep in separators[1:]:
+        text = text.replace(sep, separators[0])
+    return text.split(separators[0])
+
+
+def _bash_path_candidates(command: str) -> set:
+    """Over-approximate the paths get_bash_target_paths() can return.
+
+    Covers every token its shlex pass can produce (and the ">", ">>" and
+    "of=" forms derived from them) and every substring its regexes can
+    capture: runs between whitespace and | ; & (also split on < and >),
+    the text after "of=", and the text between consecutive quotes.
+    """
+    candidates = set()
+
+    for word in command.split():
+        for piece in _split_on(word, "|;&"):
+            candidates.add(piece)
+            candidates.update(_split_on(piece, ">"))
+            candidates.update(_split_on(piece, "<>"))
+            start = piece.find("of=")
+            while start != -1:
+                candidates.add(piece[start + 3:])
+                start = piece.find("of=", start + 1)
+
+    for quote in ('"', "'"):
+        parts = command.split(quote)
+        candidates.update(parts[1:-1])
+
+    if '"' in command or "'" in command or "\\" in command:
+        import shlex
+
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            tokens = []
+    else:
+        # shlex.split only splits on these four characters
+        tokens = _split_on(command, " \t\r\n")
+
+    for token in tokens:
+        candidates.add(token)
+        candidates.add(token.lstrip(">").strip())
+        if token.startswith("of="):
+            candidates.add(token[3:])
+
+    candidates.discard("")
+    return candidates
+
+
+def bash_command_may_be_protected(command: str) -> bool:
+    """Cheap pre-check: can the command reach any .block-protected path?
+
+    False only when no candidate path is an existing directory (those need
+    the descendant scan), a compiled manifest or under a marker, which means
+    the full get_bash_target_paths() pipeline would allow the command.
+    """
+    for candidate in _bash_path_candidates(command):
+        if test_is_manifest_file(candidate):
+            return True
+        full_path = get_full_path(candidate)
+        if os.path.isdir(full_path):
+            return True
+        if has_block_file_in_hierarchy(os.path.dirname(full_path)):
+            return True
+    return False
 
 
 def convert_wildcard_to_regex(pattern: str) -> str:
@@ -152,40 +1188,636 @@ def convert_wildcard_to_regex(pattern: str) -> str:
     return f"^{''.join(result)}$"
 
 
-def test_path_matches_pattern(path: str, pattern: str, base_path: str) -> bool:
-    """Test if path matches a pattern."""
-    path = path.replace("\\", "/")
-    base_path = base_path.replace("\\", "/").rstrip("/")
+_MISSING = object()
 
-    lower_path = path.lower()
-    lower_base = base_path.lower()
 
-    if lower_path.startswith(lower_base):
-        relative_path = path[len(base_path):].lstrip("/")
-    else:
-        relative_path = path
+class _InternTable:
+    """A bounded table of shared values that evicts the least recently used.
 
-    regex = convert_wildcard_to_regex(pattern)
+    Dicts keep insertion order, so a hit is moved to the end and the first
+    key is the one to evict.
+    """
+
+    __slots__ = ("entries", "limit")
+
+    def __init__(self, limit: int) -> None:
+        self.entries: dict = {}
+        self.limit = limit
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the value for key and mark it recently used."""
+        entries = self.entries
+        try:
+            value = entries.pop(key)
+        except KeyError:
+            return default
+        entries[key] = value
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """Store value for key, evicting the least recently used entry when full."""
+        entries = self.entries
+        entries.pop(key, None)
+        entries[key] = value
+        if len(entries) > self.limit:
+            del entries[next(iter(entries))]
 
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+# Compiled wildcard patterns shared by every marker for the process (or
+# daemon) lifetime. None marks a pattern whose regex failed to compile.
+_PATTERN_CACHE = _InternTable(4096)
+
+
+def compile_wildcard(pattern: str) -> re.Pattern[str] | None:
+    """Compile a wildcard pattern once; returns None if it is not a valid regex."""
+    cached = _PATTERN_CACHE.get(pattern, _MISSING)
+    if cached is not _MISSING:
+        return cached  # type: ignore[no-any-return]
+
+    import re
+
+    regex = convert_wildcard_to_regex(pattern)
+    compiled: re.Pattern[str] | None
     try:
-        return bool(re.match(regex, relative_path))
+        compiled = re.compile(regex)
     except re.error as e:
+        import warnings
+
         warnings.warn(f"Invalid regex pattern '{pattern}' (converted: '{regex}'): {e}", stacklevel=2)
+        compiled = None
+    _PATTERN_CACHE.put(pattern, compiled)
+    return compiled
+
+
+def get_relative_path(path: str, base_path: str) -> str:
+    """Return path relative to base_path, the form patterns are matched against."""
+    path = path.replace("\\", "/")
+    base_path = base_path.replace("\\", "/").rstrip("/")
+
+    if path.lower().startswith(base_path.lower()):
+        return path[len(base_path):].lstrip("/")
+    return path
+
+
+def test_path_matches_pattern(path: str, pattern: str, base_path: str) -> bool:
+    """Test if path matches a pattern."""
+    compiled = compile_wildcard(pattern)
+    return compiled is not None and compiled.match(get_relative_path(path, base_path)) is not None
+
+
+def _is_plain(text: str) -> bool:
+    """Return True if a pattern fragment has no wildcards."""
+    return "*" not in text and "?" not in text
+
+
+def _is_plain_name(text: str) -> bool:
+    """Return True if a pattern fragment is a single name without wildcards."""
+    return _is_plain(text) and "/" not in text
+
+
+def _lower_index(best: int | None, index: int | None) -> int | None:
+    """Return the smaller of two optional entry indexes."""
+    if index is None or (best is not None and best <= index):
+        return best
+    return index
+
+
+def _first_suffix(table: dict[int, dict[str, int]], name: str) -> int | None:
+    """Return the lowest entry index whose suffix ends name, or None."""
+    best = None
+    for length, suffixes in table.items():
+        if length <= len(name):
+            best = _lower_index(best, suffixes.get(name[len(name) - length:]))
+    return best
+
+
+def _segment_variants(pattern: str) -> list[str] | None:
+    """Spell out where each "?" matches a "/" instead of a character within a segment.
+
+    Returns None for patterns the trie cannot represent exactly: absolute
+    patterns (a leading "**/" after "/" is treated differently), "**" that
+    is not a whole segment, and patterns with too many "?" to expand.
+    """
+    if pattern.startswith("/") or pattern.count("?") > _PatternTrie.MAX_QUESTION_MARKS:
+        return None
+    if any("**" in segment and segment != "**" for segment in pattern.split("/")):
+        return None
+    variants = [""]
+    for char in pattern:
+        if char == "?":
+            variants = [variant + alternative for variant in variants for alternative in "?/"]
+        else:
+            variants = [variant + char for variant in variants]
+    return variants
+
+
+class _TrieNode:
+    """One path segment of a _PatternTrie."""
+
+    __slots__ = ("deep", "globs", "index", "literals")
+
+    def __init__(self) -> None:
+        # Entry index of the lowest pattern ending here
+        self.index: int | None = None
+        self.literals: dict[str, _TrieNode] = {}
+        # Wildcard segments grouped by the length of their literal prefix,
+        # then by that prefix: {segment: child}. Segments are compiled on
+        # first use, so only the few sharing a path's prefix ever are.
+        self.globs: dict[int, dict[str, dict[str, _TrieNode]]] = {}
+        # "**" in the middle or at the end: one or more segments
+        self.deep: _TrieNode | None = None
+
+
+class _PatternTrie:
+    """Wildcard patterns arranged by path segment.
+
+    A lookup walks the relative path's segments once, following literal
+    segments through dicts, wildcard segments through their compiled
+    regexes and "**" segments as states that stay active for the rest of
+    the walk, so its cost grows with path depth rather than pattern count.
+    Each pattern gives the same answers as convert_wildcard_to_regex for
+    paths without newlines (see _segment_variants for what it accepts).
+    """
+
+    MAX_QUESTION_MARKS = 3
+
+    __slots__ = ("anywhere", "lowest", "root")
+
+    def __init__(self) -> None:
+        self.root = _TrieNode()
+        # A leading "**/": zero or more segments before the rest
+        self.anywhere: _TrieNode | None = None
+        # Lowest entry index in the trie
+        self.lowest = sys.maxsize
+
+    def add(self, variants: list[str], index: int) -> None:
+        """Add every spelling of one entry's pattern."""
+        self.lowest = min(self.lowest, index)
+        for variant in variants:
+            segments = variant.split("/")
+            node = self.root
+            if segments[0] == "**":
+                if self.anywhere is None:
+                    self.anywhere = _TrieNode()
+                node = self.anywhere
+                segments = segments[1:]
+            for segment in segments:
+                node = self._child(node, segment)
+            node.index = _lower_index(node.index, index)
+
+    @staticmethod
+    def _child(node: _TrieNode, segment: str) -> _TrieNode:
+        if segment == "**":
+            if node.deep is None:
+                node.deep = _TrieNode()
+            return node.deep
+        if _is_plain(segment):
+            return node.literals.setdefault(segment, _TrieNode())
+        literal = 0
+        while segment[literal] not in "*?":
+            literal += 1
+        children = node.globs.setdefault(literal, {}).setdefault(segment[:literal], {})
+        return children.setdefault(segment, _TrieNode())
+
+    def first_match(self, relative_path: str) -> int | None:
+        """Return the lowest entry index matching relative_path, or None."""
+        current = [self.root]
+        # Nodes after a "**": active at every later segment
+        deep = [] if self.anywhere is None else [self.anywhere]
+        for segment in relative_path.split("/"):
+            following = []
+            entered = []
+            for node in current + deep:
+                child = node.literals.get(segment)
+                if child is not None:
+                    following.append(child)
+                for length, groups in node.globs.items():
+                    if length <= len(segment):
+                        for glob, child in groups.get(segment[:length], {}).items():
+                            compiled = compile_wildcard(glob)
+                            if compiled is not None and compiled.match(segment) is not None:
+                                following.append(child)
+                if node.deep is not None and node.deep not in deep:
+                    entered.append(node.deep)
+            current = following
+            deep.extend(entered)
+            if not current and not deep:
+                return None
+
+        best = None
+        for node in current + deep:
+            best = _lower_index(best, node.index)
+        return best
+
+
+class PatternList:
+    """An allowed or blocked list compiled for fast first-match lookups.
+
+    Patterns are classified when the list is built. Exact paths
+    (``package-lock.json``), names at any depth (``**/.env``), extension
+    globs (``*.lock``, ``**/*.lock``) and directory prefixes
+    (``migrations/**``) go into hash tables that are checked without running
+    a regex. In long lists the remaining patterns go into a _PatternTrie
+    where it can represent them, and the rest are combined into one
+    alternation regex with a named group per entry, so they are matched in
+    a single call. Each
+    table keeps the lowest entry index per key and the lowest index overall
+    wins, so the entry reported (and its guide) is the one the plain
+    first-match loop would find. Built once per distinct list (see
+    compile_pattern_list) and reused for every path.
+    """
+
+    # Lists with fewer trie-compatible patterns than this use the single
+    # regex, which is faster until it has many alternatives to try
+    TRIE_MIN_ENTRIES = 64
+
+    __slots__ = (
+        "any_names", "any_suffixes", "complex", "entries", "exact", "matcher", "prefixes", "suffixes", "trie",
+    )
+
+    def __init__(self, raw_entries: Iterable) -> None:
+        # (pattern, pattern-specific guide)
+        self.entries: list[tuple[str, Any]] = []
+        for entry in raw_entries:
+            if isinstance(entry, str):
+                self.entries.append((entry, ""))
+            else:
+                self.entries.append((entry.get("pattern", ""), entry.get("guide", "")))
+
+        # Lookup key -> lowest entry index. Suffix tables are grouped by
+        # suffix length so a name is sliced once per distinct length.
+        self.exact: dict[str, int] = {}
+        self.any_names: dict[str, int] = {}
+        self.prefixes: dict[str, int] = {}
+        self.suffixes: dict[int, dict[str, int]] = {}
+        self.any_suffixes: dict[int, dict[str, int]] = {}
+        # Indexes of entries that need the regex, in list order
+        self.complex: list[int] = []
+        for index, (pattern, _guide) in enumerate(self.entries):
+            self._classify(index, pattern)
+        self.trie = self._build_trie() if len(self.complex) >= self.TRIE_MIN_ENTRIES else None
+        self.matcher = self._combine() if self.complex else None
+
+    def _classify(self, index: int, pattern: str) -> None:
+        """File one entry under the cheapest lookup that matches it exactly."""
+        pattern = pattern.replace("\\", "/")
+        if _is_plain(pattern):
+            self.exact.setdefault(pattern, index)
+        elif pattern == "**" or (pattern.endswith("/**") and _is_plain(pattern[:-3])):
+            # Everything below the directory: the path starts with "dir/"
+            self.prefixes.setdefault(pattern[:-2], index)
+        elif pattern.startswith("**/*") and _is_plain_name(pattern[4:]):
+            suffix = pattern[4:]
+            self.any_suffixes.setdefault(len(suffix), {}).setdefault(suffix, index)
+        elif pattern.startswith("**/") and _is_plain_name(pattern[3:]):
+            self.any_names.setdefault(pattern[3:], index)
+        elif pattern.startswith("*") and _is_plain_name(pattern[1:]):
+            suffix = pattern[1:]
+            self.suffixes.setdefault(len(suffix), {}).setdefault(suffix, index)
+        else:
+            self.complex.append(index)
+
+    def _build_trie(self) -> _PatternTrie | None:
+        """Move the complex entries the trie can represent into one."""
+        trie = _PatternTrie()
+        remaining = []
+        for index in self.complex:
+            variants = _segment_variants(self.entries[index][0].replace("\\", "/"))
+            if variants is None:
+                remaining.append(index)
+            else:
+                trie.add(variants, index)
+        if len(remaining) == len(self.complex):
+            return None
+        self.complex = remaining
+        return trie
+
+    def _combine(self) -> re.Pattern[str] | None:
+        """Compile the complex patterns as one alternation; None if it does not compile.
+
+        Alternatives are tried in list order and the shared anchor is only
+        satisfied by a full match, so the first alternative that matches is
+        the first entry whose own regex matches.
+        """
+        import re
+
+        alternatives = "|".join(
+            f"(?P<p{index}>{convert_wildcard_to_regex(self.entries[index][0])[1:-1]})" for index in self.complex
+        )
+        try:
+            return re.compile(f"(?:{alternatives})$")
+        except re.error:
+            # Fall back to matching entry by entry, which skips (and warns
+            # about) only the patterns that are invalid on their own
+            return None
+
+    def _first_regex_match(self, indexes: Iterable[int], relative_path: str) -> int | None:
+        """Return the first of indexes whose own regex matches, or None."""
+        for index in indexes:
+            compiled = compile_wildcard(self.entries[index][0])
+            if compiled is not None and compiled.match(relative_path) is not None:
+                return index
+        return None
+
+    def first_match(self, relative_path: str) -> tuple[str, Any] | None:
+        """Return (pattern, guide) of the first entry matching, or None."""
+        if "\n" in relative_path:
+            # Wildcards and "$" treat newlines specially; leave such paths
+            # to the per-pattern regexes
+            index = self._first_regex_match(range(len(self.entries)), relative_path)
+            return None if index is None else self.entries[index]
+
+        best = self.exact.get(relative_path)
+        name = relative_path[relative_path.rfind("/") + 1:]
+        if self.any_names:
+            best = _lower_index(best, self.any_names.get(name))
+        if self.any_suffixes:
+            best = _lower_index(best, _first_suffix(self.any_suffixes, name))
+        if self.suffixes and "/" not in relative_path:
+            best = _lower_index(best, _first_suffix(self.suffixes, relative_path))
+        if self.prefixes:
+            best = _lower_index(best, self.prefixes.get(""))
+            slash = relative_path.find("/")
+            while slash != -1:
+                best = _lower_index(best, self.prefixes.get(relative_path[:slash + 1]))
+                slash = relative_path.find("/", slash + 1)
+
+        if self.trie is not None and (best is None or self.trie.lowest < best):
+            best = _lower_index(best, self.trie.first_match(relative_path))
+        if self.complex and (best is None or self.complex[0] < best):
+            if self.matcher is not None:
+                match = self.matcher.match(relative_path)
+                index = None if match is None or match.lastgroup is None else int(match.lastgroup[1:])
+            else:
+                index = self._first_regex_match(self.complex, relative_path)
+            best = _lower_index(best, index)
+        return None if best is None else self.entries[best]
+
+
+# Compiled pattern lists keyed by their (pattern, guide) contents, so markers
+# copied from one template share a single PatternList
+_PATTERN_LISTS = _InternTable(256)
+
+# The same by id() of the list in a config, holding (list, PatternList) so the
+# id is not reused while the entry exists. Configs are never modified, so a
+# list seen before is answered without rebuilding its content key.
+_PATTERN_LIST_IDS = _InternTable(256)
+
+
+def compile_pattern_list(raw_entries: Iterable) -> PatternList:
+    """Return the compiled PatternList for an allowed/blocked list."""
+    seen: tuple[Iterable, PatternList] | None = _PATTERN_LIST_IDS.get(id(raw_entries))
+    if seen is not None and seen[0] is raw_entries:
+        return seen[1]
+    compiled = _compile_pattern_list(raw_entries)
+    _PATTERN_LIST_IDS.put(id(raw_entries), (raw_entries, compiled))
+    return compiled
+
+
+def _compile_pattern_list(raw_entries: Iterable) -> PatternList:
+    """Compile a list not seen before, sharing the PatternList of an equal one."""
+    key = tuple(
+        (entry, "") if isinstance(entry, str) else (entry.get("pattern", ""), entry.get("guide", ""))
+        for entry in raw_entries
+    )
+    try:
+        compiled: PatternList | None = _PATTERN_LISTS.get(key)
+    except TypeError:
+        # Unhashable pattern or guide values: compile without caching
+        return PatternList(raw_entries)
+    if compiled is None:
+        compiled = PatternList(raw_entries)
+        _PATTERN_LISTS.put(key, compiled)
+    return compiled
+
+
+def _marker_signature(marker_path: str) -> tuple[int, int, int] | None:
+    """Return (mtime_ns, size, inode) of a regular marker file, else None."""
+    try:
+        st = os.stat(marker_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _sha256_file(path: str) -> str | None:
+    """Return the hex SHA-256 of a file's content, or None if unreadable."""
+    import hashlib
+
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class _Manifest:
+    """Merged per-directory configs precompiled by --compile.
+
+    Entries: directory relative to the manifest's directory ("." for the
+    directory itself, "/"-separated) -> [.block info, .block.local info,
+    BlockConfig.astuple() as a list], where an info is [size, mtime_ns or
+    null, sha256 hex] or null for a missing marker. An entry is used only
+    while each marker's content hash matches; a marker whose size and
+    mtime still equal the recorded ones is trusted without being read.
+    """
+
+    __slots__ = ("entries", "root")
+
+    def __init__(self, root: str, entries: dict) -> None:
+        self.root = root
+        self.entries = entries
+
+    @classmethod
+    def load(cls, path: str) -> _Manifest | None:
+        """Read a manifest file; None if it is missing, malformed or outdated."""
+        import json
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return None
+        entries = data.get("markers")
+        if not isinstance(entries, dict):
+            return None
+        return cls(os.path.dirname(path), entries)
+
+    def config(
+        self,
+        directory: str,
+        main_sig: tuple[int, int, int] | None,
+        local_sig: tuple[int, int, int] | None,
+    ) -> BlockConfig | None:
+        """Return the precompiled config of directory if its markers are unchanged."""
+        try:
+            # ValueError on Windows when directory is on another drive
+            relative = os.path.relpath(directory, self.root).replace(os.sep, "/")
+            entry = self.entries.get(relative)
+            if entry is None:
+                return None
+            main_info, local_info, fields = entry
+            if not _manifest_marker_matches(os.path.join(directory, MARKER_FILE_NAME), main_info, main_sig):
+                return None
+            if not _manifest_marker_matches(os.path.join(directory, LOCAL_MARKER_FILE_NAME), local_info, local_sig):
+                return None
+            return BlockConfig.from_tuple(tuple(fields))
+        except (TypeError, ValueError):
+            return None
+
+
+def _manifest_marker_matches(marker_path: str, info: list | None, signature: tuple[int, int, int] | None) -> bool:
+    """Check a marker against its manifest record (None = must be missing)."""
+    if info is None or signature is None:
+        return info is None and signature is None
+    size, mtime_ns, digest = info
+    if signature[1] != size:
         return False
+    if mtime_ns is not None and signature[0] == mtime_ns:
+        return True
+    expected: str = digest
+    return _sha256_file(marker_path) == expected
+
+
+def _active_manifest() -> _Manifest | None:
+    """Return the compiled manifest in the working directory, if any."""
+    path = os.path.join(os.getcwd(), COMPILED_MANIFEST_NAME)
+    if _snapshot is not None and path in _snapshot.manifests:
+        return _snapshot.manifests[path]
+
+    signature = _marker_signature(path)
+    manifest = None
+    if signature is not None:
+        cached = _MANIFESTS.get(path)
+        if cached is not None and cached[0] == signature:
+            manifest = cached[1]
+        else:
+            manifest = _Manifest.load(path)
+            if manifest is not None:
+                _MANIFESTS[path] = (signature, manifest)
+
+    if _snapshot is not None:
+        _snapshot.manifests[path] = manifest
+    return manifest
+
+
+def _dir_signature(directory: str, has_main: bool, has_local: bool) -> tuple:
+    """Return the (.block, .block.local) stat signatures of one directory."""
+    if _watcher is not None:
+        remembered = _watcher.signature(directory, has_main, has_local)
+        if remembered is not None:
+            return remembered
+    main_sig = _marker_signature(os.path.join(directory, MARKER_FILE_NAME)) if has_main else None
+    local_sig = _marker_signature(os.path.join(directory, LOCAL_MARKER_FILE_NAME)) if has_local else None
+    return main_sig, local_sig
+
+
+def _load_dir_config(directory: str, has_main: bool, has_local: bool, signature: tuple | None = None) -> BlockConfig:
+    """Return the merged .block/.block.local config of one directory.
+
+    The result is kept for the process keyed by both markers' stat
+    signatures. A compiled manifest (--compile) in the working directory
+    supplies it without parsing while the markers are unchanged. With
+    BLOCK_CACHE_DIR set, it is also cached on disk, so unchanged markers are
+    not re-read by later hook processes either.
+    """
+    main_marker = os.path.join(directory, MARKER_FILE_NAME)
+    local_marker = os.path.join(directory, LOCAL_MARKER_FILE_NAME)
+    main_sig, local_sig = signature if signature is not None else _dir_signature(directory, has_main, has_local)
+
+    memo = _DIR_CONFIGS.get(directory)
+    if memo is not None and memo[0] == (main_sig, local_sig):
+        return memo[1]
+
+    manifest = _active_manifest()
+    merged = manifest.config(directory, main_sig, local_sig) if manifest is not None else None
+    if merged is not None:
+        _DIR_CONFIGS[directory] = ((main_sig, local_sig), merged)
+        return merged
+
+    cache = _active_cache(_ConfigCache)
+    if cache is not None:
+        entry = cache.entries.get(directory)
+        if entry is not None and entry[0] == main_sig and entry[1] == local_sig:
+            try:
+                merged = BlockConfig.from_tuple(entry[2])
+            except (TypeError, ValueError):
+                merged = None
+
+    if merged is None:
+        main_config = _config_for_signature(main_marker, main_sig) if has_main else _create_empty_config()
+        local_config = _config_for_signature(local_marker, local_sig) if has_local else None
+        merged = merge_configs(main_config, local_config)
+
+        if cache is not None and (main_sig is not None) == has_main and (local_sig is not None) == has_local:
+            newest = max(sig[0] for sig in (main_sig, local_sig) if sig is not None)
+            cache._store(directory, newest, (main_sig, local_sig, merged.astuple()))
+
+    _DIR_CONFIGS[directory] = ((main_sig, local_sig), merged)
+    return merged
+
+
+def _merge_chain(directories: tuple[str, ...], configs: tuple[BlockConfig, ...]) -> BlockConfig:
+    """Merge per-directory configs (child first) into the effective config.
+
+    Memoized per chain of marker directories; the merge is reused while
+    every directory still yields the same config object.
+    """
+    memo = _CHAIN_CONFIGS.get(directories)
+    if memo is not None and all(old is new for old, new in zip(memo[0], configs)):
+        return memo[1]
+
+    final_config = configs[0]
+    for parent_config in configs[1:]:
+        final_config = _merge_hierarchical_configs(final_config, parent_config)
+    _CHAIN_CONFIGS[directories] = (configs, final_config)
+    return final_config
 
 
-def get_lock_file_config(marker_path: str) -> dict:
+def get_lock_file_config(marker_path: str) -> BlockConfig:
     """Get lock file configuration."""
-    config = _create_empty_config()
+    return _config_for_signature(marker_path, _marker_signature(marker_path))
 
-    if not os.path.isfile(marker_path):
-        return config
 
+def _config_for_signature(marker_path: str, signature: tuple[int, int, int] | None) -> BlockConfig:
+    """Return the parsed config of a marker whose stat signature is known."""
+    if signature is None:
+        return _create_empty_config()
+
+    cached = _CONFIG_CACHE.get(marker_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    config = _parse_lock_file(marker_path)
+    _CONFIG_CACHE[marker_path] = (signature, config)
+    return config
+
+
+def _parse_lock_file(marker_path: str) -> BlockConfig:
+    """Read and parse a single marker file (uncached)."""
     try:
         with open(marker_path, encoding="utf-8") as f:
             content = f.read()
     except OSError:
-        return config
+        return _create_empty_config()
+    return _parse_lock_content(content)
+
+
+def _parse_lock_content(content: str) -> BlockConfig:
+    """Parse the text of a marker file."""
+    import json
+
+    config = _create_empty_config()
 
     if not content or content.isspace():
         return config
@@ -196,90 +1828,118 @@ def get_lock_file_config(marker_path: str) -> dict:
         return config
 
     # Extract guide (applies to all modes)
-    config["guide"] = data.get("guide", "")
+    config.guide = data.get("guide", "")
 
     # Check for top-level allowed/blocked
     has_allowed = "allowed" in data
     has_blocked = "blocked" in data
 
     if has_allowed and has_blocked:
-        config["has_error"] = True
-        config["error_message"] = "Invalid .block: cannot specify both allowed and blocked lists"
+        config.has_error = True
+        config.error_message = "Invalid .block: cannot specify both allowed and blocked lists"
         return config
 
     if has_allowed:
-        config["allowed"] = data["allowed"]
-        config["has_allowed_key"] = True
-        config["is_empty"] = False
+        config.allowed = _intern_patterns(data["allowed"])
+        config.has_allowed_key = True
+        config.is_empty = False
 
     if has_blocked:
-        config["blocked"] = data["blocked"]
-        config["has_blocked_key"] = True
-        config["is_empty"] = False
+        config.blocked = _intern_patterns(data["blocked"])
+        config.has_blocked_key = True
+        config.is_empty = False
 
     # Parse agent-scoping keys (with type validation)
     if "agents" in data:
         agents_val = data["agents"]
         if isinstance(agents_val, list):
-            config["agents"] = agents_val
-            config["has_agents_key"] = True
+            config.agents = agents_val
+            config.has_agents_key = True
     if "disable_main_agent" in data:
         disable_val = data["disable_main_agent"]
         if isinstance(disable_val, bool):
-            config["disable_main_agent"] = disable_val
-            config["has_disable_main_agent_key"] = True
+            config.disable_main_agent = disable_val
+            config.has_disable_main_agent_key = True
 
     return config
 
 
-def _merge_agent_fields(primary: dict, fallback: dict) -> dict:
+def _intern_patterns(entries: Any) -> Any:
+    """Intern the pattern strings of a parsed list so copies of a template share them."""
+    if not isinstance(entries, list):
+        return entries
+    for position, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entries[position] = sys.intern(entry)
+        elif isinstance(entry, dict) and isinstance(entry.get("pattern"), str):
+            entry["pattern"] = sys.intern(entry["pattern"])
+    return entries
+
+
+def _merge_agent_fields(primary: BlockConfig, fallback: BlockConfig) -> dict:
     """Compute merged agent fields where primary overrides fallback (if primary has the key)."""
-    result = {}
-    if primary.get("has_agents_key"):
-        result["agents"] = primary.get("agents")
+    result: dict[str, Any] = {}
+    if primary.has_agents_key:
+        result["agents"] = primary.agents
         result["has_agents_key"] = True
-    elif fallback.get("has_agents_key"):
-        result["agents"] = fallback.get("agents")
+    elif fallback.has_agents_key:
+        result["agents"] = fallback.agents
         result["has_agents_key"] = True
 
-    if primary.get("has_disable_main_agent_key"):
-        result["disable_main_agent"] = primary.get("disable_main_agent", False)
+    if primary.has_disable_main_agent_key:
+        result["disable_main_agent"] = primary.disable_main_agent
         result["has_disable_main_agent_key"] = True
-    elif fallback.get("has_disable_main_agent_key"):
-        result["disable_main_agent"] = fallback.get("disable_main_agent", False)
+    elif fallback.has_disable_main_agent_key:
+        result["disable_main_agent"] = fallback.disable_main_agent
         result["has_disable_main_agent_key"] = True
 
     return result
 
 
-def merge_configs(main_config: dict, local_config: Optional[dict]) -> dict:
+def _unique_patterns(items: list) -> list:
+    """Drop repeated blocked entries, keeping the first of each in order."""
+    import json
+
+    seen = set()
+    unique = []
+    for item in items:
+        key = json.dumps(item, sort_keys=True) if isinstance(item, dict) else item
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def merge_configs(main_config: BlockConfig | dict, local_config: BlockConfig | dict | None) -> BlockConfig:
     """Merge two configs (main and local)."""
+    main_config = _as_config(main_config)
     if not local_config:
         return main_config
+    local_config = _as_config(local_config)
 
-    if main_config.get("has_error"):
+    if main_config.has_error:
         return main_config
-    if local_config.get("has_error"):
+    if local_config.has_error:
         return local_config
 
     # Local overrides main for agent fields
     agent_fields = _merge_agent_fields(local_config, main_config)
 
-    main_empty = main_config.get("is_empty", True)
-    local_empty = local_config.get("is_empty", True)
+    main_empty = main_config.is_empty
+    local_empty = local_config.is_empty
 
     if main_empty or local_empty:
-        local_guide = local_config.get("guide", "")
-        main_guide = main_config.get("guide", "")
+        local_guide = local_config.guide
+        main_guide = main_config.guide
         effective_guide = local_guide if local_guide else main_guide
 
         return _create_empty_config(guide=effective_guide, **agent_fields)
 
     # Check if keys are present (not just if arrays have items)
-    main_has_allowed_key = main_config.get("has_allowed_key", False)
-    main_has_blocked_key = main_config.get("has_blocked_key", False)
-    local_has_allowed_key = local_config.get("has_allowed_key", False)
-    local_has_blocked_key = local_config.get("has_blocked_key", False)
+    main_has_allowed_key = main_config.has_allowed_key
+    main_has_blocked_key = main_config.has_blocked_key
+    local_has_allowed_key = local_config.has_allowed_key
+    local_has_blocked_key = local_config.has_blocked_key
 
     # Check for mode mixing
     if (main_has_allowed_key and local_has_blocked_key) or (main_has_blocked_key and local_has_allowed_key):
@@ -289,21 +1949,14 @@ def merge_configs(main_config: dict, local_config: Optional[dict]) -> dict:
             error_message="Invalid configuration: .block and .block.local cannot mix allowed and blocked modes",
         )
 
-    local_guide = local_config.get("guide", "")
-    main_guide = main_config.get("guide", "")
+    local_guide = local_config.guide
+    main_guide = main_config.guide
     merged_guide = local_guide if local_guide else main_guide
 
     if main_has_blocked_key or local_has_blocked_key:
-        main_blocked = main_config.get("blocked", [])
-        local_blocked = local_config.get("blocked", [])
-        merged_blocked = list(main_blocked) + list(local_blocked)
-        seen = set()
-        unique_blocked = []
-        for item in merged_blocked:
-            key = json.dumps(item, sort_keys=True) if isinstance(item, dict) else item
-            if key not in seen:
-                seen.add(key)
-                unique_blocked.append(item)
+        main_blocked = main_config.blocked
+        local_blocked = local_config.blocked
+        unique_blocked = _unique_patterns(list(main_blocked) + list(local_blocked))
 
         return _create_empty_config(
             blocked=unique_blocked,
@@ -315,9 +1968,9 @@ def merge_configs(main_config: dict, local_config: Optional[dict]) -> dict:
 
     if main_has_allowed_key or local_has_allowed_key:
         if local_has_allowed_key:
-            merged_allowed = local_config.get("allowed", [])
+            merged_allowed = local_config.allowed
         else:
-            merged_allowed = main_config.get("allowed", [])
+            merged_allowed = main_config.allowed
 
         return _create_empty_config(
             allowed=merged_allowed,
@@ -337,7 +1990,7 @@ def get_full_path(path: str) -> str:
     return os.path.join(os.getcwd(), path)
 
 
-def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict:
+def _merge_hierarchical_configs(child_config: BlockConfig | dict, parent_config: BlockConfig | dict) -> BlockConfig:
     """Merge child and parent configs from different directory levels.
 
     Inheritance rules:
@@ -348,24 +2001,26 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
     - Agent fields: child overrides parent (if child has the key)
     """
     if not parent_config:
-        return child_config
+        return _as_config(child_config)
     if not child_config:
-        return parent_config
+        return _as_config(parent_config)
+    child_config = _as_config(child_config)
+    parent_config = _as_config(parent_config)
 
     # If either has an error, propagate it
-    if child_config.get("has_error"):
+    if child_config.has_error:
         return child_config
-    if parent_config.get("has_error"):
+    if parent_config.has_error:
         return parent_config
 
     # Child overrides parent for agent fields
     agent_fields = _merge_agent_fields(child_config, parent_config)
 
-    child_empty = child_config.get("is_empty", True)
-    parent_empty = parent_config.get("is_empty", True)
+    child_empty = child_config.is_empty
+    parent_empty = parent_config.is_empty
 
-    child_guide = child_config.get("guide", "")
-    parent_guide = parent_config.get("guide", "")
+    child_guide = child_config.guide
+    parent_guide = parent_config.guide
     merged_guide = child_guide if child_guide else parent_guide
 
     # If child is empty (block all), it takes precedence over everything
@@ -373,16 +2028,16 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
         return _create_empty_config(guide=merged_guide, **agent_fields)
 
     # Child has specific patterns - check what modes are being used
-    child_has_allowed = child_config.get("has_allowed_key", False)
-    child_has_blocked = child_config.get("has_blocked_key", False)
-    parent_has_allowed = parent_config.get("has_allowed_key", False)
-    parent_has_blocked = parent_config.get("has_blocked_key", False)
+    child_has_allowed = child_config.has_allowed_key
+    child_has_blocked = child_config.has_blocked_key
+    parent_has_allowed = parent_config.has_allowed_key
+    parent_has_blocked = parent_config.has_blocked_key
 
     # If child has allowed patterns, it completely overrides parent
     # (regardless of whether parent is empty or has blocked patterns)
     if child_has_allowed:
         return _create_empty_config(
-            allowed=child_config.get("allowed", []),
+            allowed=child_config.allowed,
             guide=merged_guide,
             is_empty=False,
             has_allowed_key=True,
@@ -391,7 +2046,7 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
 
     # Child has blocked patterns - merge with parent's blocked patterns
     if child_has_blocked:
-        child_blocked = child_config.get("blocked", [])
+        child_blocked = child_config.blocked
 
         # If parent is empty (block all), just use child's patterns
         # (child's patterns are more specific)
@@ -414,17 +2069,8 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
 
         # Both have blocked patterns - combine them (union)
         if parent_has_blocked:
-            parent_blocked = parent_config.get("blocked", [])
-            merged_blocked = list(child_blocked) + list(parent_blocked)
-
-            # Deduplicate while preserving order
-            seen = set()
-            unique_blocked = []
-            for item in merged_blocked:
-                key = json.dumps(item, sort_keys=True) if isinstance(item, dict) else item
-                if key not in seen:
-                    seen.add(key)
-                    unique_blocked.append(item)
+            parent_blocked = parent_config.blocked
+            unique_blocked = _unique_patterns(list(child_blocked) + list(parent_blocked))
 
             return _create_empty_config(
                 blocked=unique_blocked,
@@ -447,7 +2093,7 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
     # Fall back to parent's config with merged guide
     if parent_has_allowed:
         return _create_empty_config(
-            allowed=parent_config.get("allowed", []),
+            allowed=parent_config.allowed,
             guide=merged_guide,
             is_empty=False,
             has_allowed_key=True,
@@ -456,7 +2102,7 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
 
     if parent_has_blocked:
         return _create_empty_config(
-            blocked=parent_config.get("blocked", []),
+            blocked=parent_config.blocked,
             guide=merged_guide,
             is_empty=False,
             has_blocked_key=True,
@@ -466,9 +2112,9 @@ def _merge_hierarchical_configs(child_config: dict, parent_config: dict) -> dict
     return _create_empty_config(guide=merged_guide, **agent_fields)
 
 
-def _config_has_agent_rules(config: dict) -> bool:
+def _config_has_agent_rules(config: BlockConfig) -> bool:
     """Check if config has any agent-scoping rules."""
-    return bool(config.get("has_agents_key", False)) or bool(config.get("has_disable_main_agent_key", False))
+    return bool(config.has_agents_key) or bool(config.has_disable_main_agent_key)
 
 
 def _tool_use_id_in_transcript(transcript_path: str, tool_use_id: str) -> bool:
@@ -483,12 +2129,14 @@ def _tool_use_id_in_transcript(transcript_path: str, tool_use_id: str) -> bool:
     return False
 
 
-def resolve_agent_type(data: dict) -> Optional[str]:
+def resolve_agent_type(data: dict) -> str | None:
     """Resolve the agent type for the current tool invocation.
 
     Returns the agent_type string if invoked by a subagent, or None for the main agent.
     Uses the tracking file and transcript search to correlate tool_use_id to an agent.
     """
+    import json
+
     tool_use_id = data.get("tool_use_id", "")
     transcript_path = data.get("transcript_path", "")
 
@@ -521,7 +2169,7 @@ def resolve_agent_type(data: dict) -> Optional[str]:
     return None
 
 
-def should_apply_to_agent(config: dict, agent_type: Optional[str]) -> bool:
+def should_apply_to_agent(config: BlockConfig | dict, agent_type: str | None) -> bool:
     """Determine if blocking rules should apply given the agent type.
 
     agent_type is None for the main agent, or a string like "TestCreator" for subagents.
@@ -535,10 +2183,11 @@ def should_apply_to_agent(config: dict, agent_type: Optional[str]) -> bool:
     | agents: ["TestCreator"] + disable: true    | Skipped   | Blocked         | Skipped         |
     | agents: []                                 | Skipped   | Skipped         | Skipped         |
     """
-    has_agents_key = config.get("has_agents_key", False)
-    has_disable_key = config.get("has_disable_main_agent_key", False)
-    agents_list = config.get("agents")
-    disable_main = config.get("disable_main_agent", False)
+    config = _as_config(config)
+    has_agents_key = config.has_agents_key
+    has_disable_key = config.has_disable_main_agent_key
+    agents_list = config.agents
+    disable_main = config.disable_main_agent
 
     # No agent-scoping keys at all → apply to everyone (backward compat)
     if not has_agents_key and not has_disable_key:
@@ -564,7 +2213,7 @@ def should_apply_to_agent(config: dict, agent_type: Optional[str]) -> bool:
     return True
 
 
-def _agent_exempt(config: dict, data: dict, agent_state: dict) -> bool:
+def _agent_exempt(config: BlockConfig, data: dict, agent_state: dict) -> bool:
     """Check if the current agent is exempt from this config's rules.
 
     agent_state is a mutable dict with 'resolved' and 'type' keys used as a lazy cache.
@@ -578,7 +2227,7 @@ def _agent_exempt(config: dict, data: dict, agent_state: dict) -> bool:
     return not should_apply_to_agent(config, agent_state["type"])
 
 
-def test_directory_protected(file_path: str) -> Optional[dict]:
+def test_directory_protected(file_path: str) -> ProtectionInfo | None:
     """Test if directory is protected, returns protection info or None.
 
     Walks up the entire directory tree collecting all .block files,
@@ -601,71 +2250,86 @@ def test_directory_protected(file_path: str) -> Optional[dict]:
     if not directory:
         return None
 
-    # Collect all configs from hierarchy (child to parent order)
-    configs_with_dirs = []
+    # Collect all marker directories in the hierarchy (child to parent order)
+    marker_dirs = []
 
     current_dir = directory
     while current_dir:
-        marker_path = os.path.join(current_dir, MARKER_FILE_NAME)
-        local_marker_path = os.path.join(current_dir, LOCAL_MARKER_FILE_NAME)
-        has_main = os.path.isfile(marker_path)
-        has_local = os.path.isfile(local_marker_path)
+        has_main, has_local = _dir_markers(current_dir)
 
         if has_main or has_local:
-            if has_main:
-                main_config = get_lock_file_config(marker_path)
+            marker_path = os.path.join(current_dir, MARKER_FILE_NAME)
+            local_marker_path = os.path.join(current_dir, LOCAL_MARKER_FILE_NAME)
+            if has_main and has_local:
+                effective_marker_path = f"{marker_path} (+ .local)"
+            elif has_main:
                 effective_marker_path = marker_path
             else:
-                main_config = _create_empty_config()
-                effective_marker_path = None
-
-            if has_local:
-                local_config = get_lock_file_config(local_marker_path)
-                if not has_main:
-                    effective_marker_path = local_marker_path
-                else:
-                    effective_marker_path = f"{marker_path} (+ .local)"
-            else:
-                local_config = None
-
-            merged_config = merge_configs(main_config, local_config)
-            configs_with_dirs.append({
-                "config": merged_config,
-                "marker_path": effective_marker_path,
-                "marker_directory": current_dir,
-            })
+                effective_marker_path = local_marker_path
+            marker_dirs.append((current_dir, has_main, has_local, effective_marker_path))
 
+        if is_walk_ceiling(current_dir):
+            break
         parent = os.path.dirname(current_dir)
         if parent == current_dir:
             break
         current_dir = parent
 
-    if not configs_with_dirs:
+    if not marker_dirs:
         return None
 
+    # Build marker path description if multiple .block files are involved
+    closest_marker_dir = marker_dirs[0][0]
+    effective_marker_path = " + ".join(marker for _, _, _, marker in marker_dirs if marker)
+
+    chain = tuple(marker_dir for marker_dir, _, _, _ in marker_dirs)
+    signatures = None
+    verdicts = _active_cache(_VerdictCache)
+    if verdicts is not None:
+        signatures = tuple(_dir_signature(marker_dir, main, local) for marker_dir, main, local, _ in marker_dirs)
+        verdict = _cached_verdict(verdicts, chain, signatures)
+        if verdict is not None:
+            return ProtectionInfo(file_path, effective_marker_path, closest_marker_dir, verdict)
+
     # Merge all configs from child to parent
     # Start with the closest (child) config and merge parents into it
-    final_config = cast("dict", configs_with_dirs[0]["config"])
-    closest_marker_path = cast("Optional[str]", configs_with_dirs[0]["marker_path"])
-    closest_marker_dir = cast("str", configs_with_dirs[0]["marker_directory"])
+    configs = tuple(
+        _load_dir_config(marker_dir, main, local, signatures[index] if signatures is not None else None)
+        for index, (marker_dir, main, local, _) in enumerate(marker_dirs)
+    )
+    final_config = _merge_chain(chain, configs)
+    if verdicts is not None and signatures is not None:
+        _store_verdict(verdicts, chain, signatures, final_config)
 
-    for i in range(1, len(configs_with_dirs)):
-        parent_config = cast("dict", configs_with_dirs[i]["config"])
-        final_config = _merge_hierarchical_configs(final_config, parent_config)
+    return ProtectionInfo(file_path, effective_marker_path, closest_marker_dir, final_config)
 
-    # Build marker path description if multiple .block files are involved
-    if len(configs_with_dirs) > 1:
-        marker_paths = [cast("str", c["marker_path"]) for c in configs_with_dirs if c["marker_path"]]
-        effective_marker_path = " + ".join(marker_paths)
-    else:
-        effective_marker_path = closest_marker_path
 
-    return {
-        "target_file": file_path,
-        "marker_path": effective_marker_path,
-        "marker_directory": closest_marker_dir,
-        "config": final_config
-    }
+def _verdict_config(verdict: str, guide: str) -> BlockConfig:
+    """Return the effective config a cached verdict stands for."""
+    if verdict == "all":
+        return _create_empty_config(guide=guide)
+    return _create_empty_config(guide=guide, is_empty=False, has_blocked_key=True)
+
+
+def _cached_verdict(cache: _VerdictCache, chain: tuple[str, ...], signatures: tuple) -> BlockConfig | None:
+    """Return the config of a recorded name-independent verdict, if still valid."""
+    entry = cache.entries.get("\0".join(chain))
+    if entry is None or entry[0] != signatures:
+        return None
+    return _verdict_config(entry[1], entry[2])
+
+
+def _store_verdict(cache: _VerdictCache, chain: tuple[str, ...], signatures: tuple, config: BlockConfig) -> None:
+    """Record config's verdict if it does not depend on the file name."""
+    for verdict in ("all", "none"):
+        if config == _verdict_config(verdict, config.guide):
+            break
+    else:
+        return
+    mtimes = [sig[0] for pair in signatures for sig in pair if sig is not None]
+    if not mtimes:
+        return
+    cache._store("\0".join(chain), max(mtimes), (signatures, verdict, config.guide))
 
 
 def get_bash_target_paths(command: str) -> list:
@@ -674,6 +2338,9 @@ def get_bash_target_paths(command: str) -> list:
     Uses shlex for proper handling of quoted paths with spaces.
     Falls back to regex-based extraction if shlex parsing fails.
     """
+    import re
+    import shlex
+
     if not command:
         return []
 
@@ -974,30 +2641,21 @@ def get_bash_target_paths(command: str) -> list:
     return list(set(paths))
 
 
-def get_merged_dir_config(directory: str) -> Optional[dict]:
+def get_merged_dir_config(directory: str) -> ProtectionInfo | None:
     """Read and merge .block and .block.local configs for a single directory.
 
-    Returns a dict with 'config', 'marker_path' keys, or None if
+    Returns a ProtectionInfo with 'config' and 'marker_path' set, or None if
     neither marker file exists. Mirrors the per-directory merging
     logic in test_directory_protected().
     """
-    main_marker = os.path.join(directory, MARKER_FILE_NAME)
-    local_marker = os.path.join(directory, LOCAL_MARKER_FILE_NAME)
-    has_main = os.path.isfile(main_marker)
-    has_local = os.path.isfile(local_marker)
+    has_main, has_local = _dir_markers(directory)
 
     if not has_main and not has_local:
         return None
 
-    main_config = (
-        get_lock_file_config(main_marker)
-        if has_main
-        else _create_empty_config()
-    )
-    local_config = (
-        get_lock_file_config(local_marker) if has_local else None
-    )
-    merged = merge_configs(main_config, local_config)
+    main_marker = os.path.join(directory, MARKER_FILE_NAME)
+    local_marker = os.path.join(directory, LOCAL_MARKER_FILE_NAME)
+    merged = _load_dir_config(directory, has_main, has_local)
 
     if has_main and has_local:
         effective_path = f"{main_marker} (+ .local)"
@@ -1006,22 +2664,349 @@ def get_merged_dir_config(directory: str) -> Optional[dict]:
     else:
         effective_path = local_marker
 
-    return {"config": merged, "marker_path": effective_path}
+    return ProtectionInfo("", effective_path, directory, merged)
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read a non-negative integer setting, falling back to default."""
+    try:
+        value = int(os.environ.get(name, ""))
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+class _ScanIncomplete(Exception):
+    """A descendant scan ran out of budget before it finished."""
+
+
+class _ScanBudget:
+    """Limits for one descendant scan, read from the environment.
+
+    BLOCK_SCAN_PRUNE lists directory names (os.pathsep-separated) that are
+    not descended into; empty prunes nothing. BLOCK_SCAN_MAX_DIRS and
+    BLOCK_SCAN_TIMEOUT_MS bound the directories visited and the wall-clock
+    time (0 means no limit). When a limit is reached the command is blocked,
+    unless BLOCK_SCAN_ON_LIMIT=allow. BLOCK_SCAN_THREADS above 1 lists that
+    many directories at once (see _scan_parallel).
+    """
+
+    __slots__ = (
+        "clock", "deadline", "directories", "fail_open", "max_dirs", "prune", "pruned", "started", "threads",
+    )
+
+    def __init__(
+        self, prune: frozenset[str], max_dirs: int, timeout_ms: int, fail_open: bool, threads: int = 1,
+    ) -> None:
+        import time
+
+        self.prune = prune
+        self.max_dirs = max_dirs
+        self.fail_open = fail_open
+        self.threads = threads
+        self.clock = time.monotonic
+        self.started = self.clock()
+        self.deadline = self.started + timeout_ms / 1000 if timeout_ms else None
+        self.directories = 0
+        self.pruned = 0
+
+    @classmethod
+    def from_env(cls) -> _ScanBudget:
+        raw_prune = os.environ.get("BLOCK_SCAN_PRUNE")
+        if raw_prune is None:
+            prune = frozenset(DEFAULT_SCAN_PRUNE)
+        else:
+            prune = frozenset(name for name in raw_prune.split(os.pathsep) if name)
+        return cls(
+            prune,
+            _env_int("BLOCK_SCAN_MAX_DIRS", DEFAULT_SCAN_MAX_DIRS),
+            _env_int("BLOCK_SCAN_TIMEOUT_MS", DEFAULT_SCAN_TIMEOUT_MS),
+            os.environ.get("BLOCK_SCAN_ON_LIMIT", "").lower() == "allow",
+            _env_int("BLOCK_SCAN_THREADS", 1),
+        )
+
+    def remaining(self) -> float | None:
+        """Seconds left before the wall-clock limit, or None without one."""
+        return None if self.deadline is None else max(0.0, self.deadline - self.clock())
+
+    def visit(self) -> None:
+        """Count one directory; raise _ScanIncomplete once a limit is reached."""
+        self.directories += 1
+        if self.max_dirs and self.directories > self.max_dirs:
+            raise _ScanIncomplete(self._describe(f"more than {self.max_dirs} directories (BLOCK_SCAN_MAX_DIRS)"))
+        if self.deadline is not None and self.clock() > self.deadline:
+            timeout_ms = round((self.deadline - self.started) * 1000)
+            raise _ScanIncomplete(self._describe(f"took longer than {timeout_ms} ms (BLOCK_SCAN_TIMEOUT_MS)"))
+
+    def subdirectories(self, names: Iterable[str]) -> list[str]:
+        """Return the names to descend into, counting the pruned ones."""
+        if not self.prune:
+            return list(names)
+        kept = []
+        for name in names:
+            if name in self.prune:
+                self.pruned += 1
+            else:
+                kept.append(name)
+        return kept
+
+    def _describe(self, limit: str) -> str:
+        elapsed_ms = round((self.clock() - self.started) * 1000)
+        text = f"scan stopped after {self.directories - 1} directories in {elapsed_ms} ms: {limit}"
+        if self.pruned:
+            text += f"; skipped {self.pruned} pruned directories ({', '.join(sorted(self.prune))})"
+        return text
+
+
+def _git_dir(worktree: str) -> str | None:
+    """The git directory of a worktree root: its .git directory, or where a .git file points."""
+    dot_git = os.path.join(worktree, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git
+    try:
+        with open(dot_git, encoding="utf-8") as f:
+            line = f.readline().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not line.startswith("gitdir:"):
+        return None
+    return os.path.normpath(os.path.join(worktree, line[len("gitdir:"):].strip()))
+
+
+def _parse_git_index(data: bytes) -> tuple[str, ...] | None:
+    """Return the directories of the markers tracked by a git index file, or None.
+
+    Reads index versions 2 to 4 (see git's gitformat-index), including
+    version 4 path compression and SHA-256 repositories. The directories
+    hold a tracked .block or .block.local, "" being the worktree root, and
+    are sorted and "/"-separated. Returns None for anything else, including
+    a split index, whose entries live in a separate shared index file.
+    """
+    import struct
+
+    if len(data) < 12 or data[:4] != b"DIRC":
+        return None
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        return None
+    # The entry layout depends on the hash length, which the index does not
+    # record: only the right one accounts for every byte
+    for hash_size in (20, 32):
+        parsed = _read_git_index_entries(data, version, count, hash_size)
+        if parsed is not None:
+            return parsed
+    return None
+
+
+_MARKER_NAMES = (os.fsencode(MARKER_FILE_NAME), os.fsencode(LOCAL_MARKER_FILE_NAME))
+
+
+def _read_git_index_entries(data: bytes, version: int, count: int, hash_size: int) -> tuple[str, ...] | None:
+    """Parse the entries and extensions of an index; None if they do not fit."""
+    import struct
+
+    fields = struct.Struct(f">40x{hash_size}xH")
+    end = len(data) - hash_size
+    directories = set()
+    path = b""
+    offset = 12
+    try:
+        for _ in range(count):
+            (flags,) = fields.unpack_from(data, offset)
+            name_start = offset + fields.size
+            if flags & 0x4000:
+                if version < 3:
+                    return None
+                name_start += 2
+            if version == 4:
+                # Bytes to drop from the previous path, then the NUL-terminated rest
+                byte = data[name_start]
+                name_start += 1
+                strip = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[name_start]
+                    name_start += 1
+                    strip = ((strip + 1) << 7) | (byte & 0x7F)
+                if strip > len(path):
+                    return None
+                name_end = data.index(b"\0", name_start)
+                path = path[:len(path) - strip] + data[name_start:name_end]
+                offset = name_end + 1
+            else:
+                length = flags & 0xFFF
+                name_end = name_start + length if length < 0xFFF else data.index(b"\0", name_start)
+                if data[name_end] != 0:
+                    return None
+                path = data[name_start:name_end]
+                # Entries are NUL-padded to a multiple of eight bytes
+                offset += (name_end - offset + 8) & ~7
+            if offset > end:
+                return None
+            directory, _, name = path.rpartition(b"/")
+            if name in _MARKER_NAMES:
+                directories.add(directory)
+        while offset + 8 <= end:
+            signature, size = struct.unpack_from(">4sI", data, offset)
+            if signature == b"link":
+                return None
+            offset += 8 + size
+    except (IndexError, ValueError, struct.error):
+        return None
+    if offset != end:
+        return None
+    return tuple(sorted(os.fsdecode(directory) for directory in directories))
+
+
+class _GitIndex:
+    """The markers a git worktree tracks, as listed in its index.
+
+    Used for directory targets with BLOCK_GIT_INDEX=1 to find a committed
+    .block or .block.local below the target without walking the tree. Only
+    positives come from the index: markers can also be untracked, so when
+    no tracked marker is found the target is scanned as usual.
+    """
+
+    __slots__ = ("directories", "root")
+
+    def __init__(self, root: str, directories: tuple[str, ...]) -> None:
+        self.root = root
+        self.directories = directories
+
+    def first_marker(self, dir_path: str, budget: _ScanBudget) -> str | None:
+        """Return a tracked marker below dir_path that is still on disk, or None.
+
+        A prefix range query over the sorted marker directories, confirming
+        each with _dir_markers. A marker is reported only if os.walk would
+        reach it too.
+        """
+        import bisect
+
+        top = os.path.normpath(dir_path)
+        relative = os.path.relpath(top, self.root).replace(os.sep, "/")
+        prefix = "" if relative == "." else f"{relative}/"
+        walk_prefix = os.path.join(top, "")
+        position = bisect.bisect_left(self.directories, prefix)
+        while position < len(self.directories) and self.directories[position].startswith(prefix):
+            parts = self.directories[position][len(prefix):].split("/")
+            position += 1
+            if parts == [""] or budget.prune.intersection(parts):
+                continue
+            directory = os.path.join(top, *parts)
+            has_main, has_local = _dir_markers(directory)
+            if (has_main or has_local) and _reachable(walk_prefix, directory, budget.prune):
+                return os.path.join(directory, MARKER_FILE_NAME if has_main else LOCAL_MARKER_FILE_NAME)
+        return None
+
+
+def _git_index_for(dir_path: str) -> _GitIndex | None:
+    """The parsed index of the git worktree containing dir_path, or None.
 
+    None when dir_path is not inside a worktree, is reached through a
+    symlink below the worktree root, or the index cannot be read.
+    """
+    top = os.path.normpath(dir_path)
+    root = top
+    while not _is_repo_root(root):
+        parent = os.path.dirname(root)
+        if parent == root:
+            return None
+        root = parent
+    if root != top and not _reachable(os.path.join(root, ""), top, frozenset()):
+        return None
+    git_dir = _git_dir(root)
+    if git_dir is None:
+        return None
+    index_path = os.path.join(git_dir, "index")
+    signature = _marker_signature(index_path)
+    if signature is None:
+        return None
 
-def check_descendant_block_files(dir_path: str) -> Optional[str]:
+    memo = _GIT_INDEXES.get(root)
+    if memo is not None and memo[0] == signature:
+        return memo[1]
+    cache = _active_cache(_GitIndexCache)
+    entry = None if cache is None else cache.entries.get(root)
+    if entry is not None and entry[0] == signature:
+        directories = entry[1]
+    else:
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        result = _parse_git_index(data)
+        if result is None:
+            return None
+        directories = result
+        if cache is not None:
+            cache._store(root, signature[0], (signature, directories))
+    git_index = _GitIndex(root, directories)
+    _GIT_INDEXES[root] = (signature, git_index)
+    return git_index
+
+
+def check_descendant_block_files(dir_path: str) -> str | None:
     """Check if a directory contains .block files in any descendant directory.
 
     When a command targets a parent directory (e.g., rm -rf parent/),
     this scans child directories for .block or .block.local files to prevent
     bypassing directory-level protections by operating on a parent directory.
 
-    Returns path to first .block file found, or None.
+    With BLOCK_GIT_INDEX=1 and dir_path inside a git worktree, markers the
+    worktree's index tracks are checked first (see _GitIndex).
+    Directories named in the prune list are skipped, and the scan is bounded
+    by _ScanBudget. Returns path to first .block file found, or None. Raises
+    _ScanIncomplete when the budget runs out, unless the policy is to allow,
+    in which case a warning is issued and None is returned.
     """
     dir_path = get_full_path(dir_path)
 
+    if _snapshot is not None and dir_path in _snapshot.descendants:
+        return _snapshot.descendants[dir_path]
+
+    found = None
+    budget = _ScanBudget.from_env()
+    try:
+        git_index = _git_index_for(dir_path) if os.environ.get("BLOCK_GIT_INDEX") == "1" else None
+        if git_index is not None:
+            found = git_index.first_marker(dir_path, budget)
+        if found is None:
+            index = _active_cache(_MarkerIndex)
+            if index is not None:
+                try:
+                    found = index.known_descendant(dir_path, budget) or index.first_descendant(dir_path, budget)
+                except OSError:
+                    # Rescan from the filesystem within what is left of the budget
+                    index = None
+            if index is None:
+                found = _find_descendant_marker(dir_path, budget)
+    except _ScanIncomplete as exc:
+        if not budget.fail_open:
+            raise
+        import warnings
+
+        warnings.warn(
+            f"check_descendant_block_files: {exc} under '{dir_path}'; allowed by BLOCK_SCAN_ON_LIMIT=allow",
+            stacklevel=2,
+        )
+        return None
+
+    if _snapshot is not None:
+        _snapshot.descendants[dir_path] = found
+    return found
+
+
+def _find_descendant_marker(dir_path: str, budget: _ScanBudget | None = None) -> str | None:
+    """Walk dir_path's subtree for the first .block or .block.local file."""
+    import warnings
+
     if not os.path.isdir(dir_path):
         return None
+    if budget is None:
+        budget = _ScanBudget.from_env()
+
+    if budget.threads > 1:
+        return _scan_parallel(dir_path, budget)
 
     normalized = os.path.normpath(dir_path)
 
@@ -1033,9 +3018,11 @@ def check_descendant_block_files(dir_path: str) -> Optional[str]:
         )
 
     try:
-        for root, _dirs, files in os.walk(
+        for root, dirs, files in os.walk(
             dir_path, onerror=_walk_error,
         ):
+            budget.visit()
+            dirs[:] = budget.subdirectories(dirs)
             if os.path.normpath(root) == normalized:
                 continue
             if MARKER_FILE_NAME in files:
@@ -1051,6 +3038,79 @@ def check_descendant_block_files(dir_path: str) -> Optional[str]:
     return None
 
 
+def _list_directory(path: str) -> tuple[str, bool, bool, list[str]]:
+    """List one directory as os.walk sees it: (path, has .block, has .block.local, subdirectories).
+
+    Subdirectories exclude symlinked ones, which os.walk does not descend into.
+    """
+    has_main = has_local = False
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.is_symlink():
+                    subdirs.append(entry.name)
+            elif entry.name == MARKER_FILE_NAME:
+                has_main = True
+            elif entry.name == LOCAL_MARKER_FILE_NAME:
+                has_local = True
+    return path, has_main, has_local, subdirs
+
+
+def _scan_parallel(dir_path: str, budget: _ScanBudget) -> str | None:
+    """Search dir_path's subtree for a marker, listing directories concurrently.
+
+    Up to budget.threads listings are in flight at once, so on network
+    filesystems the round-trips overlap instead of adding up. The first
+    marker any worker finds is returned and queued listings are cancelled,
+    so which marker is reported may differ from os.walk order. Budget
+    checks run in the calling thread as listings complete.
+    """
+    import warnings
+    from collections import deque
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    top = os.path.normpath(dir_path)
+    frontier = deque([top])
+    pending: set = set()
+    pool = ThreadPoolExecutor(max_workers=budget.threads)
+    try:
+        while frontier or pending:
+            while frontier and len(pending) < budget.threads:
+                pending.add(pool.submit(_list_directory, frontier.popleft()))
+            done, pending = wait(pending, timeout=budget.remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                # Timed out waiting: visit() reports the wall-clock limit
+                budget.visit()
+            for future in done:
+                budget.visit()
+                try:
+                    path, has_main, has_local, subdirs = future.result()
+                except OSError as err:
+                    warnings.warn(
+                        f"check_descendant_block_files: cannot read '{err.filename}' under '{dir_path}': {err}",
+                        stacklevel=2,
+                    )
+                    continue
+                if path != top:
+                    if has_main:
+                        return os.path.join(path, MARKER_FILE_NAME)
+                    if has_local:
+                        return os.path.join(path, LOCAL_MARKER_FILE_NAME)
+                frontier.extend(os.path.join(path, name) for name in budget.subdirectories(subdirs))
+    finally:
+        # Listings already running finish in the background; their results
+        # are not waited for
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+    return None
+
+
 def test_is_marker_file(file_path: str) -> bool:
     """Check if path is a marker file (main or local)."""
     if not file_path:
@@ -1059,8 +3119,59 @@ def test_is_marker_file(file_path: str) -> bool:
     return filename in (MARKER_FILE_NAME, LOCAL_MARKER_FILE_NAME)
 
 
-def block_marker_removal(target_file: str) -> None:
-    """Block marker file removal."""
+def test_is_manifest_file(file_path: str) -> bool:
+    """Check if path is a compiled manifest (.block.compiled)."""
+    return bool(file_path) and os.path.basename(file_path) == COMPILED_MANIFEST_NAME
+
+
+def test_is_git_entry(file_path: str) -> bool:
+    """Check if path is or is inside a .git entry while repository roots are ceilings."""
+    if not file_path or os.environ.get("BLOCK_CEILING_REPO_ROOT") != "1":
+        return False
+    return ".git" in file_path.replace("\\", "/").split("/")
+
+
+def block_git_entry_write(target_file: str) -> dict:
+    """Build the decision that blocks writing a .git entry below a marker."""
+    message = f"""BLOCKED: Cannot modify .git entries under a {MARKER_FILE_NAME} file
+
+Target file: {target_file}
+
+With BLOCK_CEILING_REPO_ROOT=1, a .git entry marks where the search for {MARKER_FILE_NAME} files
+stops, so creating or changing one could hide the protection of the directories above it.
+Claude cannot modify .git entries here; ask the user to run git commands that need it."""
+
+    return {"decision": "block", "reason": message}
+
+
+def block_manifest_write(target_file: str) -> dict:
+    """Build the decision that blocks writing a compiled manifest."""
+    message = f"""BLOCKED: Cannot modify {COMPILED_MANIFEST_NAME}
+
+Target file: {target_file}
+
+The {COMPILED_MANIFEST_NAME} manifest tells the hook how .block files are configured, so only
+`protect_directories.py --compile` may write it. Claude cannot create, modify or remove it."""
+
+    return {"decision": "block", "reason": message}
+
+
+def block_scan_incomplete(dir_path: str, outcome: str) -> dict:
+    """Build the decision that blocks when a descendant scan ran out of budget."""
+    message = f"""BLOCKED: Could not finish checking for protected subdirectories
+
+Target directory: {dir_path}
+Outcome: {outcome}
+
+The command affects everything below this directory, and parts of it that may contain
+{MARKER_FILE_NAME} files were not checked. Target a smaller directory, or ask the user to raise
+BLOCK_SCAN_MAX_DIRS or BLOCK_SCAN_TIMEOUT_MS."""
+
+    return {"decision": "block", "reason": message}
+
+
+def block_marker_removal(target_file: str) -> dict:
+    """Build the decision that blocks marker file removal."""
     filename = os.path.basename(target_file)
     message = f"""BLOCKED: Cannot modify {filename}
 
@@ -1071,12 +3182,11 @@ This is a safety mechanism to ensure directory protection remains in effect.
 
 To remove protection, manually delete the file using your file manager or terminal."""
 
-    print(json.dumps({"decision": "block", "reason": message}))
-    sys.exit(0)
+    return {"decision": "block", "reason": message}
 
 
-def block_config_error(marker_path: str, error_message: str) -> None:
-    """Block config error."""
+def block_config_error(marker_path: str, error_message: str) -> dict:
+    """Build the decision that blocks on a config error."""
     message = f"""BLOCKED: Invalid {MARKER_FILE_NAME} configuration
 
 Marker file: {marker_path}
@@ -1087,136 +3197,122 @@ Please fix the configuration file. Valid formats:
   - {{ "allowed": ["pattern"] }} = only allow matching paths
   - {{ "blocked": ["pattern"] }} = only block matching paths"""
 
-    print(json.dumps({"decision": "block", "reason": message}))
-    sys.exit(0)
+    return {"decision": "block", "reason": message}
 
 
-def block_with_message(target_file: str, marker_path: str, reason: str, guide: str) -> None:
-    """Block with message."""
+def block_with_message(target_file: str, marker_path: str, reason: str, guide: str) -> dict:
+    """Build the decision that blocks with a guide or default message."""
     if guide:
         message = guide
     else:
         message = f"BLOCKED by .block: {marker_path}"
 
-    print(json.dumps({"decision": "block", "reason": message}))
-    sys.exit(0)
+    return {"decision": "block", "reason": message}
 
 
-def test_should_block(file_path: str, protection_info: dict) -> dict:
+def test_should_block(file_path: str, protection_info: ProtectionInfo | dict) -> BlockResult:
     """Test if operation should be blocked."""
-    config = protection_info["config"]
+    config = _as_config(protection_info["config"])
     marker_dir = protection_info["marker_directory"]
-    guide = config.get("guide", "")
-
-    if config.get("has_error"):
-        return {
-            "should_block": True,
-            "reason": config.get("error_message", "Configuration error"),
-            "is_config_error": True,
-            "guide": ""
-        }
-
-    if config.get("is_empty"):
-        return {
-            "should_block": True,
-            "reason": "This directory tree is protected from Claude edits (full protection).",
-            "is_config_error": False,
-            "guide": guide
-        }
+    guide = config.guide
+
+    if config.has_error:
+        return BlockResult(True, config.error_message, True, "")
+
+    if config.is_empty:
+        return BlockResult(True, "This directory tree is protected from Claude edits (full protection).", False, guide)
 
     # Check for allow_all flag (empty blocked array means "allow everything")
-    if config.get("allow_all"):
-        return {
-            "should_block": False,
-            "reason": "",
-            "is_config_error": False,
-            "guide": ""
-        }
+    if config.allow_all:
+        return _ALLOW_RESULT
+
+    relative_path = get_relative_path(file_path, marker_dir)
 
     # Check if we're in allowed mode (allowed key was present in config)
-    has_allowed_key = config.get("has_allowed_key", False)
-    allowed_list = config.get("allowed", [])
-    if has_allowed_key:
-        for entry in allowed_list:
-            if isinstance(entry, str):
-                pattern = entry
-            else:
-                pattern = entry.get("pattern", "")
-
-            if test_path_matches_pattern(file_path, pattern, marker_dir):
-                return {
-                    "should_block": False,
-                    "reason": "",
-                    "is_config_error": False,
-                    "guide": ""
-                }
-
-        return {
-            "should_block": True,
-            "reason": "Path is not in the allowed list.",
-            "is_config_error": False,
-            "guide": guide
-        }
+    if config.has_allowed_key:
+        if compile_pattern_list(config.allowed).first_match(relative_path) is not None:
+            return _ALLOW_RESULT
+        return BlockResult(True, "Path is not in the allowed list.", False, guide)
 
     # Check if we're in blocked mode (blocked key was present in config)
-    has_blocked_key = config.get("has_blocked_key", False)
-    blocked_list = config.get("blocked", [])
-    if has_blocked_key:
-        for entry in blocked_list:
-            if isinstance(entry, str):
-                pattern = entry
-                entry_guide = ""
-            else:
-                pattern = entry.get("pattern", "")
-                entry_guide = entry.get("guide", "")
-
-            if test_path_matches_pattern(file_path, pattern, marker_dir):
-                effective_guide = entry_guide if entry_guide else guide
-                return {
-                    "should_block": True,
-                    "reason": f"Path matches blocked pattern: {pattern}",
-                    "is_config_error": False,
-                    "guide": effective_guide
-                }
+    if config.has_blocked_key:
+        match = compile_pattern_list(config.blocked).first_match(relative_path)
+        if match is not None:
+            pattern, entry_guide = match
+            effective_guide = entry_guide if entry_guide else guide
+            return BlockResult(True, f"Path matches blocked pattern: {pattern}", False, effective_guide)
 
         # No pattern matched, allow (blocked mode with no matches = allow)
-        return {
-            "should_block": False,
-            "reason": "",
-            "is_config_error": False,
-            "guide": ""
-        }
+        return _ALLOW_RESULT
 
-    return {
-        "should_block": True,
-        "reason": "This directory tree is protected from Claude edits.",
-        "is_config_error": False,
-        "guide": guide
-    }
+    return BlockResult(True, "This directory tree is protected from Claude edits.", False, guide)
 
 
-def main():
-    """Main entry point."""
-    hook_input = sys.stdin.read()
+def _with_marker_snapshot(evaluate: Callable[[Any], dict | None], arg: Any) -> dict | None:
+    """Call evaluate(arg) with marker lookups memoized for that one call.
 
+    Reuses the snapshot already active for a batch instead of replacing it.
+    """
+    global _snapshot  # noqa: PLW0603 - decision-scoped memo, reset in finally
+    if _snapshot is not None:
+        return evaluate(arg)
+    if _watcher is not None:
+        _watcher.drain()
+    _snapshot = _MarkerSnapshot()
+    try:
+        return evaluate(arg)
+    finally:
+        _save_caches(_snapshot)
+        _snapshot = None
+
+
+def evaluate_hook_input(hook_input: str) -> dict | None:
+    """Evaluate one PreToolUse hook input.
+
+    Returns the block decision dict, or None when the tool call is allowed.
+    This is everything main() does except reading stdin and printing, so
+    long-lived callers (see protect_daemon.py) can reuse it.
+    """
+    return _with_marker_snapshot(_evaluate_hook_input, hook_input)
+
+
+def _evaluate_hook_input(hook_input: str) -> dict | None:
     quick_path = extract_path_without_json(hook_input)
 
     if quick_path:
-        quick_dir = os.path.dirname(quick_path)
-        if not os.path.isabs(quick_path) and not (len(quick_path) >= 2 and quick_path[1] == ":"):
-            quick_dir = os.path.join(os.getcwd(), quick_dir)
+        # Same directory string test_directory_protected() starts from, so
+        # its walk reuses the lookups made here.
+        quick_dir = os.path.dirname(get_full_path(quick_path))
 
-        if not has_block_file_in_hierarchy(quick_dir):
-            sys.exit(0)
+        if not has_block_file_in_hierarchy(quick_dir) and not test_is_manifest_file(quick_path):
+            return None
+    else:
+        command = extract_bash_command_without_json(hook_input)
+        if command is not None and not bash_command_may_be_protected(command):
+            return None
+
+    import json
 
     try:
         data = json.loads(hook_input)
     except json.JSONDecodeError:
-        sys.exit(0)
+        return None
+
+    return _evaluate_hook_data(data)
+
+
+def evaluate_hook_data(data: dict) -> dict | None:
+    """Evaluate an already-parsed hook input (see evaluate_hook_input)."""
+    return _with_marker_snapshot(_evaluate_hook_data, data)
+
+
+def _evaluate_hook_data(data: dict) -> dict | None:
+    if not isinstance(data, dict):
+        return None
 
     tool_name = data.get("tool_name", "")
     if not tool_name:
-        sys.exit(0)
+        return None
 
     tool_input = data.get("tool_input", {})
     paths_to_check = []
@@ -1234,7 +3330,7 @@ def main():
         if command:
             paths_to_check.extend(get_bash_target_paths(command))
     else:
-        sys.exit(0)
+        return None
 
     # Lazy agent resolution: resolved once when first needed, cached for all paths
     agent_state = {"resolved": False, "type": None}
@@ -1243,24 +3339,31 @@ def main():
         if not path:
             continue
 
+        if test_is_manifest_file(path):
+            return block_manifest_write(get_full_path(path))
+
+        if test_is_git_entry(path):
+            full_path = get_full_path(path)
+            if has_block_file_in_hierarchy(os.path.dirname(full_path)):
+                return block_git_entry_write(full_path)
+
         if test_is_marker_file(path):
             full_path = get_full_path(path)
             if os.path.isfile(full_path):
-                block_marker_removal(full_path)
+                return block_marker_removal(full_path)
 
         protection_info = test_directory_protected(path)
 
         if protection_info:
-            config = protection_info["config"]
-            target_file = protection_info["target_file"]
-            marker_path = protection_info["marker_path"]
+            target_file = protection_info.target_file
+            marker_path = protection_info.marker_path
 
-            if not _agent_exempt(config, data, agent_state):
+            if not _agent_exempt(protection_info.config, data, agent_state):
                 block_result = test_should_block(target_file, protection_info)
-                if block_result["is_config_error"]:
-                    block_config_error(marker_path, block_result["reason"])
-                elif block_result["should_block"]:
-                    block_with_message(target_file, marker_path, block_result["reason"], block_result["guide"])
+                if block_result.is_config_error:
+                    return block_config_error(marker_path, block_result.reason)
+                if block_result.should_block:
+                    return block_with_message(target_file, marker_path, block_result.reason, block_result.guide)
 
         # Check if path targets a directory with its own or descendant .block files.
         # test_directory_protected() uses dirname() which may skip the target
@@ -1270,25 +3373,179 @@ def main():
         if os.path.isdir(full_path):
             # Check the target directory itself for .block files.
             dir_info = get_merged_dir_config(full_path)
-            if dir_info and not _agent_exempt(dir_info["config"], data, agent_state):
-                guide = dir_info["config"].get("guide", "")
-                block_with_message(
-                    full_path, dir_info["marker_path"],
-                    "Directory is protected", guide,
+            if dir_info and not _agent_exempt(dir_info.config, data, agent_state):
+                return block_with_message(
+                    full_path, dir_info.marker_path,
+                    "Directory is protected", dir_info.config.guide,
                 )
 
             # Check descendant directories for .block files.
-            descendant_marker = check_descendant_block_files(full_path)
+            try:
+                descendant_marker = check_descendant_block_files(full_path)
+            except _ScanIncomplete as exc:
+                return block_scan_incomplete(full_path, str(exc))
             if descendant_marker:
                 marker_dir = os.path.dirname(descendant_marker)
                 desc_info = get_merged_dir_config(marker_dir)
-                if desc_info and not _agent_exempt(desc_info["config"], data, agent_state):
-                    guide = desc_info["config"].get("guide", "")
-                    block_with_message(
-                        full_path, desc_info["marker_path"],
-                        "Child directory is protected", guide,
+                if desc_info and not _agent_exempt(desc_info.config, data, agent_state):
+                    return block_with_message(
+                        full_path, desc_info.marker_path,
+                        "Child directory is protected", desc_info.config.guide,
                     )
 
+    return None
+
+
+def serve_stdio() -> None:
+    """Answer newline-delimited JSON requests on stdin until EOF.
+
+    Used by the OpenCode plugin to keep one worker process alive instead of
+    spawning Python per tool call. One request per line, answered in order:
+      request:  {"id": <any>, "cwd": "<dir>", "input": {<hook input>}}
+      response: {"id": <same>, "decision": {<block decision>} | null}
+               {"id": <same>, "error": "<message>"} if evaluation failed
+    """
+    import json
+
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            if request.get("cwd"):
+                os.chdir(request["cwd"])
+            response = {"id": request_id, "decision": evaluate_hook_data(request.get("input"))}
+        except Exception as exc:
+            response = {"id": request_id, "error": f"{type(exc).__name__}: {exc}"}
+
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+def evaluate_batch(lines: Iterable[str], out: TextIO) -> None:
+    """Evaluate JSONL hook inputs, writing one JSONL decision per input line.
+
+    Each output line is the block decision, or {} when the call is allowed
+    (including blank and malformed input lines, and inputs whose evaluation
+    raised, which are reported as warnings), so output line N always
+    answers input line N. Relative paths resolve against the input's "cwd"
+    field when it names an existing directory, else the process cwd.
+
+    The whole batch shares one marker snapshot: marker lookups and
+    descendant scans are answered once per directory, and parsed configs are
+    reused across inputs. Markers changing mid-batch are not picked up.
+    """
+    import json
+
+    global _snapshot  # noqa: PLW0603 - batch-scoped memo, reset in finally
+    start_cwd = os.getcwd()
+    _snapshot = _MarkerSnapshot()
+    try:
+        for number, line in enumerate(lines, 1):
+            decision = None
+            try:
+                data = json.loads(line) if line.strip() else None
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict):
+                cwd = data.get("cwd")
+                os.chdir(cwd if isinstance(cwd, str) and os.path.isdir(cwd) else start_cwd)
+                try:
+                    decision = evaluate_hook_data(data)
+                except Exception as exc:
+                    import warnings
+
+                    warnings.warn(f"evaluate_batch: line {number}: {type(exc).__name__}: {exc}", stacklevel=2)
+            out.write(json.dumps(decision or {}) + "\n")
+    finally:
+        _save_caches(_snapshot)
+        _snapshot = None
+        os.chdir(start_cwd)
+
+
+def _manifest_marker_record(marker_path: str) -> tuple[list | None, BlockConfig | None]:
+    """Return (manifest info, parsed config) of one marker, from a single read.
+
+    Returns (None, None) for a missing marker, and raises ValueError for a
+    marker that cannot be read as UTF-8 text.
+    """
+    import hashlib
+    import time
+
+    try:
+        st = os.stat(marker_path)
+        if not stat.S_ISREG(st.st_mode):
+            return None, None
+        with open(marker_path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None, None
+    # A marker changed within the racy window could change again without
+    # its mtime moving, so only its content hash is recorded
+    racy = time.time_ns() - st.st_mtime_ns < _CACHE_RACY_NS
+    info = [len(raw), None if racy else st.st_mtime_ns, hashlib.sha256(raw).hexdigest()]
+    return info, _parse_lock_content(raw.decode("utf-8"))
+
+
+def compile_manifest(root: str) -> int:
+    """Write root/.block.compiled for every marker directory below root.
+
+    Each directory's .block and .block.local are read once, parsed and
+    merged, and recorded with their content hashes. Returns the number of
+    directories recorded.
+    """
+    import json
+
+    root = os.path.abspath(root)
+    entries = {}
+    for dirpath, dirnames, _filenames in os.walk(root):
+        if ".git" in dirnames:
+            dirnames.remove(".git")
+        try:
+            main_info, main_config = _manifest_marker_record(os.path.join(dirpath, MARKER_FILE_NAME))
+            local_info, local_config = _manifest_marker_record(os.path.join(dirpath, LOCAL_MARKER_FILE_NAME))
+        except ValueError:
+            # Not UTF-8: left to live parsing
+            continue
+        if main_info is None and local_info is None:
+            continue
+        merged = merge_configs(main_config or _create_empty_config(), local_config)
+        relative = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        entries[relative] = [main_info, local_info, list(merged.astuple())]
+
+    path = os.path.join(root, COMPILED_MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "markers": entries}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def main():
+    """Main entry point."""
+    if sys.argv[1:2] == ["--serve"]:
+        serve_stdio()
+        sys.exit(0)
+    if sys.argv[1:2] == ["--batch"]:
+        evaluate_batch(sys.stdin, sys.stdout)
+        sys.exit(0)
+    if sys.argv[1:2] == ["--compile"]:
+        root = sys.argv[2] if len(sys.argv) > 2 else "."
+        count = compile_manifest(root)
+        print(f"Compiled {count} protected directories into {os.path.join(root, COMPILED_MANIFEST_NAME)}")
+        sys.exit(0)
+
+    decision = evaluate_hook_input(sys.stdin.read())
+    if decision:
+        import json
+
+        print(json.dumps(decision))
     sys.exit(0)
 
 
@@ -7,9 +7,15 @@ setlocal EnableDelayedExpansion
 set "HOOK_DIR=%~dp0"
 
 REM Call Python to evaluate protection rules
+REM Prefer the precompiled bundle (scripts/build_hook_bundle.py) with isolated flags
 where python >nul 2>&1
 if %errorlevel% equ 0 (
-    python "%HOOK_DIR%protect_directories.py"
+    if exist "%HOOK_DIR%block-hooks.pyz" (
+        python -E -s -S "%HOOK_DIR%block-hooks.pyz" protect
+        exit /b !errorlevel!
+    )
+    REM Import rather than run the script so Python reuses its cached bytecode
+    python -c "import sys; sys.path[0] = sys.argv.pop(1); import protect_directories; protect_directories.main()" "%HOOK_DIR%."
     exit /b !errorlevel!
 )
 
@@ -20,13 +26,28 @@ CMDBLOCK
 # Unix: here-doc above discards batch code
 HOOK_DIR="$(cd "$(dirname "$0")" && pwd)"
 
+# Opt-in daemon: the thin client forwards to protect_daemon.py and falls back
+# to in-process evaluation when the daemon is missing or stale.
+# Otherwise prefer the precompiled bundle (scripts/build_hook_bundle.py) with
+# isolated interpreter flags, falling back to the plain module. The module is
+# imported rather than run as a script so Python reuses its cached bytecode
+# instead of compiling the whole file on every call; sys.path[0] is replaced
+# so nothing is imported from the project directory.
+if [ -n "$BLOCK_DAEMON_SOCKET" ]; then
+    set -- "$HOOK_DIR/protect_client.py"
+elif [ -f "$HOOK_DIR/block-hooks.pyz" ]; then
+    set -- -E -s -S "$HOOK_DIR/block-hooks.pyz" protect
+else
+    set -- -c 'import sys; sys.path[0] = sys.argv.pop(1); import protect_directories; protect_directories.main()' "$HOOK_DIR"
+fi
+
 # Call Python to evaluate protection rules
 if command -v python3 >/dev/null 2>&1; then
-    python3 "$HOOK_DIR/protect_directories.py"
+    python3 "$@"
     exit $?
 fi
 if command -v python >/dev/null 2>&1; then
-    python "$HOOK_DIR/protect_directories.py"
+    python "$@"
     exit $?
 fi
 
@@ -7,8 +7,13 @@ setlocal EnableDelayedExpansion
 set "HOOK_DIR=%~dp0"
 
 REM Call Python to track subagent events
+REM Prefer the precompiled bundle (scripts/build_hook_bundle.py) with isolated flags
 where python >nul 2>&1
 if %errorlevel% equ 0 (
+    if exist "%HOOK_DIR%block-hooks.pyz" (
+        python -E -s -S "%HOOK_DIR%block-hooks.pyz" subagent
+        exit /b 0
+    )
     python "%HOOK_DIR%subagent_tracker.py"
     exit /b 0
 )
@@ -20,13 +25,21 @@ CMDBLOCK
 # Unix: here-doc above discards batch code
 HOOK_DIR="$(cd "$(dirname "$0")" && pwd)"
 
+# Prefer the precompiled bundle (scripts/build_hook_bundle.py) with isolated
+# interpreter flags, falling back to the plain script
+if [ -f "$HOOK_DIR/block-hooks.pyz" ]; then
+    set -- -E -s -S "$HOOK_DIR/block-hooks.pyz" subagent
+else
+    set -- "$HOOK_DIR/subagent_tracker.py"
+fi
+
 # Call Python to track subagent events
 if command -v python3 >/dev/null 2>&1; then
-    python3 "$HOOK_DIR/subagent_tracker.py"
+    python3 "$@"
     exit 0
 fi
 if command -v python >/dev/null 2>&1; then
-    python "$HOOK_DIR/subagent_tracker.py"
+    python "$@"
     exit 0
 fi
 
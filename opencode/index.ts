@@ -8,7 +8,9 @@
  * This is the OpenCode equivalent of the Claude Code PreToolUse hook.
  */
 import type { Plugin } from "@opencode-ai/plugin";
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
 import { resolve } from "path";
+import { createInterface } from "readline";
 
 /** Tools that modify files and should be checked against .block rules. */
 const PROTECTED_TOOLS = new Set(["edit", "write", "bash", "patch"]);
@@ -24,6 +26,40 @@ const TOOL_NAME_MAP: Record<string, string> = {
   patch: "Write",
 };
 
+/** protect_directories.py's default for BLOCK_SCAN_TIMEOUT_MS. */
+const DEFAULT_SCAN_TIMEOUT_MS = 4000;
+
+/**
+ * Wall-clock limit of one descendant scan in the worker, which inherits
+ * BLOCK_SCAN_TIMEOUT_MS. With no limit (0) the default sizes the worker timeout.
+ */
+function scanTimeoutMs(): number {
+  const value = Number.parseInt(process.env.BLOCK_SCAN_TIMEOUT_MS ?? "", 10);
+  return value > 0 ? value : DEFAULT_SCAN_TIMEOUT_MS;
+}
+
+/**
+ * Milliseconds to wait for a worker decision before falling back. A scan
+ * that runs to its limit still answers (with a block) inside this window,
+ * so it is not mistaken for a hung worker and scanned again.
+ */
+const WORKER_TIMEOUT_MS = scanTimeoutMs() + 2000;
+
+/** Consecutive worker failures after which the worker is no longer restarted. */
+const MAX_WORKER_FAILURES = 3;
+
+/** Hook input in the format protect_directories.py expects. */
+interface HookInput {
+  tool_name: string;
+  tool_input: Record<string, unknown>;
+}
+
+/** Decision printed by protect_directories.py (absent when allowed). */
+interface HookDecision {
+  decision?: string;
+  reason?: string;
+}
+
 /**
  * Build the JSON input that protect_directories.py expects on stdin.
  *
@@ -36,7 +72,7 @@ const TOOL_NAME_MAP: Record<string, string> = {
 function buildHookInput(
   tool: string,
   args: Record<string, unknown>,
-): string | null {
+): HookInput | null {
   const toolName = TOOL_NAME_MAP[tool];
   if (!toolName) return null;
 
@@ -51,7 +87,7 @@ function buildHookInput(
     toolInput.file_path = args.filePath;
   }
 
-  return JSON.stringify({ tool_name: toolName, tool_input: toolInput });
+  return { tool_name: toolName, tool_input: toolInput };
 }
 
 /**
@@ -83,8 +119,150 @@ function findScript(): string {
   return resolve(pluginDir, "..", "hooks", "protect_directories.py");
 }
 
+interface PendingRequest {
+  resolve: (decision: HookDecision | null) => void;
+  reject: (err: Error) => void;
+  timer: ReturnType<typeof setTimeout>;
+}
+
+/**
+ * One long-lived `python3 protect_directories.py --serve` process.
+ *
+ * Requests and decisions are newline-delimited JSON on the worker's
+ * stdin/stdout, so a tool call costs a pipe round-trip instead of a shell
+ * plus a Python start. The worker is started lazily, restarted after a crash
+ * or timeout, and given up on after MAX_WORKER_FAILURES failures in a row.
+ */
+class ProtectionWorker {
+  private proc: ChildProcessWithoutNullStreams | null = null;
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 1;
+  private failures = 0;
+
+  constructor(private readonly scriptPath: string) {}
+
+  /** False once the worker has failed too often to keep restarting it. */
+  get usable(): boolean {
+    return this.failures < MAX_WORKER_FAILURES;
+  }
+
+  /** Evaluate one hook input; rejects if the worker fails or times out. */
+  check(hookInput: HookInput): Promise<HookDecision | null> {
+    const proc = this.proc ?? this.start();
+    const id = this.nextId++;
+
+    return new Promise((resolvePromise, rejectPromise) => {
+      const timer = setTimeout(() => {
+        this.fail(new Error(`worker timed out after ${WORKER_TIMEOUT_MS} ms`));
+      }, WORKER_TIMEOUT_MS);
+      this.pending.set(id, { resolve: resolvePromise, reject: rejectPromise, timer });
+
+      const request = { id, cwd: process.cwd(), input: hookInput };
+      proc.stdin.write(`${JSON.stringify(request)}\n`);
+    });
+  }
+
+  private start(): ChildProcessWithoutNullStreams {
+    const proc = spawn("python3", [this.scriptPath, "--serve"], {
+      stdio: ["pipe", "pipe", "pipe"],
+    });
+    this.proc = proc;
+
+    createInterface({ input: proc.stdout }).on("line", (line) => this.onLine(line));
+    // Drain stderr (Python warnings) so the pipe never fills up
+    proc.stderr.resume();
+    proc.stdin.on("error", (err) => this.fail(err));
+    proc.on("error", (err) => this.fail(err));
+    proc.on("exit", (code, signal) => {
+      if (this.proc === proc) {
+        this.fail(new Error(`worker exited (code ${code}, signal ${signal})`));
+      }
+    });
+    // Don't keep OpenCode's event loop alive just for the worker; it exits
+    // on its own when stdin closes
+    proc.unref();
+    for (const stream of [proc.stdin, proc.stdout, proc.stderr]) {
+      (stream as unknown as { unref?: () => void }).unref?.();
+    }
+    return proc;
+  }
+
+  private onLine(line: string): void {
+    let response: { id?: number; decision?: HookDecision | null; error?: string };
+    try {
+      response = JSON.parse(line);
+    } catch {
+      return;
+    }
+    const request = response.id === undefined ? undefined : this.pending.get(response.id);
+    if (!request) return;
+
+    this.pending.delete(response.id as number);
+    clearTimeout(request.timer);
+    if (response.error) {
+      request.reject(new Error(response.error));
+      return;
+    }
+    this.failures = 0;
+    request.resolve(response.decision ?? null);
+  }
+
+  /** Tear down the current worker and reject everything still in flight. */
+  private fail(err: Error): void {
+    const proc = this.proc;
+    if (!proc) return;
+    this.proc = null;
+    this.failures++;
+    proc.kill();
+    for (const request of this.pending.values()) {
+      clearTimeout(request.timer);
+      request.reject(err);
+    }
+    this.pending.clear();
+  }
+}
+
+/**
+ * Evaluate one hook input with a fresh `python3` process (the pre-worker
+ * behaviour, used when the worker is unavailable).
+ */
+async function checkOnce(
+  $: Parameters<Plugin>[0]["$"],
+  scriptPath: string,
+  hookInput: HookInput,
+): Promise<HookDecision | null> {
+  try {
+    const payload = JSON.stringify(hookInput);
+    const result = await $`echo ${payload} | python3 ${scriptPath}`.quiet();
+    const stdout = result.stdout.toString().trim();
+    if (!stdout) return null;
+    return JSON.parse(stdout);
+  } catch (err: unknown) {
+    if (err instanceof SyntaxError) {
+      // Python output wasn't JSON — not a block, ignore
+      return null;
+    }
+    if (err instanceof Error && err.message) {
+      const msg = err.message;
+      // Infrastructure failures (python3 not found, spawn errors) should
+      // not prevent the operation — log a warning and let it proceed.
+      if (
+        (err as NodeJS.ErrnoException).code === "ENOENT" ||
+        msg.includes("not found") ||
+        msg.includes("No such file") ||
+        msg.includes("python3")
+      ) {
+        console.warn(`[block] Protection check skipped: ${msg}`);
+        return null;
+      }
+    }
+    throw err;
+  }
+}
+
 export const BlockPlugin: Plugin = async ({ $ }) => {
   const scriptPath = findScript();
+  const worker = new ProtectionWorker(scriptPath);
 
   return {
     "tool.execute.before": async (input, output) => {
@@ -96,38 +274,22 @@ export const BlockPlugin: Plugin = async ({ $ }) => {
       );
       if (!hookInput) return;
 
-      try {
-        const result =
-          await $`echo ${hookInput} | python3 ${scriptPath}`.quiet();
-        const stdout = result.stdout.toString().trim();
-        if (!stdout) return;
-
-        const decision = JSON.parse(stdout);
-        if (decision.decision === "block") {
-          throw new Error(decision.reason);
-        }
-      } catch (err: unknown) {
-        if (err instanceof SyntaxError) {
-          // Python output wasn't JSON — not a block, ignore
-          return;
-        }
-        // Block errors from our own throw above — re-throw
-        if (err instanceof Error && err.message) {
-          const msg = err.message;
-          // Infrastructure failures (python3 not found, spawn errors) should
-          // not prevent the operation — log a warning and let it proceed.
-          if (
-            (err as NodeJS.ErrnoException).code === "ENOENT" ||
-            msg.includes("not found") ||
-            msg.includes("No such file") ||
-            msg.includes("python3")
-          ) {
-            console.warn(`[block] Protection check skipped: ${msg}`);
-            return;
-          }
+      let decision: HookDecision | null = null;
+      let decided = false;
+      if (worker.usable) {
+        try {
+          decision = await worker.check(hookInput);
+          decided = true;
+        } catch {
+          // Worker crashed, timed out or failed to evaluate — use a one-shot check
         }
-        // Re-throw actual block errors and other unexpected failures
-        throw err;
+      }
+      if (!decided) {
+        decision = await checkOnce($, scriptPath, hookInput);
+      }
+
+      if (decision?.decision === "block") {
+        throw new Error(decision.reason);
       }
     },
   };
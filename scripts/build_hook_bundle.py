@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Build the precompiled hook bundle (hooks/block-hooks.pyz).
+
+Packs protect_directories.py and subagent_tracker.py into a single zip
+application together with bytecode compiled for the building interpreter.
+run-hook.cmd and run-subagent-hook.cmd launch the bundle with `-E -s -S`
+when it exists, which skips site processing, user site-packages, PYTHON*
+environment variables and source compilation on every hook call.
+
+Build with the same interpreter the hooks use:
+  python3 scripts/build_hook_bundle.py
+
+The bundle records the size and mtime of each source it was built from. If
+a source next to the bundle changes afterwards (e.g. a plugin update), the
+bundle imports that source instead, so a stale bundle never shadows new code.
+A bundle used with a different Python version falls back to the sources
+stored inside it, because zipimport ignores bytecode with a foreign magic
+number.
+"""
+
+import argparse
+import os
+import py_compile
+import sys
+import tempfile
+import zipfile
+
+HOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hooks")
+BUNDLE_NAME = "block-hooks.pyz"
+HOOK_MODULES = ("protect_directories", "subagent_tracker")
+
+MAIN_TEMPLATE = '''"""Entry point of the precompiled .block hook bundle (see build_hook_bundle.py)."""
+import os
+import sys
+
+# (size, mtime_ns) of each hook source at build time
+BUILT_FROM = {built_from!r}
+
+
+def _select_module():
+    """Pick the hook from argv[1] ("protect" or "subagent")."""
+    name = "subagent_tracker" if sys.argv[1:2] == ["subagent"] else "protect_directories"
+    del sys.argv[1:2]
+    return name
+
+
+def _prefer_changed_source(name):
+    """Import the sibling source instead of the bundled copy if it changed."""
+    hook_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+    try:
+        st = os.stat(os.path.join(hook_dir, name + ".py"))
+    except OSError:
+        return
+    if (st.st_size, st.st_mtime_ns) != BUILT_FROM.get(name):
+        sys.path.insert(0, hook_dir)
+
+
+_name = _select_module()
+_prefer_changed_source(_name)
+__import__(_name).main()
+'''
+
+
+def _compiled(source_path: str) -> bytes:
+    """Compile a source file to unchecked-hash bytecode and return it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cfile = os.path.join(tmp, "module.pyc")
+        py_compile.compile(
+            source_path,
+            cfile=cfile,
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+        with open(cfile, "rb") as f:
+            return f.read()
+
+
+def build_bundle(output_path: str, hook_dir: str = HOOKS_DIR) -> str:
+    """Build the bundle from hook_dir into output_path and return the path."""
+    built_from = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        main_path = os.path.join(tmp, "__main__.py")
+        entries = []
+        for name in HOOK_MODULES:
+            source = os.path.join(hook_dir, f"{name}.py")
+            st = os.stat(source)
+            built_from[name] = (st.st_size, st.st_mtime_ns)
+            entries.append((source, f"{name}.py", f"{name}.pyc"))
+
+        with open(main_path, "w", encoding="utf-8") as f:
+            f.write(MAIN_TEMPLATE.format(built_from=built_from))
+        entries.append((main_path, "__main__.py", "__main__.pyc"))
+
+        # Write next to the target and rename, so hooks running concurrently
+        # never see a half-written archive
+        fd, tmp_output = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            # ZIP_STORED: zipimport can read entries without importing zlib
+            with zipfile.ZipFile(tmp_output, "w", zipfile.ZIP_STORED) as archive:
+                for source, source_name, pyc_name in entries:
+                    archive.write(source, source_name)
+                    archive.writestr(pyc_name, _compiled(source))
+            os.replace(tmp_output, output_path)
+        except BaseException:
+            os.unlink(tmp_output)
+            raise
+    return output_path
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Build the precompiled .block hook bundle.")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=os.path.join(HOOKS_DIR, BUNDLE_NAME),
+        help=f"output path (default: hooks/{BUNDLE_NAME})",
+    )
+    args = parser.parse_args()
+    path = build_bundle(args.output)
+    print(f"Built {path} for Python {sys.version_info[0]}.{sys.version_info[1]}")
+
+
+if __name__ == "__main__":
+    main()
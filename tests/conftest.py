@@ -2,6 +2,7 @@
 Shared fixtures and utilities for block plugin tests.
 """
 import json
+import os
 import subprocess
 import sys
 from pathlib import Path
@@ -22,6 +23,58 @@ def hooks_dir():
     return Path(__file__).parent.parent / "hooks"
 
 
+# An mtime well outside the racy window in which on-disk caches distrust files
+OLD = 1_000_000_000
+
+
+def backdate(path: Path, mtime: int = OLD) -> Path:
+    """Set a file's or directory's mtime so cache entries for it are trusted."""
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def age_tree(root: Path) -> None:
+    """Backdate every directory under root so marker index entries for it are trusted."""
+    for dirpath, _dirs, _files in os.walk(root):
+        os.utime(dirpath, (OLD, OLD))
+
+
+def reset_process_caches(module) -> None:
+    """Forget everything a loaded hook module holds in memory, as a new hook process would."""
+    module._cache_files.clear()
+    for table in (
+        module._CONFIG_CACHE, module._DIR_CONFIGS, module._CHAIN_CONFIGS, module._MANIFESTS,
+        module._GIT_INDEXES, module._PATTERN_CACHE, module._PATTERN_LISTS, module._PATTERN_LIST_IDS,
+    ):
+        table.clear()
+
+
+@pytest.fixture
+def hook_module(request):
+    """The protect_directories module the requesting test file loaded as _pd."""
+    return request.module._pd
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch, hook_module):
+    """An empty project directory as cwd, without BLOCK_CACHE_DIR and with fresh process caches."""
+    root = tmp_path / "project"
+    root.mkdir()
+    monkeypatch.chdir(root)
+    monkeypatch.delenv("BLOCK_CACHE_DIR", raising=False)
+    reset_process_caches(hook_module)
+    yield root
+    reset_process_caches(hook_module)
+
+
+@pytest.fixture
+def cache_env(tmp_path, project, monkeypatch):
+    """The project fixture with BLOCK_CACHE_DIR set; yields (project, cache_dir)."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("BLOCK_CACHE_DIR", str(cache_dir))
+    return project, cache_dir
+
+
 # Utility functions - can be imported by test modules
 def create_block_file(directory: Path, content: Optional[str] = None) -> Path:
     """Create a .block file with given content."""
@@ -0,0 +1,113 @@
+"""Tests for the Bash marker pre-filter that runs before json.loads."""
+import importlib.util
+import json
+import random
+from pathlib import Path
+
+from tests.conftest import create_block_file, is_blocked, make_bash_input, run_hook
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+COMMANDS = [
+    "ls -la",
+    "rm -rf build dist",
+    'rm "my file.txt" other',
+    "echo hi > out.txt",
+    "echo hi >>out.txt",
+    "echo a>b<c",
+    "dd if=/dev/zero of=/tmp/disk.img bs=1M",
+    "dd if=x of='quoted path'",
+    "sed -i 's/a/b/' file.txt",
+    "sed -i -e 's/a/b/' -e 's/c/d/' one two",
+    "awk -i inplace '{print}' data.csv",
+    "perl -pi -e 's/x/y/' a.pl",
+    "patch -o out.c < fix.diff",
+    "mv 'a b' \"c d\"",
+    "cp -r src/ dest/",
+    "touch a;touch b&&touch c|tee d",
+    'touch "unterminated',
+    "touch a\\ b",
+    "mkdir -p 'x'\"y\"z",
+    "tee\t-a\tlog.txt",
+    "rm -rf ~/cache $HOME/x",
+    "touch  odd space",
+    "echo x\x0bof=y",
+]
+
+ALPHABET = ["rm ", "touch ", "mv ", "cp ", "sed -i ", "perl -i ", "awk -i inplace ", "patch ", "tee ",
+            "dd ", "of=", ">", ">>", "<", "|", ";", "&", " ", "\t", "\n", "\x0c", " ", '"', "'",
+            "\\", "-rf ", "a", "b/c", "/abs/", "..", "-", "x y", "#"]
+
+
+def _random_commands(count: int, seed: int = 1234):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 12)))
+
+
+class TestCandidateSoundness:
+    """Every path the full pipeline extracts must be a pre-filter candidate."""
+
+    def test_known_commands(self):
+        for command in COMMANDS:
+            missing = set(_pd.get_bash_target_paths(command)) - _pd._bash_path_candidates(command) - {""}
+            assert not missing, (command, missing)
+
+    def test_random_commands(self):
+        for command in _random_commands(3000):
+            missing = set(_pd.get_bash_target_paths(command)) - _pd._bash_path_candidates(command) - {""}
+            assert not missing, (command, missing)
+
+
+class TestCommandExtraction:
+    def test_matches_json_loads(self):
+        for command in [*COMMANDS, *_random_commands(500, seed=99), "café ☃", "tab\there"]:
+            for ensure_ascii in (True, False):
+                hook_input = json.dumps(
+                    {"tool_name": "Bash", "tool_input": {"command": command, "description": "d"}},
+                    ensure_ascii=ensure_ascii,
+                )
+                assert _pd.extract_bash_command_without_json(hook_input) == command
+
+    def test_non_bash_tool_is_left_to_json(self):
+        hook_input = json.dumps({"tool_name": "Task", "tool_input": {"command": "rm -rf x"}})
+        assert _pd.extract_bash_command_without_json(hook_input) is None
+
+    def test_ambiguous_command_key_is_left_to_json(self):
+        hook_input = '{"tool_name": "Bash", "command": "ls", "tool_input": {"command": "rm x"}}'
+        assert _pd.extract_bash_command_without_json(hook_input) is None
+
+    def test_surrogate_escape_is_left_to_json(self):
+        hook_input = json.dumps({"tool_name": "Bash", "tool_input": {"command": "echo \U0001f600"}})
+        assert _pd.extract_bash_command_without_json(hook_input) is None
+
+
+class TestPreFilterDecisions:
+    def test_unprotected_tree_is_allowed(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        assert not _pd.bash_command_may_be_protected(f"touch {tmp_path / 'a.txt'} {tmp_path / 'b.txt'}")
+
+    def test_path_under_marker_needs_full_check(self, tmp_path):
+        create_block_file(tmp_path / "locked")
+        assert _pd.bash_command_may_be_protected(f"touch {tmp_path / 'locked' / 'a.txt'}")
+
+    def test_relative_path_under_marker_below_cwd(self, hooks_dir, tmp_path):
+        create_block_file(tmp_path / "sub" / "locked")
+        exit_code, stdout, _ = run_hook(hooks_dir, make_bash_input("touch sub/locked/a.txt"), cwd=tmp_path)
+        assert exit_code == 0
+        assert is_blocked(stdout)
+
+    def test_directory_with_protected_descendant(self, hooks_dir, tmp_path):
+        create_block_file(tmp_path / "parent" / "child")
+        exit_code, stdout, _ = run_hook(hooks_dir, make_bash_input(f"rm -rf {tmp_path / 'parent'}"))
+        assert is_blocked(stdout)
+
+    def test_quoted_path_under_marker(self, hooks_dir, tmp_path):
+        create_block_file(tmp_path / "my dir")
+        exit_code, stdout, _ = run_hook(hooks_dir, make_bash_input(f"touch '{tmp_path / 'my dir' / 'a.txt'}'"))
+        assert is_blocked(stdout)
@@ -0,0 +1,105 @@
+"""Tests for --batch mode (JSONL hook inputs in, JSONL decisions out)."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import (
+    create_block_file,
+    make_bash_input,
+    make_edit_input,
+    make_notebook_input,
+    make_write_input,
+    run_hook,
+)
+
+HOOKS_DIR = Path(__file__).parent.parent / "hooks"
+
+
+def run_batch(lines: list, cwd=None) -> list:
+    result = subprocess.run(
+        [sys.executable, str(HOOKS_DIR / "protect_directories.py"), "--batch"],
+        input="".join(line + "\n" for line in lines),
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+    assert result.returncode == 0
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+class TestBatchMode:
+    def test_one_decision_per_line(self, tmp_path):
+        create_block_file(tmp_path / "locked", '{"guide": "No edits here"}')
+        decisions = run_batch([
+            make_edit_input(str(tmp_path / "locked" / "a.txt")),
+            make_edit_input(str(tmp_path / "free" / "a.txt")),
+            make_bash_input(f"rm -rf {tmp_path / 'locked'}"),
+        ])
+        assert decisions == [
+            {"decision": "block", "reason": "No edits here"},
+            {},
+            {"decision": "block", "reason": "No edits here"},
+        ]
+
+    def test_blank_and_malformed_lines_keep_alignment(self, tmp_path):
+        create_block_file(tmp_path)
+        decisions = run_batch(["", "not json", "[1, 2]", make_edit_input(str(tmp_path / "a.txt"))])
+        assert decisions[:3] == [{}, {}, {}]
+        assert decisions[3]["decision"] == "block"
+
+    def test_inputs_that_raise_keep_alignment(self, tmp_path):
+        create_block_file(tmp_path)
+        decisions = run_batch([
+            '{"tool_name": "Edit", "tool_input": "oops"}',
+            '{"tool_name": "Bash", "tool_input": {"command": ["rm"]}}',
+            make_edit_input(str(tmp_path / "a.txt")),
+        ])
+        assert decisions[:2] == [{}, {}]
+        assert decisions[2]["decision"] == "block"
+
+    def test_matches_single_invocation(self, tmp_path, hooks_dir):
+        """Batch output is exactly what one hook process per input prints."""
+        project = tmp_path / "project"
+        create_block_file(project, '{"blocked": ["*.lock", {"pattern": "gen/**", "guide": "Generated"}]}')
+        create_block_file(project / "vendor")
+        create_block_file(project / "src" / "deep", '{"allowed": ["*.md"]}')
+        (project / "build" / "cache").mkdir(parents=True)
+        create_block_file(project / "build" / "cache")
+
+        inputs = [
+            make_edit_input(str(project / "yarn.lock")),
+            make_edit_input(str(project / "src" / "main.py")),
+            make_write_input(str(project / "gen" / "api.ts")),
+            make_write_input(str(project / "vendor" / "lib.js")),
+            make_notebook_input(str(project / "src" / "deep" / "nb.ipynb")),
+            make_edit_input(str(project / "src" / "deep" / "README.md")),
+            make_bash_input(f"rm -rf {project / 'build'}"),
+            make_bash_input(f"touch {project / 'notes.txt'}"),
+            make_edit_input(str(project / ".block")),
+        ]
+        batch = run_batch(inputs)
+
+        single = []
+        for hook_input in inputs:
+            _, stdout, _ = run_hook(hooks_dir, hook_input)
+            single.append(json.loads(stdout) if stdout.strip() else {})
+        assert batch == single
+
+    def test_uses_cwd_field_for_relative_paths(self, tmp_path):
+        create_block_file(tmp_path / "locked")
+        (tmp_path / "free").mkdir()
+
+        def with_cwd(hook_input: str, cwd: Path) -> str:
+            data = json.loads(hook_input)
+            data["cwd"] = str(cwd)
+            return json.dumps(data)
+
+        decisions = run_batch([
+            with_cwd(make_edit_input("a.txt"), tmp_path / "locked"),
+            with_cwd(make_edit_input("a.txt"), tmp_path / "free"),
+            make_edit_input("a.txt"),
+        ], cwd=tmp_path / "locked")
+        assert decisions[0]["decision"] == "block"
+        assert decisions[1] == {}
+        assert decisions[2]["decision"] == "block"
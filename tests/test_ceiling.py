@@ -0,0 +1,137 @@
+"""Tests for the opt-in ceiling that bounds the ancestor walk."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import create_block_file, is_blocked, make_bash_input, make_edit_input
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+
+def run_hook_env(input_json: str, cwd=None, **env_vars) -> str:
+    """Run the hook with extra environment variables and return stdout."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith("BLOCK_CEILING")}
+    env.update(env_vars)
+    result = subprocess.run(
+        [sys.executable, str(HOOK_SCRIPT)],
+        input=input_json,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        env=env,
+    )
+    assert result.returncode == 0
+    return result.stdout
+
+
+def make_git_dir(git_dir: Path) -> Path:
+    """Create the minimum of a git directory: one holding HEAD."""
+    git_dir.mkdir(parents=True)
+    (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+    return git_dir
+
+
+class TestCeilingDirectories:
+    def test_markers_above_ceiling_are_ignored(self, tmp_path):
+        create_block_file(tmp_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        target = make_edit_input(str(project / "src" / "f.txt"))
+
+        assert is_blocked(run_hook_env(target))
+        assert not is_blocked(run_hook_env(target, BLOCK_CEILING_DIRECTORIES=str(project)))
+
+    def test_marker_in_ceiling_directory_applies(self, tmp_path):
+        project = tmp_path / "project"
+        create_block_file(project)
+        target = make_edit_input(str(project / "src" / "f.txt"))
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_DIRECTORIES=str(project)))
+
+    def test_markers_below_ceiling_apply(self, tmp_path):
+        create_block_file(tmp_path / "project" / "src")
+        target = make_edit_input(str(tmp_path / "project" / "src" / "f.txt"))
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_DIRECTORIES=str(tmp_path / "project")))
+
+    def test_multiple_entries_and_relative_entries(self, tmp_path):
+        create_block_file(tmp_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        target = make_edit_input(str(project / "f.txt"))
+
+        ceilings = os.pathsep.join(["relative/dir", "/nonexistent", str(project) + "/"])
+        assert not is_blocked(run_hook_env(target, BLOCK_CEILING_DIRECTORIES=ceilings))
+        # Relative entries are ignored, as with GIT_CEILING_DIRECTORIES
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_DIRECTORIES="relative/dir"))
+
+    def test_bash_respects_ceiling(self, tmp_path):
+        create_block_file(tmp_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        command = make_bash_input(f"touch {project / 'f.txt'}")
+        assert is_blocked(run_hook_env(command, cwd=project))
+        assert not is_blocked(run_hook_env(command, cwd=project, BLOCK_CEILING_DIRECTORIES=str(project)))
+
+
+class TestRepoRootCeiling:
+    def test_stops_at_repository_root(self, tmp_path):
+        create_block_file(tmp_path)
+        repo = tmp_path / "repo"
+        make_git_dir(repo / ".git")
+        target = make_edit_input(str(repo / "src" / "f.txt"))
+
+        assert is_blocked(run_hook_env(target))
+        assert not is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
+
+    def test_git_file_marks_root(self, tmp_path):
+        create_block_file(tmp_path)
+        worktree = tmp_path / "worktree"
+        worktree.mkdir()
+        git_dir = make_git_dir(tmp_path / "main" / ".git" / "worktrees" / "worktree")
+        (worktree / ".git").write_text(f"gitdir: {git_dir}\n")
+        target = make_edit_input(str(worktree / "f.txt"))
+        assert not is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
+
+    def test_marker_at_repository_root_applies(self, tmp_path):
+        repo = tmp_path / "repo"
+        make_git_dir(repo / ".git")
+        create_block_file(repo)
+        target = make_edit_input(str(repo / "src" / "f.txt"))
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
+
+    def test_without_repository_walks_to_root(self, tmp_path):
+        create_block_file(tmp_path)
+        target = make_edit_input(str(tmp_path / "a" / "b" / "f.txt"))
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
+
+    def test_empty_git_entry_is_not_a_root(self, tmp_path):
+        repo = tmp_path / "repo"
+        make_git_dir(repo / ".git")
+        create_block_file(repo, '{"blocked": ["**/*.secret"]}')
+        target = make_edit_input(str(repo / "sub" / "x.secret"))
+        (repo / "sub").mkdir()
+        (repo / "sub" / ".git").write_text("")
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
+        (repo / "sub" / ".git").unlink()
+        (repo / "sub" / ".git").mkdir()
+        assert is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
+
+    def test_git_entries_below_a_marker_cannot_be_written(self, tmp_path):
+        repo = tmp_path / "repo"
+        make_git_dir(repo / ".git")
+        create_block_file(repo, '{"blocked": ["**/*.secret"]}')
+        (repo / "sub").mkdir()
+        env = {"BLOCK_CEILING_REPO_ROOT": "1"}
+
+        assert is_blocked(run_hook_env(make_bash_input("touch sub/.git"), cwd=repo, **env))
+        assert is_blocked(run_hook_env(make_edit_input(str(repo / "sub" / ".git" / "HEAD")), **env))
+        assert is_blocked(run_hook_env(make_edit_input(str(repo / ".git" / "config")), **env))
+        assert not is_blocked(run_hook_env(make_edit_input(str(repo / "sub" / "f.txt")), **env))
+        # Without the repository-root ceiling a .git entry stops nothing
+        assert not is_blocked(run_hook_env(make_bash_input("touch sub/.git"), cwd=repo))
+
+    def test_git_entries_without_markers_are_writable(self, tmp_path):
+        repo = tmp_path / "repo"
+        make_git_dir(repo / ".git")
+        target = make_edit_input(str(repo / ".git" / "config"))
+        assert not is_blocked(run_hook_env(target, BLOCK_CEILING_REPO_ROOT="1"))
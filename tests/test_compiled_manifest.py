@@ -0,0 +1,126 @@
+"""Tests for the precompiled marker manifest written by --compile."""
+import importlib.util
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import (
+    OLD,
+    backdate,
+    create_block_file,
+    create_local_block_file,
+    is_blocked,
+    make_bash_input,
+    make_edit_input,
+    reset_process_caches,
+    run_hook,
+)
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+def _no_parse(content):
+    raise AssertionError("parsed a marker")
+
+
+def compile_and_reset(root: Path) -> dict:
+    _pd.compile_manifest(str(root))
+    reset_process_caches(_pd)
+    return json.loads((root / ".block.compiled").read_text())
+
+
+class TestCompile:
+    def test_records_every_marker_directory(self, project):
+        create_block_file(project, '{"blocked": ["*.lock"]}')
+        create_block_file(project / "a" / "b", '{"allowed": ["*.md"]}')
+        create_local_block_file(project / "a" / "b", '{"allowed": ["*.txt"]}')
+        create_block_file(project / ".git" / "hooks")
+
+        manifest = compile_and_reset(project)
+        assert manifest["version"] == _pd.MANIFEST_VERSION
+        assert sorted(manifest["markers"]) == [".", "a/b"]
+        main_info, local_info, fields = manifest["markers"]["a/b"]
+        assert main_info[1] is None  # just written: hash only
+        assert _pd.BlockConfig.from_tuple(tuple(fields))["allowed"] == ["*.txt"]
+
+    def test_cli(self, project):
+        create_block_file(project / "locked")
+        result = subprocess.run(
+            [sys.executable, str(HOOK_SCRIPT), "--compile", str(project)], capture_output=True, text=True,
+        )
+        assert result.returncode == 0
+        assert "Compiled 1 protected directories" in result.stdout
+        assert (project / ".block.compiled").is_file()
+
+
+class TestManifestLookup:
+    def test_unchanged_markers_are_not_parsed(self, project, monkeypatch):
+        backdate(create_block_file(project, '{"blocked": ["*.lock"]}'))
+        create_block_file(project / "sub", '{"blocked": [{"pattern": "*.tmp", "guide": "no tmp"}]}')
+        compile_and_reset(project)
+
+        monkeypatch.setattr(_pd, "_parse_lock_content", _no_parse)
+        decision = _pd.evaluate_hook_input(make_edit_input(str(project / "sub" / "a.tmp")))
+        assert decision is not None and decision["reason"] == "no tmp"
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "sub" / "a.lock"))) is not None
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "sub" / "a.txt"))) is None
+
+    def test_touched_marker_is_verified_by_hash(self, project, monkeypatch):
+        marker = create_block_file(project, '{"blocked": ["*.lock"]}')
+        backdate(marker)
+        compile_and_reset(project)
+
+        backdate(marker, OLD + 5)
+        monkeypatch.setattr(_pd, "_parse_lock_content", _no_parse)
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "a.lock"))) is not None
+
+    def test_changed_marker_falls_back_to_parsing(self, project):
+        marker = create_block_file(project, '{"blocked": ["*.lock"]}')
+        backdate(marker)
+        compile_and_reset(project)
+
+        marker.write_text('{"blocked": ["*.txt"]}')  # same size, new content
+        backdate(marker, OLD + 5)
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "a.lock"))) is None
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "a.txt"))) is not None
+
+    def test_added_local_marker_falls_back_to_parsing(self, project):
+        create_block_file(project, '{"allowed": ["*.txt"]}')
+        compile_and_reset(project)
+
+        create_local_block_file(project, '{"allowed": ["*.md"]}')
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "a.md"))) is None
+
+    def test_corrupt_manifest_is_ignored(self, project):
+        create_block_file(project, '{"blocked": ["*.lock"]}')
+        compile_and_reset(project)
+        (project / ".block.compiled").write_text('{"version": 1, "markers": {".": [1, 2]}}')
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "a.lock"))) is not None
+
+    def test_directory_on_another_drive_is_not_in_manifest(self, project, monkeypatch):
+        manifest = _pd._Manifest(str(project), {".": [None, None, []]})
+
+        def other_drive(path, start=None):
+            raise ValueError("path is on mount 'D:', start on mount 'C:'")
+
+        # What os.path.relpath does on Windows across drives
+        monkeypatch.setattr(_pd.os.path, "relpath", other_drive)
+        assert manifest.config(str(project), None, None) is None
+
+
+class TestManifestProtection:
+    def test_write_is_blocked_without_markers(self, project, hooks_dir):
+        manifest = str(project / ".block.compiled")
+        for hook_input in (
+            make_edit_input(manifest),
+            make_bash_input(f"echo '{{}}' > {manifest}"),
+            make_bash_input("rm .block.compiled"),
+        ):
+            _, stdout, _ = run_hook(hooks_dir, hook_input, cwd=project)
+            assert is_blocked(stdout), hook_input
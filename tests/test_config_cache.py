@@ -0,0 +1,113 @@
+"""Tests for the opt-in on-disk cache of merged per-directory configs."""
+import importlib.util
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tests.conftest import (
+    OLD,
+    backdate,
+    create_block_file,
+    create_local_block_file,
+    is_blocked,
+    make_edit_input,
+    reset_process_caches,
+)
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+def _no_parse(path):
+    raise AssertionError(f"re-parsed {path}")
+
+
+class TestConfigCache:
+    def test_unchanged_markers_are_not_reparsed(self, cache_env, monkeypatch):
+        project, cache_dir = cache_env
+        backdate(create_block_file(project, '{"blocked": ["*.lock"]}'))
+        backdate(create_local_block_file(project, '{"blocked": ["*.tmp"]}'))
+        target = make_edit_input(str(project / "a.tmp"))
+
+        decision = _pd.evaluate_hook_input(target)
+        assert decision is not None and decision["decision"] == "block"
+        assert list(cache_dir.glob("configs-*.marshal"))
+
+        reset_process_caches(_pd)
+        monkeypatch.setattr(_pd, "_parse_lock_file", _no_parse)
+        assert _pd.evaluate_hook_input(target) == decision
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "a.txt"))) is None
+
+    def test_changed_marker_is_reparsed(self, cache_env):
+        project, _ = cache_env
+        marker = create_block_file(project, '{"blocked": ["*.lock"]}')
+        backdate(marker)
+        target = make_edit_input(str(project / "a.txt"))
+        assert _pd.evaluate_hook_input(target) is None
+
+        reset_process_caches(_pd)
+        marker.write_text('{"blocked": ["*.txt"]}')
+        backdate(marker, OLD + 1)
+        decision = _pd.evaluate_hook_input(target)
+        assert decision is not None and decision["decision"] == "block"
+
+    def test_added_local_marker_invalidates_entry(self, cache_env):
+        project, _ = cache_env
+        backdate(create_block_file(project, '{"allowed": ["*.txt"]}'))
+        target = make_edit_input(str(project / "a.md"))
+        assert _pd.evaluate_hook_input(target) is not None
+
+        reset_process_caches(_pd)
+        backdate(create_local_block_file(project, '{"allowed": ["*.md"]}'))
+        assert _pd.evaluate_hook_input(target) is None
+
+    def test_recently_modified_markers_are_not_cached(self, cache_env):
+        project, _ = cache_env
+        create_block_file(project, '{"blocked": ["*.lock"]}')
+        _pd.evaluate_hook_input(make_edit_input(str(project / "a.txt")))
+        cache = next(c for c in _pd._cache_files.values() if isinstance(c, _pd._ConfigCache))
+        assert str(project) not in cache.entries
+
+    def test_corrupt_cache_is_ignored(self, cache_env):
+        project, cache_dir = cache_env
+        backdate(create_block_file(project, '{"blocked": ["*.txt"]}'))
+        target = make_edit_input(str(project / "a.txt"))
+        _pd.evaluate_hook_input(target)
+
+        reset_process_caches(_pd)
+        for cache_file in cache_dir.glob("configs-*.marshal"):
+            cache_file.write_bytes(b"\xff" * 16)
+        decision = _pd.evaluate_hook_input(target)
+        assert decision is not None and decision["decision"] == "block"
+
+    def test_concurrent_processes(self, cache_env):
+        project, cache_dir = cache_env
+        for i in range(8):
+            backdate(create_block_file(project / f"d{i}", f'{{"blocked": ["*.{i}"]}}'))
+        env = dict(os.environ, BLOCK_CACHE_DIR=str(cache_dir))
+
+        def run(i):
+            blocked_input = make_edit_input(str(project / f"d{i}" / f"f.{i}"))
+            allowed_input = make_edit_input(str(project / f"d{i}" / "f.txt"))
+            results = []
+            for hook_input in (blocked_input, allowed_input) * 3:
+                proc = subprocess.run(
+                    [sys.executable, str(HOOK_SCRIPT)],
+                    input=hook_input, capture_output=True, text=True, cwd=project, env=env,
+                )
+                results.append(is_blocked(proc.stdout))
+            return results
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for results in pool.map(run, range(8)):
+                assert results == [True, False] * 3
+
+        assert not list(cache_dir.glob("*.tmp"))
+        for cache_file in cache_dir.glob("configs-*.marshal"):
+            assert isinstance(_pd._ConfigCache.load(str(cache_file)).entries, dict)
@@ -0,0 +1,49 @@
+"""Slotted config and result records must stay usable like the former dicts."""
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+class TestConfigRecords:
+    def test_mapping_access(self):
+        config = _pd._create_empty_config(blocked=["*.lock"], is_empty=False, has_blocked_key=True)
+        assert config["blocked"] == ["*.lock"]
+        assert config.get("guide") == ""
+        assert config.get("unknown", "default") == "default"
+        assert "has_blocked_key" in config
+        with pytest.raises(KeyError):
+            config["unknown"]
+        assert not hasattr(config, "__dict__")
+
+    def test_equals_former_dict_form(self):
+        config = _pd._create_empty_config(guide="g")
+        assert config == dict(zip(config.keys(), config.astuple()))
+        assert config == _pd._create_empty_config(guide="g")
+        assert config != _pd._create_empty_config(guide="other")
+
+    def test_tuple_round_trip(self):
+        config = _pd._create_empty_config(agents=["Explore"], has_agents_key=True)
+        assert _pd.BlockConfig.from_tuple(config.astuple()) == config
+        with pytest.raises(ValueError):
+            _pd.BlockConfig.from_tuple(config.astuple()[:-1])
+
+    def test_helpers_accept_dicts(self):
+        child = {"blocked": ["*.tmp"], "is_empty": False, "has_blocked_key": True}
+        parent = {"blocked": ["*.lock"], "is_empty": False, "has_blocked_key": True}
+        merged = _pd._merge_hierarchical_configs(child, parent)
+        assert merged["blocked"] == ["*.tmp", "*.lock"]
+        assert _pd.should_apply_to_agent({"agents": ["Explore"], "has_agents_key": True}, "Explore") is True
+
+        info = {"config": merged, "marker_directory": "/project"}
+        result = _pd.test_should_block("/project/a.lock", info)
+        assert result["should_block"] is True
+        assert result["reason"] == "Path matches blocked pattern: *.lock"
+        assert _pd.test_should_block("/project/a.txt", info)["should_block"] is False
@@ -0,0 +1,218 @@
+"""Tests for the opt-in protection daemon and its thin client."""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import (
+    create_block_file,
+    get_block_reason,
+    is_blocked,
+    make_bash_input,
+    make_edit_input,
+)
+
+HOOKS_DIR = Path(__file__).parent.parent / "hooks"
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX") or os.name == "nt",
+    reason="Unix domain sockets not available",
+)
+
+
+@pytest.fixture
+def socket_path():
+    """Short socket path (AF_UNIX paths are limited to ~100 bytes)."""
+    sock_dir = tempfile.mkdtemp(prefix="blk")
+    yield os.path.join(sock_dir, "d.sock")
+    shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+def start_daemon(socket_path: str, *args: str, cwd=None, **env_vars) -> subprocess.Popen:
+    """Start protect_daemon.py and wait until its socket exists."""
+    proc = subprocess.Popen(
+        [sys.executable, str(HOOKS_DIR / "protect_daemon.py"), *args],
+        stderr=subprocess.DEVNULL,
+        cwd=cwd,
+        env=dict(os.environ, **env_vars),
+    )
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline or proc.poll() is not None:
+            proc.kill()
+            pytest.fail("daemon did not start")
+        time.sleep(0.02)
+    return proc
+
+
+@pytest.fixture(params=[False, True], ids=["stat", "watch"])
+def daemon(request, socket_path):
+    """Start protect_daemon.py (with and without --watch) and wait until it accepts connections."""
+    watch = ["--watch"] if request.param else []
+    proc = start_daemon(socket_path, "--socket", socket_path, *watch)
+    yield proc
+    proc.terminate()
+    proc.wait(timeout=10)
+
+
+def send_stale_request(socket_path: str) -> bytes:
+    """Send a request with a wrong script version and return the reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(b"\0".join((b"v2", b"0:0", b"/", b"0", b"{}")))
+        sock.shutdown(socket.SHUT_WR)
+        return sock.recv(1024)
+
+
+def run_client(input_json: str, socket_path: str, cwd=None, **env_vars):
+    """Run protect_client.py with the daemon socket configured."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith("BLOCK_")}
+    env.update(env_vars, BLOCK_DAEMON_SOCKET=socket_path)
+    result = subprocess.run(
+        [sys.executable, str(HOOKS_DIR / "protect_client.py")],
+        input=input_json,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        env=env,
+    )
+    return result.returncode, result.stdout
+
+
+class TestDaemonDecisions:
+    def test_blocks_protected_file(self, daemon, socket_path, tmp_path):
+        create_block_file(tmp_path, '{"guide": "Daemon says no"}')
+        code, stdout = run_client(make_edit_input(str(tmp_path / "f.txt")), socket_path)
+        assert code == 0
+        assert is_blocked(stdout)
+        assert get_block_reason(stdout) == "Daemon says no"
+
+    def test_allows_unprotected_file(self, daemon, socket_path, tmp_path):
+        code, stdout = run_client(make_edit_input(str(tmp_path / "f.txt")), socket_path)
+        assert code == 0
+        assert stdout == ""
+
+    def test_relative_paths_resolve_against_client_cwd(self, daemon, socket_path, tmp_path):
+        create_block_file(tmp_path / "locked")
+        code, stdout = run_client(make_bash_input("touch locked/f.txt"), socket_path, cwd=tmp_path)
+        assert is_blocked(stdout)
+
+        code, stdout = run_client(make_bash_input("touch free.txt"), socket_path, cwd=tmp_path)
+        assert not is_blocked(stdout)
+
+    def test_picks_up_marker_changes(self, daemon, socket_path, tmp_path):
+        marker = create_block_file(tmp_path, '{"blocked": ["*.lock"]}')
+        target = make_edit_input(str(tmp_path / "f.txt"))
+        _, stdout = run_client(target, socket_path)
+        assert not is_blocked(stdout)
+
+        marker.write_text('{"blocked": ["*.txt", "*.lock"]}')
+        _, stdout = run_client(target, socket_path)
+        assert is_blocked(stdout)
+
+        marker.unlink()
+        _, stdout = run_client(target, socket_path)
+        assert not is_blocked(stdout)
+
+    def test_uses_client_settings(self, daemon, socket_path, tmp_path):
+        create_block_file(tmp_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        target = make_edit_input(str(project / "f.txt"))
+
+        _, stdout = run_client(target, socket_path, BLOCK_CEILING_DIRECTORIES=str(project))
+        assert not is_blocked(stdout)
+        _, stdout = run_client(target, socket_path)
+        assert is_blocked(stdout)
+
+    def test_ignores_daemon_settings(self, socket_path, tmp_path):
+        create_block_file(tmp_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        proc = start_daemon(socket_path, "--socket", socket_path, BLOCK_CEILING_DIRECTORIES=str(project))
+        try:
+            _, stdout = run_client(make_edit_input(str(project / "f.txt")), socket_path)
+            assert is_blocked(stdout)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+class TestClientFallback:
+    def test_falls_back_when_daemon_missing(self, socket_path, tmp_path):
+        create_block_file(tmp_path)
+        code, stdout = run_client(make_edit_input(str(tmp_path / "f.txt")), socket_path)
+        assert code == 0
+        assert is_blocked(stdout)
+
+    def test_stale_daemon_answers_stale_and_exits(self, daemon, socket_path):
+        assert send_stale_request(socket_path) == b"stale\0"
+        daemon.wait(timeout=10)
+        assert not os.path.exists(socket_path)
+
+    def test_relative_socket_is_removed_from_its_own_directory(self, socket_path, tmp_path):
+        sock_dir, name = os.path.split(socket_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        # Same name as the socket, in the directory a request chdirs into
+        bystander = project / name
+        bystander.write_text("keep me")
+        proc = start_daemon(socket_path, "--socket", name, cwd=sock_dir)
+        try:
+            run_client(make_edit_input(str(project / "f.txt")), socket_path, cwd=project)
+            assert send_stale_request(socket_path) == b"stale\0"
+            proc.wait(timeout=10)
+        finally:
+            proc.kill()
+        assert bystander.read_text() == "keep me"
+        assert not os.path.exists(socket_path)
+
+    def test_fallback_scan_gets_what_is_left_of_its_budget(self, socket_path, tmp_path):
+        # A socket that never answers stands in for a daemon stuck on a slow scan
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen(1)
+        parent = tmp_path / "parent"
+        for i in range(200):
+            (parent / f"d{i:03}").mkdir(parents=True)
+        try:
+            code, stdout = run_client(
+                make_bash_input(f"rm -rf {parent}"), socket_path, cwd=tmp_path, BLOCK_SCAN_TIMEOUT_MS="2001",
+            )
+        finally:
+            server.close()
+        assert code == 0
+        assert is_blocked(stdout)
+        assert "BLOCK_SCAN_TIMEOUT_MS" in get_block_reason(stdout)
+
+    def test_stale_daemon_falls_back_in_process(self, socket_path, tmp_path):
+        # A socket that answers "stale" for everything stands in for a daemon
+        # started from an older copy of the plugin.
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen(1)
+        create_block_file(tmp_path)
+        proc = subprocess.Popen(
+            [sys.executable, str(HOOKS_DIR / "protect_client.py")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=dict(os.environ, BLOCK_DAEMON_SOCKET=socket_path),
+        )
+        proc.stdin.write(make_edit_input(str(tmp_path / "f.txt")))
+        proc.stdin.close()
+        conn, _ = server.accept()
+        while conn.recv(65536):
+            pass
+        conn.sendall(b"stale\0")
+        conn.close()
+        server.close()
+        stdout = proc.stdout.read()
+        proc.wait(timeout=10)
+        assert is_blocked(stdout)
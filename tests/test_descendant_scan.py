@@ -0,0 +1,185 @@
+"""Tests for pruning and budgets of the descendant scan for directory targets."""
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import create_block_file, get_block_reason, is_blocked, make_bash_input
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+def run_hook_env(input_json: str, cwd=None, **env_vars) -> subprocess.CompletedProcess:
+    """Run the hook with extra environment variables."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("BLOCK_SCAN", "BLOCK_CACHE_DIR"))}
+    env.update(env_vars)
+    result = subprocess.run(
+        [sys.executable, str(HOOK_SCRIPT)], input=input_json, capture_output=True, text=True, cwd=cwd, env=env,
+    )
+    assert result.returncode == 0
+    return result
+
+
+def make_wide_tree(parent: Path, count: int) -> None:
+    for i in range(count):
+        (parent / f"d{i:03}").mkdir(parents=True)
+
+
+class TestPrunedDirectories:
+    def test_default_prune_list_skips_dependencies(self, tmp_path):
+        parent = tmp_path / "parent"
+        create_block_file(parent / "node_modules" / "pkg")
+        create_block_file(parent / ".git" / "hooks")
+        command = make_bash_input(f"rm -rf {parent}")
+
+        assert not is_blocked(run_hook_env(command, cwd=tmp_path).stdout)
+        assert is_blocked(run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_PRUNE="").stdout)
+
+    def test_custom_prune_list(self, tmp_path):
+        parent = tmp_path / "parent"
+        create_block_file(parent / "vendor" / "lib")
+        command = make_bash_input(f"rm -rf {parent}")
+
+        prune = os.pathsep.join(["dist", "vendor"])
+        assert not is_blocked(run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_PRUNE=prune).stdout)
+        assert is_blocked(run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_PRUNE="dist").stdout)
+
+    def test_target_named_like_pruned_directory_is_scanned(self, tmp_path):
+        create_block_file(tmp_path / "node_modules" / "pkg")
+        command = make_bash_input(f"rm -rf {tmp_path / 'node_modules'}")
+        assert is_blocked(run_hook_env(command, cwd=tmp_path).stdout)
+
+    def test_index_walk_is_pruned_too(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("BLOCK_SCAN_PRUNE", raising=False)
+        create_block_file(tmp_path / "parent" / "node_modules" / "pkg")
+        index = _pd._MarkerIndex(str(tmp_path / "unused"), {})
+        assert index.first_descendant(str(tmp_path / "parent")) is None
+        monkeypatch.setenv("BLOCK_SCAN_PRUNE", "")
+        assert index.first_descendant(str(tmp_path / "parent")) is not None
+
+
+class TestScanBudget:
+    def test_directory_limit_blocks_with_outcome(self, tmp_path):
+        parent = tmp_path / "parent"
+        make_wide_tree(parent, 20)
+        command = make_bash_input(f"rm -rf {parent}")
+
+        result = run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_MAX_DIRS="5")
+        assert is_blocked(result.stdout)
+        reason = get_block_reason(result.stdout)
+        assert "Could not finish checking" in reason
+        assert "scan stopped after 5 directories" in reason
+        assert "BLOCK_SCAN_MAX_DIRS" in reason
+        assert not is_blocked(run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_MAX_DIRS="50").stdout)
+
+    def test_large_tree_without_markers_allowed_by_default(self, tmp_path):
+        parent = tmp_path / "parent"
+        for i in range(250):
+            make_wide_tree(parent / f"p{i:03}", 240)
+        result = run_hook_env(make_bash_input(f"rm -rf {parent}"), cwd=tmp_path)
+        assert not is_blocked(result.stdout)
+        assert result.stderr == ""
+
+    def test_fail_open_policy_warns(self, tmp_path):
+        parent = tmp_path / "parent"
+        make_wide_tree(parent, 20)
+        create_block_file(parent / "d019")
+        command = make_bash_input(f"rm -rf {parent}")
+
+        result = run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_MAX_DIRS="5", BLOCK_SCAN_ON_LIMIT="allow")
+        assert not is_blocked(result.stdout)
+        assert "BLOCK_SCAN_ON_LIMIT=allow" in result.stderr
+
+    def test_reports_pruned_directories(self, tmp_path):
+        parent = tmp_path / "parent"
+        (parent / "node_modules").mkdir(parents=True)
+        make_wide_tree(parent, 20)
+        result = run_hook_env(make_bash_input(f"rm -rf {parent}"), cwd=tmp_path, BLOCK_SCAN_MAX_DIRS="5")
+        assert "skipped 1 pruned directories" in get_block_reason(result.stdout)
+
+    def test_wall_clock_limit(self, tmp_path):
+        make_wide_tree(tmp_path, 5)
+        budget = _pd._ScanBudget(frozenset(), 0, 1000, False)
+        ticks = iter(range(100))
+        budget.clock = lambda: budget.started + next(ticks) * 0.4
+        with pytest.raises(_pd._ScanIncomplete, match="took longer than 1000 ms"):
+            _pd._find_descendant_marker(str(tmp_path), budget)
+
+    @pytest.mark.parametrize("value", ["", "abc", "-3"])
+    def test_invalid_settings_use_defaults(self, monkeypatch, value):
+        monkeypatch.setenv("BLOCK_SCAN_MAX_DIRS", value)
+        monkeypatch.setenv("BLOCK_SCAN_TIMEOUT_MS", value)
+        budget = _pd._ScanBudget.from_env()
+        assert budget.max_dirs == _pd.DEFAULT_SCAN_MAX_DIRS
+        assert budget.deadline is not None and not budget.fail_open
+
+
+def parallel_budget(threads: int = 4, **overrides) -> "_pd._ScanBudget":
+    settings = {"prune": frozenset(_pd.DEFAULT_SCAN_PRUNE), "max_dirs": 0, "timeout_ms": 0, "fail_open": False}
+    settings.update(overrides)
+    return _pd._ScanBudget(threads=threads, **settings)
+
+
+class TestParallelScan:
+    def test_agrees_with_os_walk(self, tmp_path):
+        rng = random.Random(5)
+        dirs = [tmp_path]
+        for i in range(120):
+            child = rng.choice(dirs) / f"d{i}"
+            child.mkdir()
+            dirs.append(child)
+        for marker_dir in rng.sample(dirs[1:], 4):
+            create_block_file(marker_dir)
+        (rng.choice(dirs[1:]) / ".block.local").touch()
+        (tmp_path / "d0" / "node_modules").mkdir(exist_ok=True)
+        create_block_file(tmp_path / "d0" / "node_modules" / "pkg")
+
+        for directory in dirs:
+            expected = _pd._find_descendant_marker(str(directory), parallel_budget(threads=1))
+            found = _pd._find_descendant_marker(str(directory), parallel_budget())
+            assert (found is None) == (expected is None), directory
+            if found is not None:
+                assert Path(found).is_file() and Path(found).parent != directory
+
+    def test_stops_listing_after_first_marker(self, tmp_path, monkeypatch):
+        create_block_file(tmp_path / "first")
+        make_wide_tree(tmp_path / "first", 50)
+        make_wide_tree(tmp_path / "second", 50)
+        listed = []
+        list_directory = _pd._list_directory
+
+        def counting(path):
+            listed.append(path)
+            return list_directory(path)
+
+        monkeypatch.setattr(_pd, "_list_directory", counting)
+        assert _pd._find_descendant_marker(str(tmp_path), parallel_budget(threads=2)) == str(
+            tmp_path / "first" / ".block"
+        )
+        assert len(listed) < 10
+
+    def test_symlinked_directories_are_not_entered(self, tmp_path):
+        create_block_file(tmp_path / "real" / "inner")
+        (tmp_path / "parent").mkdir()
+        (tmp_path / "parent" / "link").symlink_to(tmp_path / "real", target_is_directory=True)
+        assert _pd._find_descendant_marker(str(tmp_path / "parent"), parallel_budget()) is None
+
+    def test_budget_applies(self, tmp_path):
+        make_wide_tree(tmp_path, 30)
+        with pytest.raises(_pd._ScanIncomplete, match="BLOCK_SCAN_MAX_DIRS"):
+            _pd._find_descendant_marker(str(tmp_path), parallel_budget(max_dirs=5))
+
+    def test_enabled_from_environment(self, tmp_path):
+        parent = tmp_path / "parent"
+        create_block_file(parent / "a" / "b")
+        command = make_bash_input(f"rm -rf {parent}")
+        assert is_blocked(run_hook_env(command, cwd=tmp_path, BLOCK_SCAN_THREADS="8").stdout)
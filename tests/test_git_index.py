@@ -0,0 +1,261 @@
+"""Tests for descendant marker discovery from the git index (BLOCK_GIT_INDEX=1)."""
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import (
+    backdate,
+    create_block_file,
+    create_local_block_file,
+    is_blocked,
+    make_bash_input,
+    reset_process_caches,
+)
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo: Path, *args: str) -> str:
+    result = subprocess.run(["git", "-C", str(repo), *args], capture_output=True, check=True)
+    return result.stdout.decode("utf-8", "surrogateescape")
+
+
+def make_repo(path: Path) -> Path:
+    path.mkdir(parents=True)
+    git(path, "init", "-q")
+    return path
+
+
+def ls_files(repo: Path) -> tuple[str, ...]:
+    """What _parse_git_index should return, computed by git itself."""
+    directories = set()
+    for path in git(repo, "ls-files", "-z").split("\0")[:-1]:
+        directory, _, name = path.rpartition("/")
+        if name in (".block", ".block.local"):
+            directories.add(directory)
+    return tuple(sorted(directories))
+
+
+def add_submodule(repo: Path, path: str) -> None:
+    """Record path as a submodule without cloning anything."""
+    empty = git(repo, "hash-object", "-w", "--stdin").strip()
+    git(repo, "update-index", "--add", "--cacheinfo", f"160000,{empty},{path}")
+
+
+@pytest.fixture
+def git_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("BLOCK_GIT_INDEX", "1")
+    monkeypatch.delenv("BLOCK_CACHE_DIR", raising=False)
+    for name in list(os.environ):
+        if name.startswith("BLOCK_SCAN"):
+            monkeypatch.delenv(name)
+    reset_process_caches(_pd)
+    yield make_repo(tmp_path / "repo")
+    reset_process_caches(_pd)
+
+
+def no_walk(*args):
+    raise AssertionError("walked the tree")
+
+
+class TestParseGitIndex:
+    @pytest.mark.parametrize("version", [2, 3, 4])
+    def test_agrees_with_ls_files(self, git_env, version):
+        repo = git_env
+        for relative in (
+            ".block", "top.txt", "a/.block", "a/b/c/.block.local", "a/b/c/g", "x y/.block", "z/ünï/.block",
+            "a-b/x.block", "a.b/.block.bak", "a.b/f",
+        ):
+            (repo / relative).parent.mkdir(parents=True, exist_ok=True)
+            (repo / relative).write_text("x")
+        git(repo, "add", "-A")
+        add_submodule(repo, "vendor/lib")
+        if version == 3:
+            (repo / "new").mkdir()
+            (repo / "new" / ".block").write_text("x")
+            # Intent-to-add entries use the extended flags of version 3
+            git(repo, "add", "-N", "new/.block")
+        else:
+            git(repo, "update-index", "--index-version", str(version))
+
+        data = (repo / ".git" / "index").read_bytes()
+        assert int.from_bytes(data[4:8], "big") == version
+        assert _pd._parse_git_index(data) == ls_files(repo)
+
+    def test_long_paths(self, git_env):
+        repo = git_env
+        empty = git(repo, "hash-object", "-w", "--stdin").strip()
+        long_path = "/".join(["d" * 200] * 22) + "/.block"
+        git(repo, "update-index", "--add", "--cacheinfo", f"100644,{empty},{long_path}")
+        for version in (2, 4):
+            git(repo, "update-index", "--index-version", str(version))
+            assert _pd._parse_git_index((repo / ".git" / "index").read_bytes()) == ls_files(repo)
+
+    def test_unsupported_indexes(self, git_env):
+        repo = git_env
+        (repo / "f").write_text("x")
+        git(repo, "add", "f")
+        git(repo, "update-index", "--split-index")
+        assert _pd._parse_git_index((repo / ".git" / "index").read_bytes()) is None
+        assert _pd._parse_git_index(b"DIRC\x00\x00\x00\x05\x00\x00\x00\x00") is None
+        assert _pd._parse_git_index(b"\x00garbage") is None
+
+
+class TestGitIndexDiscovery:
+    def test_tracked_marker_found_without_walking(self, git_env, monkeypatch):
+        repo = git_env
+        create_block_file(repo / "src" / "a" / "b" / "locked")
+        for i in range(20):
+            (repo / "src" / f"out{i}" / "f.txt").parent.mkdir(parents=True)
+            (repo / "src" / f"out{i}" / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+
+        monkeypatch.setattr(os, "walk", no_walk)
+        expected = str(repo / "src" / "a" / "b" / "locked" / ".block")
+        assert _pd.check_descendant_block_files(str(repo / "src")) == expected
+        assert _pd.check_descendant_block_files(str(repo)) == expected
+
+    def test_no_tracked_marker_leaves_the_decision_to_the_scan(self, git_env, monkeypatch):
+        repo = git_env
+        (repo / "src" / "f.txt").parent.mkdir()
+        (repo / "src" / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+        walked = []
+        walk = os.walk
+        monkeypatch.setattr(os, "walk", lambda top, **kwargs: walked.append(top) or walk(top, **kwargs))
+        assert _pd.check_descendant_block_files(str(repo)) is None
+        assert walked == [str(repo)]
+
+    def test_untracked_local_marker_in_tracked_directory(self, git_env):
+        repo = git_env
+        (repo / ".gitignore").write_text(".block.local\n")
+        (repo / "config" / "f.txt").parent.mkdir()
+        (repo / "config" / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+        assert _pd.check_descendant_block_files(str(repo)) is None
+
+        local = create_local_block_file(repo / "config")
+        assert _pd.check_descendant_block_files(str(repo)) == str(local)
+
+    def test_untracked_directories_are_searched(self, git_env):
+        repo = git_env
+        (repo / "tracked" / "f.txt").parent.mkdir()
+        (repo / "tracked" / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+        assert _pd.check_descendant_block_files(str(repo)) is None
+
+        nested = create_block_file(repo / "tracked" / "untracked_sub")
+        assert _pd.check_descendant_block_files(str(repo / "tracked")) == str(nested)
+        assert _pd.check_descendant_block_files(str(repo)) == str(nested)
+
+        nested.unlink()
+        deep = create_block_file(repo / "build" / "out")
+        assert _pd.check_descendant_block_files(str(repo)) == str(deep)
+
+    def test_untracked_target_is_walked(self, git_env):
+        repo = git_env
+        (repo / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+        marker = create_block_file(repo / "newdir" / "sub")
+        assert _pd.check_descendant_block_files(str(repo / "newdir")) == str(marker)
+
+    def test_tracked_markers_are_found_before_untracked_trees(self, git_env, monkeypatch):
+        repo = git_env
+        marker = create_block_file(repo / "src")
+        git(repo, "add", "-A")
+        create_block_file(repo / "build" / "out")
+
+        monkeypatch.setattr(os, "walk", no_walk)
+        assert _pd.check_descendant_block_files(str(repo)) == str(marker)
+
+    def test_removed_and_pruned_markers_are_skipped(self, git_env):
+        repo = git_env
+        marker = create_block_file(repo / "a")
+        create_block_file(repo / "node_modules" / "pkg")
+        git(repo, "add", "-A")
+        assert _pd.check_descendant_block_files(str(repo)) == str(marker)
+
+        marker.unlink()
+        assert _pd.check_descendant_block_files(str(repo)) is None
+
+    def test_submodules_are_walked(self, git_env):
+        repo = git_env
+        (repo / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+        add_submodule(repo, "libs/dep")
+        marker = create_block_file(repo / "libs" / "dep" / "inner" / "deep")
+        assert _pd.check_descendant_block_files(str(repo / "libs")) == str(marker)
+
+    def test_target_behind_symlink_falls_back_to_walk(self, git_env, tmp_path):
+        repo = git_env
+        outside = tmp_path / "outside"
+        create_block_file(outside / "untracked")
+        (repo / "link").symlink_to(outside, target_is_directory=True)
+        git(repo, "add", "-A")
+        assert _pd._git_index_for(str(repo / "link")) is None
+        assert _pd.check_descendant_block_files(str(repo / "link")) == str(repo / "link" / "untracked" / ".block")
+
+    def test_outside_worktree_falls_back_to_walk(self, git_env, tmp_path):
+        marker = create_block_file(tmp_path / "plain" / "a")
+        assert _pd._git_index_for(str(tmp_path / "plain")) is None
+        assert _pd.check_descendant_block_files(str(tmp_path / "plain")) == str(marker)
+
+    def test_git_file_worktree(self, git_env, tmp_path):
+        repo = git_env
+        (repo / "f.txt").write_text("x")
+        git(repo, "add", "-A")
+        git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+        worktree = tmp_path / "worktree"
+        git(repo, "worktree", "add", "-q", str(worktree))
+        create_block_file(worktree / "src")
+        git(worktree, "add", "-A")
+
+        git_index = _pd._git_index_for(str(worktree))
+        assert git_index is not None and tuple(git_index.directories) == ("src",)
+
+    def test_parsed_index_is_cached(self, git_env, tmp_path, monkeypatch):
+        repo = git_env
+        monkeypatch.setenv("BLOCK_CACHE_DIR", str(tmp_path / "cache"))
+        monkeypatch.chdir(repo)
+        marker = create_block_file(repo / "a")
+        git(repo, "add", "-A")
+        index_file = repo / ".git" / "index"
+        backdate(index_file)
+        assert _pd.check_descendant_block_files(str(repo)) == str(marker)
+        for cache in _pd._cache_files.values():
+            cache.save()
+
+        reset_process_caches(_pd)
+        parse = _pd._parse_git_index
+        monkeypatch.setattr(_pd, "_parse_git_index", no_walk)
+        assert _pd.check_descendant_block_files(str(repo)) == str(marker)
+
+        # Git replaces the index file, so the cached entry no longer applies
+        git(repo, "rm", "-q", "--cached", "a/.block")
+        monkeypatch.setattr(_pd, "_parse_git_index", parse)
+        git_index = _pd._git_index_for(str(repo))
+        assert git_index is not None and tuple(git_index.directories) == ()
+
+    def test_hook_blocks_directory_command(self, git_env):
+        repo = git_env
+        create_block_file(repo / "src" / "protected")
+        git(repo, "add", "-A")
+        env = dict(os.environ, BLOCK_GIT_INDEX="1")
+        result = subprocess.run(
+            [sys.executable, str(HOOK_SCRIPT)], input=make_bash_input(f"rm -rf {repo / 'src'}"),
+            capture_output=True, text=True, cwd=repo, env=env,
+        )
+        assert result.returncode == 0
+        assert is_blocked(result.stdout)
@@ -0,0 +1,102 @@
+"""Each decision should stat every ancestor's marker files only once."""
+import importlib.util
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+from tests.conftest import create_block_file, make_bash_input, make_edit_input
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+def _count_marker_stats(monkeypatch, hook_input: str):
+    """Evaluate hook_input and count os.path.isfile calls per marker path."""
+    calls = Counter()
+    real_isfile = os.path.isfile
+
+    def counting_isfile(path):
+        if os.path.basename(path) in (".block", ".block.local"):
+            calls[path] += 1
+        return real_isfile(path)
+
+    monkeypatch.setattr(os.path, "isfile", counting_isfile)
+    decision = _pd.evaluate_hook_input(hook_input)
+    return decision, calls
+
+
+class TestSinglePassWalk:
+    def test_protected_edit_stats_each_ancestor_once(self, tmp_path, monkeypatch):
+        create_block_file(tmp_path, '{"blocked": ["*.lock"]}')
+        nested = tmp_path / "a" / "b" / "c"
+        create_block_file(nested, '{"blocked": ["*.tmp"]}')
+
+        decision, calls = _count_marker_stats(monkeypatch, make_edit_input(str(nested / "f.txt")))
+
+        assert decision is None
+        assert calls
+        assert max(calls.values()) == 1, {p: n for p, n in calls.items() if n > 1}
+
+    def test_bash_paths_share_ancestor_lookups(self, tmp_path, monkeypatch):
+        create_block_file(tmp_path, '{"blocked": ["*.lock"]}')
+        files = " ".join(str(tmp_path / "src" / f"f{i}.txt") for i in range(5))
+
+        decision, calls = _count_marker_stats(monkeypatch, make_bash_input(f"touch {files}"))
+
+        assert decision is None
+        assert max(calls.values()) == 1
+
+    def test_decisions_do_not_share_lookups(self, tmp_path):
+        target = make_edit_input(str(tmp_path / "f.txt"))
+        assert _pd.evaluate_hook_input(target) is None
+
+        create_block_file(tmp_path)
+        decision = _pd.evaluate_hook_input(target)
+        assert decision is not None
+        assert decision["decision"] == "block"
+
+    def test_snapshot_is_cleared_after_decision(self, tmp_path):
+        _pd.evaluate_hook_data(json.loads(make_edit_input(str(tmp_path / "f.txt"))))
+        assert _pd._snapshot is None
+
+
+class TestMemoizedMerge:
+    def _count_merges(self, monkeypatch):
+        calls = []
+        real_merge = _pd._merge_hierarchical_configs
+
+        def counting_merge(child, parent):
+            calls.append(1)
+            return real_merge(child, parent)
+
+        monkeypatch.setattr(_pd, "_merge_hierarchical_configs", counting_merge)
+        return calls
+
+    def test_bash_command_merges_chain_once(self, tmp_path, monkeypatch):
+        create_block_file(tmp_path, '{"blocked": ["*.lock"]}')
+        create_block_file(tmp_path / "a", '{"blocked": ["*.tmp"]}')
+        create_block_file(tmp_path / "a" / "b", '{"blocked": [{"pattern": "*.bin", "guide": "g"}]}')
+        files = " ".join(str(tmp_path / "a" / "b" / f"f{i}.txt") for i in range(50))
+        _pd._CHAIN_CONFIGS.clear()
+        calls = self._count_merges(monkeypatch)
+
+        assert _pd.evaluate_hook_input(make_bash_input(f"touch {files}")) is None
+        assert len(calls) == 2
+        assert _pd.evaluate_hook_input(make_edit_input(str(tmp_path / "a" / "b" / "x.txt"))) is None
+        assert len(calls) == 2
+
+    def test_changed_parent_marker_is_merged_again(self, tmp_path):
+        parent = create_block_file(tmp_path, '{"blocked": ["*.lock"]}')
+        create_block_file(tmp_path / "child", '{"blocked": ["*.tmp"]}')
+        target = make_edit_input(str(tmp_path / "child" / "f.txt"))
+        assert _pd.evaluate_hook_input(target) is None
+
+        parent.write_text('{"blocked": ["*.txt", "*.lock"]}')
+        decision = _pd.evaluate_hook_input(target)
+        assert decision is not None
+        assert decision["decision"] == "block"
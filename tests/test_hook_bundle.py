@@ -0,0 +1,127 @@
+"""Tests for the precompiled hook bundle built by scripts/build_hook_bundle.py."""
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import create_block_file, get_block_reason, is_blocked, make_edit_input
+
+ROOT = Path(__file__).parent.parent
+HOOKS_DIR = ROOT / "hooks"
+
+_spec = importlib.util.spec_from_file_location(
+    "build_hook_bundle", str(ROOT / "scripts" / "build_hook_bundle.py")
+)
+assert _spec is not None and _spec.loader is not None, "Failed to load build_hook_bundle.py"
+_builder = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_builder)
+
+
+@pytest.fixture
+def hook_copy(tmp_path):
+    """A copy of the hooks directory with a freshly built bundle."""
+    hook_dir = tmp_path / "hooks"
+    shutil.copytree(HOOKS_DIR, hook_dir, ignore=shutil.ignore_patterns("__pycache__", "*.pyz"))
+    _builder.build_bundle(str(hook_dir / _builder.BUNDLE_NAME), str(hook_dir))
+    return hook_dir
+
+
+def run_bundle(bundle: Path, hook: str, input_json: str):
+    result = subprocess.run(
+        [sys.executable, "-E", "-s", "-S", str(bundle), hook],
+        input=input_json,
+        capture_output=True,
+        text=True,
+    )
+    return result.returncode, result.stdout
+
+
+class TestBundle:
+    def test_bundle_contains_bytecode(self, hook_copy):
+        import zipfile
+
+        with zipfile.ZipFile(hook_copy / _builder.BUNDLE_NAME) as archive:
+            names = set(archive.namelist())
+        assert {"__main__.pyc", "protect_directories.pyc", "subagent_tracker.pyc"} <= names
+
+    def test_protect_blocks_and_allows(self, hook_copy, tmp_path):
+        project = tmp_path / "project"
+        create_block_file(project / "locked", '{"guide": "Bundled"}')
+        bundle = hook_copy / _builder.BUNDLE_NAME
+
+        code, stdout = run_bundle(bundle, "protect", make_edit_input(str(project / "locked" / "f.txt")))
+        assert code == 0
+        assert get_block_reason(stdout) == "Bundled"
+
+        code, stdout = run_bundle(bundle, "protect", make_edit_input(str(project / "f.txt")))
+        assert code == 0
+        assert stdout == ""
+
+    def test_subagent_tracker_dispatch(self, hook_copy, tmp_path):
+        transcript = tmp_path / "session.jsonl"
+        event = {
+            "hook_type": "SubagentStart",
+            "agent_id": "a1",
+            "agent_type": "Explore",
+            "transcript_path": str(transcript),
+        }
+        code, stdout = run_bundle(hook_copy / _builder.BUNDLE_NAME, "subagent", json.dumps(event))
+        assert code == 0
+        assert stdout == ""
+        tracking = json.loads((tmp_path / "subagents" / ".agent_types.json").read_text())
+        assert tracking == {"a1": "Explore"}
+
+    def test_changed_source_takes_precedence(self, hook_copy, tmp_path):
+        """A plugin update must not be shadowed by an old bundle."""
+        source = hook_copy / "protect_directories.py"
+        source.write_text(source.read_text().replace("BLOCKED by .block:", "UPDATED SOURCE:"))
+        create_block_file(tmp_path / "locked")
+
+        _, stdout = run_bundle(
+            hook_copy / _builder.BUNDLE_NAME, "protect", make_edit_input(str(tmp_path / "locked" / "f.txt"))
+        )
+        assert get_block_reason(stdout).startswith("UPDATED SOURCE:")
+
+    @pytest.mark.skipif(os.name == "nt", reason="Unix shell path of run-hook.cmd")
+    def test_run_hook_cmd_uses_bundle(self, hook_copy, tmp_path):
+        create_block_file(tmp_path / "locked")
+        # Without the plain script only the bundle can produce a decision
+        (hook_copy / "protect_directories.py").unlink()
+        result = subprocess.run(
+            f'"{hook_copy / "run-hook.cmd"}"',
+            input=make_edit_input(str(tmp_path / "locked" / "f.txt")),
+            capture_output=True,
+            text=True,
+            shell=True,
+        )
+        assert result.returncode == 0
+        assert is_blocked(result.stdout)
+
+    @pytest.mark.skipif(os.name == "nt", reason="Unix shell path of run-hook.cmd")
+    def test_run_hook_cmd_without_bundle_imports_module(self, tmp_path):
+        hook_dir = tmp_path / "hooks"
+        shutil.copytree(HOOKS_DIR, hook_dir, ignore=shutil.ignore_patterns("__pycache__", "*.pyz"))
+        project = tmp_path / "project"
+        create_block_file(project / "locked")
+        # Modules in the project directory must not shadow the standard library
+        (project / "json.py").write_text("raise SystemExit('imported from project')\n")
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+
+        for target, blocked in (("locked/f.txt", True), ("f.txt", False)):
+            result = subprocess.run(
+                f'"{hook_dir / "run-hook.cmd"}"',
+                input=make_edit_input(str(project / target)),
+                capture_output=True,
+                text=True,
+                shell=True,
+                cwd=project,
+                env=env,
+            )
+            assert result.returncode == 0, result.stderr
+            assert is_blocked(result.stdout) is blocked
+        assert list((hook_dir / "__pycache__").glob("protect_directories.*.pyc"))
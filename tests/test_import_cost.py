@@ -0,0 +1,101 @@
+"""Import-cost regression tests for the hook's quick-exit path.
+
+Most tool calls target paths with no .block anywhere above them. Those calls
+must be decided before json, re, shlex, warnings, pathlib or typing are
+imported; these tests use ``python -X importtime`` to keep it that way.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import create_block_file, make_bash_input, make_edit_input, make_notebook_input
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+HEAVY_MODULES = {"json", "re", "shlex", "warnings", "pathlib", "typing"}
+
+# Modules the quick-exit path may import on top of interpreter startup.
+ALLOWED_EXTRA_MODULES = {"__future__"}
+
+
+def _imported_modules(args: list, input_text: str = "", cwd=None) -> set:
+    """Run python -X importtime and return the set of imported module names."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        input=input_text,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        name = line.rsplit("|", 1)[1].strip()
+        if name != "imported package":
+            modules.add(name)
+    return modules
+
+
+def _startup_modules() -> set:
+    """Modules imported by a bare interpreter (site, sitecustomize, ...)."""
+    return _imported_modules(["-c", "pass"])
+
+
+def _hook_extra_modules(input_json: str, cwd=None) -> set:
+    return _imported_modules([str(HOOK_SCRIPT)], input_json, cwd) - _startup_modules()
+
+
+class TestQuickExitImports:
+    def test_edit_without_marker_imports_nothing_heavy(self, tmp_path):
+        extra = _hook_extra_modules(make_edit_input(str(tmp_path / "src" / "f.txt")))
+        assert not extra & HEAVY_MODULES
+        assert extra <= ALLOWED_EXTRA_MODULES, f"unexpected imports: {sorted(extra - ALLOWED_EXTRA_MODULES)}"
+
+    def test_notebook_without_marker_imports_nothing_heavy(self, tmp_path):
+        extra = _hook_extra_modules(make_notebook_input(str(tmp_path / "nb.ipynb")))
+        assert extra <= ALLOWED_EXTRA_MODULES
+
+    def test_relative_path_without_marker_imports_nothing_heavy(self, tmp_path):
+        extra = _hook_extra_modules(make_edit_input("src/f.txt"), cwd=tmp_path)
+        assert extra <= ALLOWED_EXTRA_MODULES
+
+    def test_bash_without_marker_imports_nothing_heavy(self, tmp_path):
+        command = f"rm -f {tmp_path / 'a.txt'} build/out.o > log.txt"
+        extra = _hook_extra_modules(make_bash_input(command), cwd=tmp_path)
+        assert extra <= ALLOWED_EXTRA_MODULES, f"unexpected imports: {sorted(extra - ALLOWED_EXTRA_MODULES)}"
+
+    def test_protected_path_loads_modules_lazily(self, tmp_path):
+        """Sanity check: a real decision still imports what it needs."""
+        create_block_file(tmp_path)
+        extra = _hook_extra_modules(make_edit_input(str(tmp_path / "f.txt")))
+        assert "json" in extra
+
+
+class TestExtractPathWithoutJson:
+    """The string scanner must agree with the regex it replaced."""
+
+    CASES = [
+        '{"tool_name": "Edit", "tool_input": {"file_path": "/a/b.txt"}}',
+        '{"tool_input": {"notebook_path" :  "/n.ipynb"}, "file_path": "/later"}',
+        '{"file_path": 3, "tool_input": {"file_path": "/real"}}',
+        '{"content": "say \\"file_path\\": \\"/fake\\"", "file_path": "/real"}',
+        '{"file_path":"unterminated',
+        '{"tool_name": "Bash", "tool_input": {"command": "ls"}}',
+        '{"file_path": "", "notebook_path": "/x"}',
+        '{"file_path"\n:\t"/spaced"}',
+    ]
+
+    def test_matches_regex_behaviour(self):
+        import importlib.util
+        import re
+
+        spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+        assert spec is not None and spec.loader is not None
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        for case in self.CASES:
+            match = re.search(r'"(file_path|notebook_path)"\s*:\s*"([^"]*)"', case)
+            expected = match.group(2) if match else None
+            assert module.extract_path_without_json(case) == expected, case
@@ -0,0 +1,191 @@
+"""Tests for the opt-in on-disk marker index (BLOCK_CACHE_DIR)."""
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import age_tree, create_block_file, is_blocked, make_bash_input, make_edit_input
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+def run_hook_cached(input_json: str, cwd: Path, cache_dir: Path) -> str:
+    env = dict(os.environ, BLOCK_CACHE_DIR=str(cache_dir))
+    result = subprocess.run(
+        [sys.executable, str(HOOK_SCRIPT)], input=input_json, capture_output=True, text=True, cwd=cwd, env=env,
+    )
+    assert result.returncode == 0
+    return result.stdout
+
+
+class TestMarkerIndex:
+    def test_index_is_written_and_protected(self, cache_env):
+        project, cache_dir = cache_env
+        create_block_file(project / "a" / "locked")
+        age_tree(project)
+
+        decision = _pd.evaluate_hook_input(make_bash_input(f"rm -rf {project / 'a'}"))
+        assert decision is not None and decision["decision"] == "block"
+
+        index_files = list(cache_dir.glob("markers-*.marshal"))
+        assert len(index_files) == 1
+        assert (cache_dir / ".block").exists()
+
+        decision = _pd.evaluate_hook_input(make_edit_input(str(index_files[0])))
+        assert decision is not None and decision["decision"] == "block"
+
+    def test_answers_from_index_without_listing(self, cache_env, monkeypatch):
+        project, _ = cache_env
+        create_block_file(project / "a" / "b" / "locked")
+        age_tree(project)
+        _pd.evaluate_hook_input(make_bash_input(f"rm -rf {project / 'a'}"))
+
+        def no_scandir(path):
+            raise AssertionError(f"listed {path}")
+
+        monkeypatch.setattr(os, "scandir", no_scandir)
+        monkeypatch.setattr(os, "walk", no_scandir)
+        assert _pd.check_descendant_block_files(str(project / "a")) == str(project / "a" / "b" / "locked" / ".block")
+
+    def test_new_descendant_marker_is_seen(self, cache_env):
+        project, cache_dir = cache_env
+        (project / "a" / "b").mkdir(parents=True)
+        age_tree(project)
+        command = make_bash_input(f"rm -rf {project / 'a'}")
+        assert not is_blocked(run_hook_cached(command, project, cache_dir))
+
+        create_block_file(project / "a" / "b")
+        assert is_blocked(run_hook_cached(command, project, cache_dir))
+
+    def test_removed_marker_is_seen(self, cache_env):
+        project, cache_dir = cache_env
+        marker = create_block_file(project / "a")
+        age_tree(project)
+        target = make_edit_input(str(project / "a" / "f.txt"))
+        assert is_blocked(run_hook_cached(target, project, cache_dir))
+
+        marker.unlink()
+        assert not is_blocked(run_hook_cached(target, project, cache_dir))
+
+    def test_corrupt_index_is_ignored(self, cache_env):
+        project, cache_dir = cache_env
+        create_block_file(project / "a")
+        age_tree(project)
+        target = make_edit_input(str(project / "a" / "f.txt"))
+        run_hook_cached(target, project, cache_dir)
+
+        for index_file in cache_dir.glob("markers-*.marshal"):
+            index_file.write_bytes(b"\x00garbage")
+        assert is_blocked(run_hook_cached(target, project, cache_dir))
+
+    def test_recent_directories_are_not_cached(self, cache_env):
+        project, _ = cache_env
+        (project / "fresh").mkdir()
+        _pd.evaluate_hook_input(make_edit_input(str(project / "fresh" / "f.txt")))
+        index = next(iter(_pd._cache_files.values()))
+        assert str(project / "fresh") not in index.entries
+
+    def test_matches_filesystem_walk(self, cache_env):
+        project, _ = cache_env
+        rng = random.Random(7)
+        dirs = [project]
+        for i in range(60):
+            child = rng.choice(dirs) / f"d{i}"
+            child.mkdir()
+            dirs.append(child)
+        for marker_dir in rng.sample(dirs[1:], 3):
+            create_block_file(marker_dir)
+        age_tree(project)
+
+        index = _pd._MarkerIndex(str(project / "unused"), {})
+        for directory in dirs:
+            expected = _pd._find_descendant_marker(str(directory))
+            assert index.first_descendant(str(directory)) == expected, directory
+            assert index.markers(str(directory)) == ((directory / ".block").is_file(), False)
+
+
+class TestMarkerRangeQuery:
+    def test_answers_without_walking(self, cache_env, monkeypatch):
+        project, _ = cache_env
+        create_block_file(project / "build" / "a" / "b" / "c" / "locked")
+        for i in range(20):
+            (project / "build" / f"out{i}").mkdir()
+        age_tree(project)
+        _pd.evaluate_hook_input(make_bash_input(f"rm -rf {project / 'build'}"))
+
+        def no_listing(*args):
+            raise AssertionError("walked the tree")
+
+        monkeypatch.setattr(_pd._MarkerIndex, "_listing", no_listing)
+        monkeypatch.setattr(os, "walk", no_listing)
+        expected = str(project / "build" / "a" / "b" / "c" / "locked" / ".block")
+        assert _pd.check_descendant_block_files(str(project / "build")) == expected
+        assert _pd.check_descendant_block_files(str(project / "build" / "a")) == expected
+
+    def test_removed_marker_falls_back_to_walk(self, cache_env):
+        project, _ = cache_env
+        marker = create_block_file(project / "a" / "locked")
+        create_block_file(project / "a" / "other")
+        age_tree(project)
+        index = _pd._MarkerIndex(str(project / "unused"), {})
+        index.markers(str(project / "a" / "locked"))
+        index.markers(str(project / "a" / "other"))
+
+        marker.unlink()
+        assert index.known_descendant(str(project / "a")) == str(project / "a" / "other" / ".block")
+        assert index.marker_dirs == [str(project / "a" / "other")]
+        (project / "a" / "other" / ".block").unlink()
+        assert index.known_descendant(str(project)) is None
+        assert index.marker_dirs == []
+
+    def test_sibling_prefixes_are_not_descendants(self, cache_env):
+        project, _ = cache_env
+        create_block_file(project / "ab")
+        age_tree(project)
+        index = _pd._MarkerIndex(str(project / "unused"), {})
+        index.first_descendant(str(project))
+        assert index.known_descendant(str(project / "a")) is None
+        assert index.known_descendant(str(project)) == str(project / "ab" / ".block")
+
+    def test_symlinked_and_pruned_directories_are_skipped(self, cache_env, tmp_path):
+        project, _ = cache_env
+        real = tmp_path / "real"
+        create_block_file(real / "inner")
+        (project / "parent").mkdir()
+        (project / "parent" / "link").symlink_to(real, target_is_directory=True)
+        create_block_file(project / "parent" / "node_modules" / "pkg")
+        age_tree(project)
+        age_tree(real)
+        index = _pd._MarkerIndex(str(project / "unused"), {})
+        index.markers(str(project / "parent" / "link" / "inner"))
+        index.markers(str(project / "parent" / "node_modules" / "pkg"))
+        assert index.known_descendant(str(project)) == str(project / "parent" / "node_modules" / "pkg" / ".block")
+
+        assert index.known_descendant(str(project / "parent"), _pd._ScanBudget.from_env()) is None
+
+    def test_agrees_with_filesystem_walk(self, cache_env):
+        project, _ = cache_env
+        rng = random.Random(11)
+        dirs = [project]
+        for i in range(80):
+            child = rng.choice(dirs) / f"d{i}"
+            child.mkdir()
+            dirs.append(child)
+        markers = [create_block_file(marker_dir) for marker_dir in rng.sample(dirs[1:], 6)]
+        age_tree(project)
+        index = _pd._MarkerIndex(str(project / "unused"), {})
+        index.first_descendant(str(project))
+
+        for marker in markers[:3]:
+            marker.unlink()
+        for directory in dirs:
+            expected = _pd._find_descendant_marker(str(directory))
+            found = index.known_descendant(str(directory)) or index.first_descendant(str(directory))
+            assert (found is None) == (expected is None), directory
@@ -0,0 +1,130 @@
+"""Tests for inotify-backed marker tracking (protect_daemon.py --watch)."""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import create_block_file, create_local_block_file, make_edit_input
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+
+
+@pytest.fixture
+def watched(tmp_path, monkeypatch):
+    monkeypatch.delenv("BLOCK_CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    assert _pd.enable_marker_watch()
+    yield _pd._watcher
+    _pd._watcher.close()
+    _pd._watcher = None
+
+
+def decide(path: Path):
+    return _pd.evaluate_hook_input(make_edit_input(str(path)))
+
+
+def _no_stat(*args):
+    raise AssertionError("re-checked a marker")
+
+
+class TestMarkerWatch:
+    def test_unchanged_markers_are_not_rechecked(self, watched, tmp_path, monkeypatch):
+        create_block_file(tmp_path / "project", '{"blocked": ["*.lock"]}')
+        target = tmp_path / "project" / "a.lock"
+        decision = decide(target)
+        assert decision is not None
+
+        monkeypatch.setattr(os.path, "isfile", _no_stat)
+        monkeypatch.setattr(_pd, "_marker_signature", _no_stat)
+        assert decide(target) == decision
+        assert decide(tmp_path / "project" / "a.txt") is None
+
+    def test_created_changed_and_removed_markers_are_seen(self, watched, tmp_path):
+        target = tmp_path / "project" / "a.txt"
+        target.parent.mkdir()
+        assert decide(target) is None
+
+        marker = create_block_file(tmp_path / "project", '{"blocked": ["*.lock"]}')
+        assert decide(target) is None
+        marker.write_text('{"blocked": ["*.txt"]}')
+        assert decide(target) is not None
+        local = create_local_block_file(tmp_path / "project", '{"blocked": ["*.md"]}')
+        marker.write_text('{"blocked": ["*.lock"]}')
+        assert decide(target) is None
+        local.write_text('{"blocked": ["*.txt"]}')
+        assert decide(target) is not None
+        local.unlink()
+        assert decide(target) is None
+        marker.unlink()
+        assert decide(tmp_path / "project" / "a.lock") is None
+
+    def test_change_drops_only_affected_merges(self, watched, tmp_path):
+        create_block_file(tmp_path / "a", '{"blocked": ["*.lock"]}')
+        create_block_file(tmp_path / "b", '{"blocked": ["*.lock"]}')
+        decide(tmp_path / "a" / "x.lock")
+        decide(tmp_path / "b" / "x.lock")
+        assert str(tmp_path / "a") in _pd._DIR_CONFIGS and str(tmp_path / "b") in _pd._DIR_CONFIGS
+
+        (tmp_path / "a" / ".block").write_text('{"blocked": ["*.txt"]}')
+        watched.drain()
+        assert str(tmp_path / "a") not in _pd._DIR_CONFIGS
+        assert str(tmp_path / "b") in _pd._DIR_CONFIGS
+        assert not any(str(tmp_path / "a") in chain for chain in _pd._CHAIN_CONFIGS)
+
+    def test_renamed_directory_forgets_subtree(self, watched, tmp_path):
+        create_block_file(tmp_path / "old" / "sub")
+        assert decide(tmp_path / "old" / "sub" / "f.txt") is not None
+
+        (tmp_path / "old").rename(tmp_path / "new")
+        (tmp_path / "old" / "sub").mkdir(parents=True)
+        assert decide(tmp_path / "old" / "sub" / "f.txt") is None
+        assert decide(tmp_path / "new" / "sub" / "f.txt") is not None
+
+    def test_retargeted_symlink_forgets_paths_through_it(self, watched, tmp_path):
+        (tmp_path / "old" / "sub").mkdir(parents=True)
+        create_block_file(tmp_path / "new" / "sub")
+        link = tmp_path / "project" / "link"
+        link.parent.mkdir()
+        link.symlink_to(tmp_path / "old", target_is_directory=True)
+        target = link / "sub" / "file.txt"
+        assert decide(target) is None
+
+        retarget = tmp_path / "project" / "link.tmp"
+        retarget.symlink_to(tmp_path / "new", target_is_directory=True)
+        retarget.replace(link)
+        assert decide(target) is not None
+
+    def test_hard_linked_markers_are_rechecked(self, watched, tmp_path):
+        marker = create_block_file(tmp_path / "project", '{"blocked": ["*.lock"]}')
+        os.link(marker, tmp_path / "elsewhere")
+        target = tmp_path / "project" / "a.txt"
+        assert decide(target) is None
+        assert watched.states[str(tmp_path / "project")][1] is None
+
+        (tmp_path / "elsewhere").write_text('{"blocked": ["*.txt"]}')
+        assert decide(target) is not None
+
+    def test_falls_back_to_stat_when_watches_run_out(self, watched, tmp_path, monkeypatch):
+        monkeypatch.setattr(watched, "add_watch", lambda fd, path, mask: -watched.ENOSPC)
+        marker = create_block_file(tmp_path / "project")
+        target = tmp_path / "project" / "a.txt"
+        assert decide(target) is not None
+        assert watched.full and str(tmp_path / "project") not in watched.states
+
+        marker.unlink()
+        assert decide(target) is None
+
+    def test_queue_overflow_revalidates_by_stat(self, watched, tmp_path):
+        create_block_file(tmp_path / "project")
+        decide(tmp_path / "project" / "a.txt")
+        watched._apply(-1, watched.IN_Q_OVERFLOW, "")
+        assert all(state[1] is None for state in watched.states.values())
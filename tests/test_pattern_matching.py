@@ -0,0 +1,191 @@
+"""Compiled pattern matching must agree with convert_wildcard_to_regex."""
+import importlib.util
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+PATTERNS = [
+    "package-lock.json", "*.lock", "migrations/**", "**/*.secret", "src/**/gen_*.py", "docs/*.md",
+    "a?c.txt", "**", "*", "build/", "**/node_modules/**", "config/*/settings.json", "*.tar.gz",
+    "dir/**/file", "x+y(1).txt", "[abc].txt", "**/.env", "nested/**/deep/**/*.log", "a**b", "?",
+    "**/*.pyc", "**/*", "/**", "**/", "a/b/**", "docs\\*.md", "vendor\\**", "*.", "**/a.secret", "a.txt",
+]
+
+PATHS = [
+    "package-lock.json", "sub/package-lock.json", "yarn.lock", "deep/dir/Cargo.lock", "migrations/001.sql",
+    "migrations", "app/migrations/x.sql", "a.secret", "x/y/z.secret", "src/gen_a.py", "src/a/b/gen_c.py",
+    "docs/readme.md", "docs/sub/readme.md", "abc.txt", "a/c.txt", "build/", "build/out", "node_modules/x/y",
+    "p/node_modules/q", "config/dev/settings.json", "config/a/b/settings.json", "file.tar.gz", "dir/file",
+    "dir/a/b/file", "x+y(1).txt", "[abc].txt", "a.txt", ".env", "sub/.env", "nested/a/deep/b/c.log",
+    "ab", "a/b", "aXYZb", "", "a", "line\nbreak.lock",
+    "x.pyc", "p/q/x.pyc", "/abs/path", "a/b/c", "a/b/", "vendor/x", "vendor", "file.", "dir/", "a.txt\n",
+    "migrations/\n", "p/.env\n",
+]
+
+# Patterns and paths that exercise the trie's segment handling
+TRIE_PATTERNS = [
+    "src/*/x.py", "src/*/**", "**/a/*/b", "a/**/**/z", "**/**/z", "a?/b", "?/x", "a/?", "x?y?z", "*/",
+    "a/*", "*/*", "**/d*/*.py", "dir/**/", "a//b", "mod*_x.py", "src/**/mod1_*.py", "**/m?d*_*.py", "a/**/b/**",
+]
+
+TRIE_PATHS = [
+    "src/a/x.py", "src/x.py", "src/a/b/x.py", "src/a/", "src/a", "a/q/b", "p/a/q/b", "a/z", "a/b/z", "z", "a/b/c/z",
+    "a?/b", "ab/b", "a//b", "a/b", "/x", "x", "a/", "xay/z", "x/y/z", "x/y", "p/", "/", "d1/e.py", "q/dd/e.py",
+    "dir/", "dir/a/", "dir/a/b", "mod1_x.py", "src/p/mod1_a.py", "src/mod1_.py", "deep/mxd2_b.py", "m/d_x.py",
+    "a/c/b/d", "a/b/b/", "a/b", "", "a",
+]
+
+
+def reference_first_match(entries, relative_path):
+    """The original loop: one re.match per entry, first match wins."""
+    for entry in entries:
+        pattern = entry if isinstance(entry, str) else entry.get("pattern", "")
+        if re.match(_pd.convert_wildcard_to_regex(pattern), relative_path):
+            return entry
+    return None
+
+
+def expected_result(entries, relative_path):
+    entry = reference_first_match(entries, relative_path)
+    if entry is None:
+        return None
+    if isinstance(entry, str):
+        return entry, ""
+    return entry.get("pattern", ""), entry.get("guide", "")
+
+
+class TestCompiledPatterns:
+    def test_patterns_compile_once(self):
+        assert _pd.compile_wildcard("*.lock") is _pd.compile_wildcard("*.lock")
+
+    def test_equal_lists_share_compiled_list(self):
+        first = _pd.compile_pattern_list(["*.lock", {"pattern": "a/**", "guide": "g"}])
+        second = _pd.compile_pattern_list(["*.lock", {"pattern": "a/**", "guide": "g"}])
+        assert first is second
+
+    def test_identical_markers_share_patterns(self):
+        first = _pd._parse_lock_content('{"blocked": ["gen/**/*.py", {"pattern": "*.lock", "guide": "g"}]}')
+        second = _pd._parse_lock_content('{"blocked": ["gen/**/*.py", {"pattern": "*.lock", "guide": "g"}]}')
+        assert first.blocked[0] is second.blocked[0]
+        assert first.blocked[1]["pattern"] is second.blocked[1]["pattern"]
+        assert _pd.compile_pattern_list(first.blocked) is _pd.compile_pattern_list(second.blocked)
+
+    def test_seen_list_skips_content_key(self, monkeypatch):
+        entries = [f"gen/m{i}/*.py" for i in range(100)]
+        compiled = _pd.compile_pattern_list(entries)
+        monkeypatch.setattr(_pd, "_PATTERN_LISTS", None)
+        assert _pd.compile_pattern_list(entries) is compiled
+
+    def test_intern_table_evicts_least_recently_used(self):
+        table = _pd._InternTable(2)
+        table.put("a", 1)
+        table.put("b", None)
+        assert table.get("a") == 1
+        table.put("c", 3)
+        assert len(table) == 2
+        assert table.get("b", "missing") == "missing"
+        assert table.get("a") == 1 and table.get("c") == 3
+
+    def test_pattern_caches_are_bounded(self, monkeypatch):
+        monkeypatch.setattr(_pd, "_PATTERN_CACHE", _pd._InternTable(8))
+        monkeypatch.setattr(_pd, "_PATTERN_LISTS", _pd._InternTable(4))
+        monkeypatch.setattr(_pd, "_PATTERN_LIST_IDS", _pd._InternTable(4))
+        for i in range(50):
+            assert _pd.compile_wildcard(f"*.ext{i}") is not None
+            _pd.compile_pattern_list([f"dir{i}/*.py"])
+        assert len(_pd._PATTERN_CACHE) == 8 and len(_pd._PATTERN_LISTS) == 4 and len(_pd._PATTERN_LIST_IDS) == 4
+        assert _pd.compile_wildcard("*.ext49") is _pd.compile_wildcard("*.ext49")
+
+    def test_unhashable_entries_still_match(self):
+        compiled = _pd.compile_pattern_list([{"pattern": "*.lock", "guide": ["not", "a", "string"]}])
+        assert compiled.first_match("a.lock") == ("*.lock", ["not", "a", "string"])
+
+    def test_first_match_agrees_with_regex_loop(self):
+        for path in PATHS:
+            assert _pd.compile_pattern_list(PATTERNS).first_match(path) == expected_result(PATTERNS, path), path
+
+    def test_random_lists_agree_with_regex_loop(self):
+        rng = random.Random(2024)
+        for _ in range(300):
+            entries = [
+                rng.choice(PATTERNS) if rng.random() < 0.7 else {"pattern": rng.choice(PATTERNS), "guide": "g"}
+                for _ in range(rng.randint(1, 12))
+            ]
+            compiled = _pd.compile_pattern_list(entries)
+            for path in rng.sample(PATHS, 10):
+                assert compiled.first_match(path) == expected_result(entries, path), (entries, path)
+
+    def test_large_list_uses_one_matcher(self):
+        # "**" inside a segment keeps these out of the trie
+        entries = [{"pattern": f"gen/m{i}/**x.py", "guide": f"guide {i}"} for i in range(5000)]
+        compiled = _pd.compile_pattern_list(entries)
+        assert compiled.trie is None and compiled.matcher is not None
+        assert compiled.first_match("gen/m4999/a/x.py") == ("gen/m4999/**x.py", "guide 4999")
+        assert compiled.first_match("gen/m5000/a/x.py") is None
+
+    def test_large_list_uses_trie(self):
+        entries = [{"pattern": f"gen/m{i}/**/*.py", "guide": f"guide {i}"} for i in range(5000)]
+        compiled = _pd.compile_pattern_list(entries)
+        assert compiled.trie is not None and compiled.complex == [] and compiled.matcher is None
+        assert compiled.first_match("gen/m4999/a/x.py") == ("gen/m4999/**/*.py", "guide 4999")
+        assert compiled.first_match("gen/m5000/a/x.py") is None
+
+    def test_entry_by_entry_fallback_agrees(self):
+        compiled = _pd.PatternList(PATTERNS)
+        compiled.matcher = None
+        for path in PATHS:
+            assert compiled.first_match(path) == expected_result(PATTERNS, path), path
+
+    def test_simple_patterns_skip_the_regex(self):
+        compiled = _pd.compile_pattern_list(
+            ["package-lock.json", "*.lock", "migrations/**", "**/.env", "**/*.pyc", "src/**/gen_*.py"]
+        )
+        assert compiled.complex == [5]
+        assert compiled.first_match("a/b/.env") == ("**/.env", "")
+        assert compiled.first_match("migrations/x/y.sql") == ("migrations/**", "")
+        assert compiled.first_match("src/a/gen_b.py") == ("src/**/gen_*.py", "")
+        assert _pd.compile_pattern_list(["*.lock", "docs/**"]).matcher is None
+
+    def test_earlier_complex_entry_wins(self):
+        compiled = _pd.compile_pattern_list([{"pattern": "*/x.lock", "guide": "first"}, "*.lock", "a/x.lock"])
+        assert compiled.first_match("a/x.lock") == ("*/x.lock", "first")
+
+
+class TestPatternTrie:
+    @pytest.fixture(autouse=True)
+    def always_use_trie(self, monkeypatch):
+        monkeypatch.setattr(_pd.PatternList, "TRIE_MIN_ENTRIES", 1)
+
+    def test_first_match_agrees_with_regex_loop(self):
+        compiled = _pd.PatternList(PATTERNS)
+        assert compiled.trie is not None
+        for path in PATHS:
+            assert compiled.first_match(path) == expected_result(PATTERNS, path), path
+
+    def test_each_pattern_agrees_with_its_regex(self):
+        for pattern in PATTERNS + TRIE_PATTERNS:
+            compiled = _pd.PatternList([pattern])
+            for path in PATHS + TRIE_PATHS:
+                assert compiled.first_match(path) == expected_result([pattern], path), (pattern, path)
+
+    def test_random_lists_agree_with_regex_loop(self):
+        rng = random.Random(2025)
+        for _ in range(300):
+            entries = [rng.choice(TRIE_PATTERNS + PATTERNS) for _ in range(rng.randint(1, 12))]
+            compiled = _pd.PatternList(entries)
+            for path in rng.sample(TRIE_PATHS + PATHS, 10):
+                assert compiled.first_match(path) == expected_result(entries, path), (entries, path)
+
+    def test_unsupported_patterns_stay_in_the_regex(self):
+        compiled = _pd.PatternList(["a**b", "/**/x", "a????b", "src/*/x.py"])
+        assert compiled.complex == [0, 1, 2]
+        assert compiled.trie is not None and compiled.trie.lowest == 3
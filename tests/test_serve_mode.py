@@ -0,0 +1,87 @@
+"""Tests for the --serve worker mode used by the OpenCode plugin."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.conftest import create_block_file
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+
+def serve(requests: list, cwd=None) -> list:
+    """Feed request lines to one worker process and return parsed responses."""
+    lines = "".join(
+        (r if isinstance(r, str) else json.dumps(r)) + "\n" for r in requests
+    )
+    result = subprocess.run(
+        [sys.executable, str(HOOK_SCRIPT), "--serve"],
+        input=lines,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+    assert result.returncode == 0
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def edit(path) -> dict:
+    return {"tool_name": "Edit", "tool_input": {"file_path": str(path)}}
+
+
+class TestServeMode:
+    def test_answers_each_request_in_order(self, tmp_path):
+        create_block_file(tmp_path / "locked", '{"guide": "Locked by test"}')
+        responses = serve([
+            {"id": 1, "input": edit(tmp_path / "locked" / "a.txt")},
+            {"id": 2, "input": edit(tmp_path / "free.txt")},
+            {"id": "three", "input": edit(tmp_path / "locked" / "b.txt")},
+        ])
+        assert [r["id"] for r in responses] == [1, 2, "three"]
+        assert responses[0]["decision"] == {"decision": "block", "reason": "Locked by test"}
+        assert responses[1]["decision"] is None
+        assert responses[2]["decision"]["decision"] == "block"
+
+    def test_relative_paths_use_request_cwd(self, tmp_path):
+        create_block_file(tmp_path / "one")
+        (tmp_path / "two").mkdir()
+        bash = {"tool_name": "Bash", "tool_input": {"command": "touch f.txt"}}
+        responses = serve([
+            {"id": 1, "cwd": str(tmp_path / "one"), "input": bash},
+            {"id": 2, "cwd": str(tmp_path / "two"), "input": bash},
+        ])
+        assert responses[0]["decision"]["decision"] == "block"
+        assert responses[1]["decision"] is None
+
+    def test_sees_marker_changes_between_requests(self, tmp_path):
+        """The worker outlives many edits; config changes must apply immediately."""
+        marker = create_block_file(tmp_path, '{"blocked": ["*.lock"]}')
+        proc = subprocess.Popen(
+            [sys.executable, str(HOOK_SCRIPT), "--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+
+        def ask(request_id):
+            proc.stdin.write(json.dumps({"id": request_id, "input": edit(tmp_path / "a.txt")}) + "\n")
+            proc.stdin.flush()
+            return json.loads(proc.stdout.readline())
+
+        try:
+            assert ask(1)["decision"] is None
+            marker.write_text('{"blocked": ["*.txt"]}')
+            assert ask(2)["decision"]["decision"] == "block"
+        finally:
+            proc.stdin.close()
+            proc.wait(timeout=10)
+
+    def test_bad_lines_get_error_responses(self):
+        responses = serve(["not json", {"id": 7, "cwd": "/nonexistent/dir/x", "input": {}}])
+        assert "error" in responses[0]
+        assert responses[1]["id"] == 7
+        assert "error" in responses[1]
+
+    def test_ignores_blank_lines(self, tmp_path):
+        responses = serve(["", {"id": 1, "input": edit(tmp_path / "a.txt")}])
+        assert responses == [{"id": 1, "decision": None}]
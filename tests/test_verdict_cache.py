@@ -0,0 +1,79 @@
+"""Tests for the on-disk cache of name-independent verdicts (BLOCK_CACHE_DIR)."""
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import OLD, backdate, create_block_file, make_edit_input, reset_process_caches
+
+HOOK_SCRIPT = Path(__file__).parent.parent / "hooks" / "protect_directories.py"
+
+_spec = importlib.util.spec_from_file_location("protect_directories", str(HOOK_SCRIPT))
+assert _spec is not None and _spec.loader is not None
+_pd = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_pd)
+
+
+def verdict_entries() -> dict:
+    cache = next((c for c in _pd._cache_files.values() if isinstance(c, _pd._VerdictCache)), None)
+    return {} if cache is None else cache.entries
+
+
+def _fail(*args):
+    raise AssertionError("loaded configs")
+
+
+class TestVerdictCache:
+    def test_block_all_tree_skips_configs(self, cache_env, monkeypatch):
+        project, _ = cache_env
+        backdate(create_block_file(project / "vendor", '{"guide": "Vendored code"}'))
+        backdate(create_block_file(project, '{"guide": "Project"}'))
+        target = make_edit_input(str(project / "vendor" / "lib" / "a.py"))
+
+        decision = _pd.evaluate_hook_input(target)
+        assert decision is not None and decision["reason"] == "Vendored code"
+
+        reset_process_caches(_pd)
+        monkeypatch.setattr(_pd, "_parse_lock_content", _fail)
+        monkeypatch.setattr(_pd._ConfigCache, "load", classmethod(_fail))
+        assert _pd.evaluate_hook_input(target) == decision
+        assert _pd.evaluate_hook_input(make_edit_input(str(project / "vendor" / "b.txt"))) == decision
+
+    def test_empty_blocked_list_allows_without_configs(self, cache_env, monkeypatch):
+        project, _ = cache_env
+        backdate(create_block_file(project, '{"blocked": []}'))
+        target = make_edit_input(str(project / "a.txt"))
+        assert _pd.evaluate_hook_input(target) is None
+        assert [entry[1] for entry in verdict_entries().values()] == ["none"]
+
+        reset_process_caches(_pd)
+        monkeypatch.setattr(_pd, "_parse_lock_content", _fail)
+        assert _pd.evaluate_hook_input(target) is None
+
+    @pytest.mark.parametrize("content", ['{"blocked": ["*.lock"]}', '{"agents": ["Explore"]}', '{"allowed": []}'])
+    def test_name_dependent_configs_are_not_recorded(self, cache_env, content):
+        project, _ = cache_env
+        backdate(create_block_file(project, content))
+        _pd.evaluate_hook_input(make_edit_input(str(project / "a.txt")))
+        assert verdict_entries() == {}
+
+    def test_changed_marker_invalidates_verdict(self, cache_env):
+        project, _ = cache_env
+        marker = backdate(create_block_file(project))
+        target = make_edit_input(str(project / "a.txt"))
+        assert _pd.evaluate_hook_input(target) is not None
+
+        reset_process_caches(_pd)
+        marker.write_text('{"blocked": ["*.lock"]}')
+        backdate(marker, OLD + 5)
+        assert _pd.evaluate_hook_input(target) is None
+
+    def test_new_child_marker_changes_chain(self, cache_env):
+        project, _ = cache_env
+        backdate(create_block_file(project))
+        target = make_edit_input(str(project / "sub" / "a.txt"))
+        assert _pd.evaluate_hook_input(target) is not None
+
+        reset_process_caches(_pd)
+        backdate(create_block_file(project / "sub", '{"blocked": ["*.lock"]}'))
+        assert _pd.evaluate_hook_input(target) is None